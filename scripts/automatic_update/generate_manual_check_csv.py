@@ -1,12 +1,13 @@
 import os
-import requests
 import pandas as pd 
 import string
 import sys
 current_script_directory = os.path.dirname(os.path.realpath(__file__))
 project_root = os.path.abspath(os.path.join(current_script_directory, os.pardir))
 sys.path.append(os.path.join(project_root))
-from bib_handling_code.processbib import read_bibfile
+from bib_handling_code.harvest import harvest_author_papers
+from bib_handling_code.processbib import normalize_doi, read_bibfile
+from bib_handling_code.titlematch import TitleMatcher
 from difflib import SequenceMatcher
 from collections import defaultdict
 from datetime import datetime
@@ -102,6 +103,13 @@ def find_new_ssids(staff_id_dict, staff_year_dict):
     staff_dict = {key: {'ids': staff_id_dict[key], 'years': staff_year_dict[key]} for key in staff_id_dict}
     all_staff_id_ss_data = []
 
+    # the papers of all staff ids are fetched concurrently, within the rate limit of the api
+    all_staff_ids = [staff_id for values in staff_dict.values() for staff_id in values['ids']]
+    print(f'Fetching the papers of {len(all_staff_ids)} Semantic Scholar author ids')
+    papers, failed = harvest_author_papers(all_staff_ids)
+    for staff_id, error in failed.items():
+        print(f'Could not fetch the papers of author id {staff_id}, they are skipped: {error}')
+
     for idx, (staff_name, values) in enumerate(staff_dict.items()):
         staff_ids = values['ids']
         staff_start = values['years']['start']
@@ -111,10 +119,7 @@ def find_new_ssids(staff_id_dict, staff_year_dict):
         for staff_id in staff_ids:
             print('\t\t', staff_id)
             staff_id_ss_data = []
-
-            url = f'https://api.semanticscholar.org/graph/v1/author/{staff_id}/papers?fields=year,title,authors,externalIds,citationCount,publicationTypes,journal&limit=500'
-            r = requests.get(url)
-            ss_staff_data = r.json().get('data', [])
+            ss_staff_data = papers.get(staff_id, [])
 
             for ss_staff_entry in ss_staff_data:
                 ss_id = ss_staff_entry.get('paperId')
@@ -158,21 +163,13 @@ def return_existing_ssids(bib_file):
     return all_ss_ids
 
 
-def normalize_doi(doi):
-    # Convert to lowercase
-    doi = doi.lower()
-    # Remove 'https://doi.org/' if present
-    if doi.startswith("https://doi.org/"):
-        doi = doi[len("https://doi.org/"):]
-    return doi
+def return_existing_dois(df_bib):
+    return [normalize_doi(doi) for doi in df_bib['doi'] if doi != '']
 
 
-def return_existing_dois(df_bib):
-    all_dois=[]
-    for idx, row in df_bib.iterrows():
-        if row['doi'] != '':
-            all_dois.append(normalize_doi(row['doi']))
-    return all_dois
+def index_found_items(df_found_items):
+    """Return the found items as a dict from ss_id to a dict with the other columns of the item."""
+    return df_found_items.set_index('ss_id', drop=False).to_dict('index')
 
 
 def find_doi_match(df_bib, df_found_items, found_items, found_dois, actions_list):
@@ -183,10 +180,15 @@ def find_doi_match(df_bib, df_found_items, found_items, found_dois, actions_list
     ss_id_match = []
     update_item = []
     update_item_ssid = []
-    all_dois = return_existing_dois(df_bib)
-    for index, row in df_bib.iterrows():
-        doi = row.iloc[4]
-        ss_ids = row.iloc[8]
+    all_dois = set(return_existing_dois(df_bib))
+    # ss_id and doi lookups are dict lookups instead of scans of df_found_items, the first item wins for a doi
+    found = index_found_items(df_found_items)
+    ss_id_by_doi = {}
+    for ss_id, found_doi in zip(found_items, found_dois):
+        ss_id_by_doi.setdefault(found_doi, ss_id)
+    for row in df_bib.itertuples(index=False):
+        doi = row[4]
+        ss_ids = row[8]
         all_ss_ids = []
         if ss_ids is not None:
             all_ss_ids = ss_ids.split(',')
@@ -195,13 +197,14 @@ def find_doi_match(df_bib, df_found_items, found_items, found_dois, actions_list
         
         # Check if any existing bib-item has the same ss_id as an item on found_items 
         for ss_id in all_ss_ids:
-            if ss_id in found_items:
-                ss_doi = df_found_items[df_found_items['ss_id'] == ss_id]['doi'].item()
+            if ss_id in found:
+                item = found[ss_id]
+                ss_doi = item['doi']
                 if ss_doi:
                     ss_doi = normalize_doi(ss_doi)
                     doi = normalize_doi(doi)
                     if ss_doi != doi and ss_doi not in all_dois and (doi == '' or 'arxiv' in doi):
-                        update_item.append((row.iloc[0], ss_id, f'https://www.semanticscholar.org/paper/{ss_id}', 1, doi, ss_doi, row.iloc[2], df_found_items[df_found_items['ss_id']==ss_id]['title'].item(), df_found_items[df_found_items['ss_id']==ss_id]['staff_id'].item(), df_found_items[df_found_items['ss_id']==ss_id]['staff_name'].item(), row.iloc[3], df_found_items[df_found_items['ss_id']==ss_id]['authors'].item(), row.iloc[6], df_found_items[df_found_items['ss_id']==ss_id]['journal'].item(), row.iloc[7], df_found_items[df_found_items['ss_id']==ss_id]['ss_year'].item(), row.iloc[1], df_found_items[df_found_items['ss_id']==ss_id]['pmid'].item(), 'update item', actions_list))
+                        update_item.append((row[0], ss_id, f'https://www.semanticscholar.org/paper/{ss_id}', 1, doi, ss_doi, row[2], item['title'], item['staff_id'], item['staff_name'], row[3], item['authors'], row[6], item['journal'], row[7], item['ss_year'], row[1], item['pmid'], 'update item', actions_list))
                         update_item_ssid.append(ss_id)
                     else:
                         not_new.append(ss_id)
@@ -209,79 +212,71 @@ def find_doi_match(df_bib, df_found_items, found_items, found_dois, actions_list
                     not_new.append(ss_id)
             
         # Check if any existing bib-item has the same doi as an item on found_items
-        if doi is not None and doi in found_dois:
-            idx = found_dois.index(doi)
-            ss_id = found_items[idx]
+        if doi is not None and doi in ss_id_by_doi:
+            ss_id = ss_id_by_doi[doi]
             # Check if that bib-item is already linked with the ss_id
             if ss_id not in all_ss_ids:
-                pmid=df_found_items[df_found_items['ss_id'] ==ss_id]['pmid'].item()
-                ss_title=df_found_items[df_found_items['ss_id']==ss_id]['title'].item()
-                ss_authors = df_found_items[df_found_items['ss_id']==ss_id]['authors'].item()
-                ss_journal = df_found_items[df_found_items['ss_id']==ss_id]['journal'].item()
-                ss_year = int(df_found_items[df_found_items['ss_id']==ss_id]['ss_year'].item())
-                staff_id = int(df_found_items[df_found_items['ss_id']==ss_id]['staff_id'].item())
-                staff_name = df_found_items[df_found_items['ss_id']==ss_id]['staff_name'].item()
-                ratio = SequenceMatcher(a=ss_title,b=row.iloc[2]).ratio()
+                item = found[ss_id]
+                ss_title = item['title']
+                ratio = SequenceMatcher(a=ss_title,b=row[2]).ratio()
                 ss_id_match.append(ss_id)
-                list_doi_match.append((row.iloc[0], ss_id, 'https://www.semanticscholar.org/paper/'+ss_id, ratio, doi, doi, row.iloc[2], ss_title, staff_id, staff_name, row.iloc[3], ss_authors, row.iloc[6], ss_journal, row.iloc[7], ss_year, row.iloc[1], pmid, 'doi match', actions_list))
+                list_doi_match.append((row[0], ss_id, 'https://www.semanticscholar.org/paper/'+ss_id, ratio, doi, doi, row[2], ss_title, int(item['staff_id']), item['staff_name'], row[3], item['authors'], row[6], item['journal'], row[7], int(item['ss_year']), row[1], item['pmid'], 'doi match', actions_list))
     return not_new, ss_id_match, list_doi_match, update_item, update_item_ssid
 
 
 def find_title_match_or_new_items(new_items, df_bib, actions_list):
     """Find title matches or new items between the bib file and found items."""
     
-    titles = new_items['title'].tolist()
-    dois = new_items['doi'].tolist()
-    ss_ids = new_items['ss_id'].tolist()
     list_title_match = []
     list_no_dois = []
     list_to_add = []
+    bib_rows = df_bib.to_dict('records')
     
-    for ss_id, ss_title, doi in zip(ss_ids, titles, dois):
-        title_match_ratios = df_bib['title'].apply(lambda x: SequenceMatcher(
-                a=ss_title.lower(), 
-                b=x.lower().replace('{', '').replace('}', '')).ratio())
-        max_ratio = title_match_ratios.max()
-        max_bibkey = df_bib[title_match_ratios==max_ratio]['bibkey'].iloc[0]
-        max_bib_title = df_bib[title_match_ratios==max_ratio]['title'].iloc[0]
-        max_bib_title = max_bib_title.replace('{', '').replace('}', '')
-        if sum(title_match_ratios>0.8) >= 1:
-            up80_bib_entries = df_bib[title_match_ratios > 0.8]
-            for i, match in up80_bib_entries.iterrows():
+    # the bib titles are indexed once, matches above 0.8 are looked for among the bib titles sharing a word with the
+    # title, the closest bib title (max_bibkey) among all of them
+    matcher = TitleMatcher(df_bib['title'].tolist())
+    for item in new_items.to_dict('records'):
+        ss_id, ss_title, doi = item['ss_id'], item['title'], item['doi']
+        best, max_ratio, title_matches = matcher.match(ss_title, threshold=0.8)
+        max_bib_entry = bib_rows[best]
+        max_bibkey = max_bib_entry['bibkey']
+        max_bib_title = max_bib_entry['title'].replace('{', '').replace('}', '')
+        if len(title_matches) >= 1:
+            for i, ratio in title_matches:
+                match = bib_rows[i]
                 list_title_match.append((
                     match['bibkey'],
                     ss_id,
                     f'https://www.semanticscholar.org/paper/{ss_id}',
-                    title_match_ratios[i],
+                    ratio,
                     match['doi'],
                     doi,
                     match['title'].replace('{', '').replace('}', ''),
                     ss_title,
-                    new_items[new_items['ss_id'] == ss_id]['staff_id'].item(),
-                    new_items[new_items['ss_id'] == ss_id]['staff_name'].item(),
+                    item['staff_id'],
+                    item['staff_name'],
                     match['authors'],
-                    new_items[new_items['ss_id'] == ss_id]['authors'].item(),
+                    item['authors'],
                     match['journal'],
-                    new_items[new_items['ss_id'] == ss_id]['journal'].item(),
+                    item['journal'],
                     match['year'],
-                    new_items[new_items['ss_id'] == ss_id]['ss_year'].item(),
+                    item['ss_year'],
                     match['type'],
-                    new_items[new_items['ss_id'] == ss_id]['pmid'].item(),
+                    item['pmid'],
                     'title match', actions_list))
         else:
-            max_bib_entry = df_bib[title_match_ratios == max_ratio]
-            authors = max_bib_entry['authors'].iloc[0]
-            bib_doi = max_bib_entry['doi'].iloc[0]
-            max_bib_journal = max_bib_entry['journal'].iloc[0]
-            max_bib_year = max_bib_entry['year'].iloc[0]
-            type_article = max_bib_entry['type'].iloc[0]
+            authors = max_bib_entry['authors']
+            bib_doi = max_bib_entry['doi']
+            max_bib_journal = max_bib_entry['journal']
+            max_bib_year = max_bib_entry['year']
+            type_article = max_bib_entry['type']
             
-            ss_authors = new_items[new_items['ss_id'] == ss_id]['authors'].item()
-            staff_id = new_items[new_items['ss_id'] == ss_id]['staff_id'].item()
-            staff_name = new_items[new_items['ss_id'] == ss_id]['staff_name'].item()
-            ss_journal = new_items[new_items['ss_id'] == ss_id]['journal'].item()
-            ss_year = new_items[new_items['ss_id'] == ss_id]['ss_year'].item()
-            ss_pmid = new_items[new_items['ss_id'] == ss_id]['pmid'].item()
+            ss_authors = item['authors']
+            staff_id = item['staff_id']
+            staff_name = item['staff_name']
+            ss_journal = item['journal']
+            ss_year = item['ss_year']
+            ss_pmid = item['pmid']
             
             if doi is None:
                 list_no_dois.append((max_bibkey, ss_id, f'https://www.semanticscholar.org/paper/{ss_id}', max_ratio, bib_doi, doi, max_bib_title, ss_title, staff_id, staff_name, authors, ss_authors, max_bib_journal, ss_journal, max_bib_year, ss_year, type_article, ss_pmid, 'doi None', actions_list))
@@ -1,43 +1,53 @@
-import requests
 from bs4 import BeautifulSoup
 import re
 import os
 import sys
+import threading
 current_script_directory = os.path.dirname(os.path.realpath(__file__))
 project_root = os.path.abspath(os.path.join(current_script_directory, os.pardir))
 sys.path.append(os.path.join(project_root))
-from script_data.accent_mappings import accent_mappings
+from bib_handling_code.accents import to_latex
+from bib_handling_code.bibkeys import KeyAllocator
+from bib_handling_code.doifetch import DoiFetcher
+
+_default_fetcher = None
+_default_fetcher_lock = threading.Lock()
+
+
+def default_fetcher():
+    """
+    the fetcher used when no fetcher is given, so dois are still only fetched once and connections are reused
+    it is made on first use, so importing this file does not need the http client
+    """
+    global _default_fetcher
+    with _default_fetcher_lock:
+        if _default_fetcher is None:
+            _default_fetcher = DoiFetcher()
+        return _default_fetcher
 
 
 class GetBiblatex:
-    def __init__(self, doi, ss_id, diag_bib):
+    def __init__(self, doi, ss_id, diag_bib, fetcher=None, keys=None):
         self.doi = doi
         self.diag_bib = diag_bib
+        # pass the same KeyAllocator for all new entries of a run, so they cannot get the same key
+        self.keys = keys or KeyAllocator.from_bib_text(diag_bib)
         self.ss_id = ss_id
-        self.accent_mappings = accent_mappings
+        self.fetcher = fetcher or default_fetcher()
 
     def _get_doi_csl(self):
         """
         Main function to get doi information like authors, title, abstract
         :return: dictionary with doi information
         """
-        response = requests.get(
-            f"https://doi.org/{self.doi}",
-            headers={"Accept": "application/vnd.citationstyles.csl+json"},
-            timeout=20,
-        )
-        response.raise_for_status()
-
-        return response.json()
+        return self.fetcher.csl(self.doi)
 
     def _convert_to_biblatex_format(self, author_name):
         """
         :param author_name:
         :return:
         """
-        for char, biblatex_char in self.accent_mappings.items():
-            author_name = author_name.replace(char, biblatex_char)
-        return author_name
+        return to_latex(author_name)
 
     @staticmethod
     def _clean_abstract_text(abstract_string):
@@ -48,9 +58,7 @@ class GetBiblatex:
         return abstract_string
 
     def _get_doi_abstract(self):
-        header = {"accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7"}
-        response_request = requests.get(f"https://doi.org/{self.doi}", headers=header,)
-        soup = BeautifulSoup(response_request.content, "html.parser")
+        soup = BeautifulSoup(self.fetcher.landing_page(self.doi), "html.parser")
 
         abstract_text = False
         try:
@@ -84,39 +92,9 @@ class GetBiblatex:
         return abstract_text
 
     @staticmethod
-    def _clean_author_abbreviation(auth_abr, year, bib_file):
-        auth_abr = auth_abr+year
-        substring_end = ","
-        max_length = 3
-
-        count = 0
-        start_index = 0
-        while True:
-            start = bib_file.find(auth_abr, start_index)
-            if start == -1:
-                break
-            end = bib_file.find(substring_end, start + len(auth_abr))
-            if end == -1:
-                break
-            substring = bib_file[start+len(auth_abr):end]
-            if len(substring) <= max_length:
-                count += 1
-            start_index = end + len(substring_end)
-
-        letters = {1: 'a', 2: 'b', 3: 'c', 4: 'd', 5: 'e',
-                   6: 'f', 7: 'g', 8: 'h', 9: 'i', 10: 'j',
-                   11: 'k', 12: 'l', 13: 'm', 14: 'n', 15: 'o',
-                   16: 'p', 17: 'q', 18: 'r', 19: 's', 20: 't',
-                   21: 'u', 22: 'v', 23: 'w', 24: 'x', 25: 'y', 26: 'z'}
-
-        if count != 0:
-            for i in range(1, count+2):
-                abbreviation = auth_abr+letters[i]
-                if bib_file.count(abbreviation) == 0:
-                    auth_abr = auth_abr + letters[i]
-                    break
-
-        return auth_abr
+    def _clean_author_abbreviation(auth_abr, year, keys):
+        """free key for auth_abr+year from the KeyAllocator keys, which reserves it"""
+        return keys.allocate(auth_abr+year)
 
     def get_bib_text(self):
 
@@ -180,7 +158,7 @@ class GetBiblatex:
         year_short = str(published.get('date-parts')[0][0])[2:]
         year = str(published.get('date-parts')[0][0])
         # year = str(response_json["published"]["date-parts"][0][0])[2:]
-        author_abbreviation = self._clean_author_abbreviation(author_abbreviation, year_short, self.diag_bib)
+        author_abbreviation = self._clean_author_abbreviation(author_abbreviation, year_short, self.keys)
         title = response_json["title"]
         title = self._convert_to_biblatex_format(author_name=title)
         optnote = "DIAG, RADIOLOGY"
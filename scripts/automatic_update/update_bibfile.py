@@ -1,17 +1,17 @@
 import pandas as pd
 import os
-import string
 import sys
 import re
 current_script_directory = os.path.dirname(os.path.realpath(__file__))
 project_root = os.path.abspath(os.path.join(current_script_directory, os.pardir))
 sys.path.append(os.path.join(project_root))
 from get_biblatex import GetBiblatex
-from bib_handling_code.processbib import read_bibfile
-from bib_handling_code.processbib import save_to_file
+from bib_handling_code.bibkeys import KeyAllocator
+from bib_handling_code.doifetch import DoiFetcher
+from bib_handling_code.harvest import fetch_citation_counts
+from bib_handling_code.processbib import BibDatabase, IncrementalBibFile, split_ss_ids
 from ast import literal_eval
 from collections import defaultdict
-from semanticscholar import SemanticScholar, SemanticScholarException
 
 
 def from_bib_to_csv(diag_bib_raw):
@@ -68,32 +68,20 @@ def update_blacklist_csv(blacklist_df, blacklist_entries, blacklist_out_file): #
 
 
 # Code to get citations from semantic scholar. If there are multiple ss_ids, we should get the number of citations for each of them and sum the two (or more?) values.
-def get_citations(semantic_scholar_ids, sch):
+def get_citations(semantic_scholar_ids, citation_counts):
+    """citation_counts is the result of fetch_citation_counts, returns citations per paper id and the ss_ids that were not found"""
     dict_cits = {}
     ss_ids_not_found = []
     for ss_id in semantic_scholar_ids:
-        tries = 8
-        i=0
-        while i<tries:
-            print('trying time', i, ss_id)
-            try:
-                paper = sch.get_paper(ss_id)
-                paper_id = paper['paperId']
-                dict_cits[paper_id] = len(paper['citations'])
-                print('success getting citations')
-                i=tries # we succeeded so max out the tries
-            except SemanticScholarException.ObjectNotFoundException as onfe:
-                ss_ids_not_found.append(ss_id)
-                print('failed cleanly to get citations')
-                i=tries # we failed cleanly so max out the tries
-            except Exception as e: # some kind of time out error
-                print('failed to get citations, trying again')
-                i = i+1  # if we still have more tries left then try it again
-            
+        if citation_counts[ss_id] is None:
+            ss_ids_not_found.append(ss_id)
+        else:
+            paper_id, n_cits = citation_counts[ss_id]
+            dict_cits[paper_id] = n_cits
     return dict_cits, ss_ids_not_found
 
 
-def get_bib_info(diag_bib_file, item): #diag_bib_file is the file read in as a string, item is row from csv
+def get_bib_info(diag_bib_file, diag_bib, item, fetcher=None, keys=None): #diag_bib_file is the file read in as a string, diag_bib the BibDatabase of it, item is row from csv
     #Get DOI information
 
     # if no ss_doi exists
@@ -102,131 +90,117 @@ def get_bib_info(diag_bib_file, item): #diag_bib_file is the file read in as a s
         return None
     
     # make sure doi is not already in diag.bib
-    if item['ss_doi'] in diag_bib_file:
-
-        start_index = diag_bib_file.find(item['ss_doi'])
-        end_index = diag_bib_file.find('}', start_index)  # Include the closing brace
-        matching_item_str = diag_bib_file[start_index:end_index]
-
-        print('DOI already exists in bib file. Matching item:', matching_item_str)
-
-        if matching_item_str == item['ss_doi']:
-            print('doi already exists in bib file, I will not add new bib entry', item['ss_doi'], item['ss_id'])
-            return None
-        
-        else:
-            print('similar doi already exists in bib file, but new item will be added for ', item['ss_doi'], item['ss_id'])
+    matching_entry = diag_bib.find_doi(item['ss_doi'])
+    if matching_entry is not None:
+        print('doi already exists in bib file, I will not add new bib entry', item['ss_doi'], item['ss_id'], 'matching item:', matching_entry.key)
+        return None
 
     # Get BibLatex information based on DOI if not in the file
-    reader = GetBiblatex(doi=item['ss_doi'], ss_id=item['ss_id'], diag_bib=diag_bib_file)
+    reader = GetBiblatex(doi=item['ss_doi'], ss_id=item['ss_id'], diag_bib=diag_bib_file, fetcher=fetcher, keys=keys)
     bibtext = reader.get_bib_text()
     # Return the bibtext if it is not 'empty', otherwise return None
     return bibtext if bibtext != 'empty' else None
 
 
-def add_ss_id_doi_pmid_to_existing_bibkey(diag_bib_raw, item_row):
+def add_ss_id_doi_pmid_to_existing_bibkey(diag_bib, item_row): # diag_bib is a BibDatabase
     ss_id = item_row['ss_id']
     bibkey = item_row['bibkey']
     #Update bibkey with ss_id
-    for ind, entry in enumerate(diag_bib_raw):
-        if entry.type == 'string':
-            continue
-
-        # if we found the relevant key
-        if bibkey == entry.key:
-            # print('entry matched is ', entry.fields)
-            # if there is already something in all_ss_ids
-            if 'all_ss_ids' in entry.fields.keys():
-                if not entry.fields['all_ss_ids'] == '{' + str(ss_id) + '}': # this should never happen, right? (from Keelin!)
-                    try:
-                        previous = literal_eval(entry.fields['all_ss_ids'].strip('{}'))
-                    except:
-                        previous = entry.fields['all_ss_ids'].strip('{}')
-                        previous_list = [previous]
-                        previous = [item.strip('[]') for item in previous_list]  
-                    new = ss_id
-                    combined = list(set(previous) | set([new]))
-                    # update the entry
-                    entry.fields['all_ss_ids'] = '{' + str(combined) + '}'
-            # if there is no ss_id here yet just add this single one
-            else:   
-                    entry.fields['all_ss_ids'] = '{' + str(ss_id) + '}'
-            print(str(ss_id), 'added to diag_bib_raw')
-
-            ss_doi = str(item_row['ss_doi']).strip()
-            if not 'doi' in entry.fields.keys() and len(ss_doi)>0:
-                print('will add doi to bibkey', bibkey,  ss_doi)
-                entry.fields['doi'] = '{' + ss_doi + '}'
-            ss_pmid = item_row['ss_pmid'].strip()
-            if not 'pmid' in entry.fields.keys() and len(ss_pmid)>0:
-                print('will add pmid to bibkey', bibkey,  ss_pmid)
-                entry.fields['pmid'] = '{' + ss_pmid + '}'
-
-
-            return [diag_bib_raw, 'Success']
+    entry = diag_bib.get(bibkey)
+    if entry is not None and entry.type != 'string':
+        # we found the relevant key
+        # print('entry matched is ', entry.fields)
+        # if there is already something in all_ss_ids
+        if 'all_ss_ids' in entry.fields.keys():
+            if not entry.fields['all_ss_ids'] == '{' + str(ss_id) + '}': # this should never happen, right? (from Keelin!)
+                try:
+                    previous = literal_eval(entry.fields['all_ss_ids'].strip('{}'))
+                except:
+                    previous = entry.fields['all_ss_ids'].strip('{}')
+                    previous_list = [previous]
+                    previous = [item.strip('[]') for item in previous_list]  
+                new = ss_id
+                combined = list(set(previous) | set([new]))
+                # update the entry
+                entry.fields['all_ss_ids'] = '{' + str(combined) + '}'
+        # if there is no ss_id here yet just add this single one
+        else:   
+                entry.fields['all_ss_ids'] = '{' + str(ss_id) + '}'
+        print(str(ss_id), 'added to diag_bib_raw')
+
+        ss_doi = str(item_row['ss_doi']).strip()
+        if not 'doi' in entry.fields.keys() and len(ss_doi)>0:
+            print('will add doi to bibkey', bibkey,  ss_doi)
+            entry.fields['doi'] = '{' + ss_doi + '}'
+        ss_pmid = item_row['ss_pmid'].strip()
+        if not 'pmid' in entry.fields.keys() and len(ss_pmid)>0:
+            print('will add pmid to bibkey', bibkey,  ss_pmid)
+            entry.fields['pmid'] = '{' + ss_pmid + '}'
+
+
+        return [diag_bib, 'Success']
         
     # if we haven't returned by now then we failed to update 
     print('failed to add ss_id to diag.bib', str(ss_id), str(bibkey))
-    return [diag_bib_raw, 'Fail']
+    return [diag_bib, 'Fail']
 
 
-def add_pmid_where_possible(diag_bib_raw, dict_bibkey_pmid):
-    # iterate through all items in the diag bib and update them if we have missing information on them
-    for ind, entry in enumerate(diag_bib_raw):
-        if entry.type == 'string':
+def add_pmid_where_possible(diag_bib, dict_bibkey_pmid): # diag_bib is a BibDatabase
+    # look up the items we have missing information on and update them
+    for current_bibkey, pmid in dict_bibkey_pmid.items():
+        entry = diag_bib.get(current_bibkey)
+        if entry is None or entry.type == 'string':
             continue
 
-        # if we found the relevant key
-        current_bibkey = entry.key
-        if current_bibkey in dict_bibkey_pmid.keys():
-            if not 'pmid' in entry.fields.keys() and len(dict_bibkey_pmid[current_bibkey].strip())>0:
-                print('will add pmid to bibkey', current_bibkey,  dict_bibkey_pmid[current_bibkey].strip())
-                entry.fields['pmid'] = '{' + dict_bibkey_pmid[current_bibkey].strip() + '}'
+        if not 'pmid' in entry.fields.keys() and len(pmid.strip())>0:
+            print('will add pmid to bibkey', current_bibkey,  pmid.strip())
+            entry.fields['pmid'] = '{' + pmid.strip() + '}'
+
+    return diag_bib
+
 
-    return diag_bib_raw
+def entry_ss_ids(entry):
+    # split on any whitespace, so double spaces or a trailing space in all_ss_ids do not give empty ids
+    return split_ss_ids(entry.fields['all_ss_ids'])
 
 
 def update_citation_count(diag_bib_raw):
     all_ss_ids_not_found = []
-    num_entries = len(diag_bib_raw)
-
-    sch = SemanticScholar(timeout=40)
-    sch.timeout=40
-    for ind, entry in enumerate(diag_bib_raw):
-        # print('checking citations', ind, 'of', num_entries)
-        flag=0
-        if entry.type == 'string':
+
+    # only the citation counts are fetched, for all ss_ids at once in batches, each ss_id once
+    entries = [entry for entry in diag_bib_raw if entry.type != 'string' and 'all_ss_ids' in entry.fields
+               and entry_ss_ids(entry)]
+    citation_counts, failed = fetch_citation_counts([ss_id for entry in entries for ss_id in entry_ss_ids(entry)])
+    if failed:
+        print('failed to get citations for', len(failed), 'ss ids, their entries are not updated')
+    failed = set(failed)
+    for entry in entries:
+        all_ss_ids = entry_ss_ids(entry)
+        if failed.intersection(all_ss_ids):
             continue
-        if 'all_ss_ids' in entry.fields:
-            all_ss_ids = []
-            ss_ids = entry.fields['all_ss_ids'].translate(str.maketrans('', '', string.punctuation)).split(' ')
-            if len(ss_ids) > 1:
-                all_ss_ids.extend(ss_ids)
-            else:
-                all_ss_ids.append(ss_ids[0])
-            print('trying with key', entry.key, 'and ss ids', all_ss_ids)
-            dict_cits, ss_ids_not_found_this_item = get_citations(all_ss_ids, sch)
-            if len(ss_ids_not_found_this_item)>0:
-                print('adding items to ss_ids_not_found', ss_ids_not_found_this_item)
-                all_ss_ids_not_found.extend(ss_ids_not_found_this_item)
-            n_cits = 0
-            for key in dict_cits.keys():
-                n_cits += dict_cits[key]
-            print('n_cits this item is ', n_cits)
-
-            if 'gscites' in entry.fields:
-                # only update if we are increasing the number of citations!!!
-                previous_cits = int(entry.fields['gscites'].strip('{}'))
-                if n_cits > previous_cits:
-                    print('updating', entry.key, 'from', previous_cits, 'to', n_cits)
-                    entry.fields['gscites'] = '{' + str(n_cits) + '}'
-                elif (previous_cits > (1.5 * n_cits)) and (previous_cits - n_cits > 10):
-                    print('warning: num citations calculated for this bibkey is much lower than previously suggested....', entry.key, previous_cits, n_cits)
-                else:
-                    print('will not update', entry.key, 'as there is no increase', n_cits, previous_cits)
-            else:
-                print('adding gscites', entry.key, n_cits)
+        print('trying with key', entry.key, 'and ss ids', all_ss_ids)
+        dict_cits, ss_ids_not_found_this_item = get_citations(all_ss_ids, citation_counts)
+        if len(ss_ids_not_found_this_item)>0:
+            print('adding items to ss_ids_not_found', ss_ids_not_found_this_item)
+            all_ss_ids_not_found.extend(ss_ids_not_found_this_item)
+        n_cits = 0
+        for key in dict_cits.keys():
+            n_cits += dict_cits[key]
+        print('n_cits this item is ', n_cits)
+
+        if 'gscites' in entry.fields:
+            # only update if we are increasing the number of citations!!!
+            previous_cits = int(entry.fields['gscites'].strip('{}'))
+            if n_cits > previous_cits:
+                print('updating', entry.key, 'from', previous_cits, 'to', n_cits)
                 entry.fields['gscites'] = '{' + str(n_cits) + '}'
+            elif (previous_cits > (1.5 * n_cits)) and (previous_cits - n_cits > 10):
+                print('warning: num citations calculated for this bibkey is much lower than previously suggested....', entry.key, previous_cits, n_cits)
+            else:
+                print('will not update', entry.key, 'as there is no increase', n_cits, previous_cits)
+        else:
+            print('adding gscites', entry.key, n_cits)
+            entry.fields['gscites'] = '{' + str(n_cits) + '}'
     print('done updating citations')
     return diag_bib_raw, all_ss_ids_not_found
 
@@ -247,7 +221,19 @@ def get_latest_manual_check_file(directory):
     return os.path.join(directory, latest_filename)
 
 
-def loop_manual_check(manually_checked, diag_bib_orig):
+def get_new_item_dois(manually_checked, diag_bib):
+    """dois of the items that get_bib_info will make a new bib entry for"""
+    dois = []
+    for index, bib_item in manually_checked.iterrows():
+        if bib_item['action'].strip() not in ("[add new item]", "[update item]"):
+            continue
+        if len(str(bib_item['ss_doi']))==0 or str(bib_item['ss_doi'])=='nan' or diag_bib.find_doi(bib_item['ss_doi']) is not None:
+            continue
+        dois.append(bib_item['ss_doi'])
+    return dois
+
+
+def loop_manual_check(manually_checked, diag_bib_orig, diag_bib, fetcher=None):
     # Iterate through all items in the manually checked csv
     blacklist_items = []
     items_to_add = ''
@@ -259,6 +245,14 @@ def loop_manual_check(manually_checked, diag_bib_orig):
     
     dict_new_items_bibkey_pmid = {}
     
+    # fetch the doi information of all new items concurrently first, get_bib_info then uses what was fetched
+    fetcher = fetcher or DoiFetcher()
+    new_item_dois = get_new_item_dois(manually_checked, diag_bib)
+    print(f"Fetching doi information of {len(new_item_dois)} new items")
+    fetcher.prefetch(new_item_dois)
+    # keys of new entries are reserved here, so two new entries never get the same key
+    keys = KeyAllocator(entry.key for entry in diag_bib)
+    
     
     for index, bib_item in manually_checked.iterrows():
         print(f"Working on {index}/{len(manually_checked)}: {bib_item['ss_doi']} (action is {bib_item['action']})")
@@ -271,7 +265,7 @@ def loop_manual_check(manually_checked, diag_bib_orig):
         # Add new item to diag.bib
         elif "[add new item]" == bib_item['action'].strip() or "[update item]" == bib_item['action'].strip():
            
-           bib_item_text = get_bib_info(diag_bib_orig, bib_item)
+           bib_item_text = get_bib_info(diag_bib_orig, diag_bib, bib_item, fetcher, keys)
            print(bib_item_text)
            if bib_item_text is not None:
                items_to_add += bib_item_text
@@ -322,38 +316,41 @@ def main():
     
     
 
-    # load bib file just for reading at this point
+    # load bib file, entries that are changed below are written back in place and the rest of the file is left as it is
     diag_bib_path = os.path.join('diag.bib')
 
-    diag_bib_raw = read_bibfile(None, diag_bib_path)
+    bib_file = IncrementalBibFile(diag_bib_path)
+    bib_file.load()
     remove_items = manually_checked[manually_checked['action']=='[update item]']['bibkey'].tolist()
-    diag_bib_raw = [entry for entry in diag_bib_raw if entry.key not in remove_items]
-    save_to_file(diag_bib_raw, None, 'diag.bib')
+    bib_file.remove(remove_items)
+    bib_file.save()
 
 
     with open(diag_bib_path, 'r', encoding="utf8") as orig_bib_file:
         diag_bib_orig = orig_bib_file.read()
 
-    blacklist_items, items_to_add, items_to_update, failed_new_items, failed_updated_items, failed_to_find_actions, dict_new_items_bibkey_pmid = loop_manual_check(manually_checked, diag_bib_orig)
+    # responses of doi.org are kept in .doicache, so running this again after a failure does not fetch them again
+    fetcher = DoiFetcher(cache_dir=os.path.join('.doicache'))
+    with BibDatabase(bib_file.entries) as diag_bib_before:
+        blacklist_items, items_to_add, items_to_update, failed_new_items, failed_updated_items, failed_to_find_actions, dict_new_items_bibkey_pmid = loop_manual_check(manually_checked, diag_bib_orig, diag_bib_before, fetcher)
+    fetcher.close()
     
-    #Add new bib entries to the diag.bib file
-    diag_bib_added_items = diag_bib_orig + items_to_add  
-    with open('diag.bib', 'w', encoding="utf8") as bibtex_file:
-        bibtex_file.write(diag_bib_added_items)
+    #Add new bib entries to the diag.bib file, only the added entries have to be parsed again
+    bib_file.append(items_to_add)
 
     # # Update newly added items with pmids where possible
-    diag_bib_raw = read_bibfile(None, 'diag.bib')
-    diag_bib_raw = add_pmid_where_possible(diag_bib_raw, dict_new_items_bibkey_pmid)
+    diag_bib = add_pmid_where_possible(BibDatabase(bib_file.entries), dict_new_items_bibkey_pmid)
 
     #Update existing bib entries with new ss_ids (and dois, pmids where possible)
     for item_to_update in items_to_update:
-        [diag_bib_raw, result] = add_ss_id_doi_pmid_to_existing_bibkey(diag_bib_raw, item_to_update)
+        [diag_bib, result] = add_ss_id_doi_pmid_to_existing_bibkey(diag_bib, item_to_update)
         if(result=='Fail'):
             failed_updated_items.append(item_to_update)
 
     # Update citation counts
-    diag_bib_raw_new_cits, ss_ids_not_found_for_citations = update_citation_count(diag_bib_raw)
-    save_to_file(diag_bib_raw_new_cits, None, 'diag.bib')
+    diag_bib_raw_new_cits, ss_ids_not_found_for_citations = update_citation_count(diag_bib)
+    diag_bib.close()
+    bib_file.save()
 
     # Update the blacklist
     blacklist_path = os.path.join(project_root, 'script_data', 'blacklist.csv')
@@ -383,7 +380,7 @@ def main():
     print(f"total processed items: {len(blacklist_items) + len(items_to_update) + items_to_add.count('{yes}') + len(failed_new_items) + len(failed_updated_items) + len(failed_to_find_actions) + count_action_none}")
     print(f"amount of items in manual checkfile: {manually_checked.shape[0]}")
 
-    save_to_file(diag_bib_raw_new_cits, None, 'diag.bib')
+    bib_file.save()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,60 @@
+"""
+Timing test for converting accented characters to latex, on the authors, titles and abstracts of diag.bib (or
+diag_orig_and_ss_merged.bib if diag.bib is not there). These are mostly latex already, so they are also converted
+back to unicode first, like the text GetBiblatex gets from doi.org. Compares one str.replace per item of
+accent_mappings, as GetBiblatex did before, with the compiled to_latex, and checks that both give the same text.
+Run from the root of the repository: python scripts/benchmarks/bench_accents.py
+"""
+
+import os
+import sys
+import time
+
+current_script_directory = os.path.dirname(os.path.realpath(__file__))
+project_root = os.path.abspath(os.path.join(current_script_directory, os.pardir))
+sys.path.append(os.path.join(project_root))
+from bib_handling_code.accents import to_latex
+from bib_handling_code.processbib import read_bibfile
+from script_data.accent_mappings import accent_mappings
+
+
+def replace_one_by_one(s):
+    for char, latex in accent_mappings.items():
+        s = s.replace(char, latex)
+    return s
+
+
+def to_unicode(s):
+    for char, latex in accent_mappings.items():
+        s = s.replace(latex, char)
+    return s
+
+
+def timed(f, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = f()
+        timings.append(time.perf_counter() - start)
+    return result, min(timings)
+
+
+def main():
+    root = os.path.abspath(os.path.join(project_root, os.pardir))
+    bib_path = os.path.join(root, "diag.bib")
+    if not os.path.exists(bib_path):
+        bib_path = os.path.join(root, "diag_orig_and_ss_merged.bib")
+    entries = read_bibfile(None, bib_path, cache=False)
+    fields = ("author", "title", "abstract")
+    texts = [e.fields[field] for e in entries for field in fields if field in e.fields]
+    for kind, inputs in (("as in the bib file", texts), ("converted to unicode", [to_unicode(t) for t in texts])):
+        legacy, legacy_time = timed(lambda: [replace_one_by_one(t) for t in inputs])
+        compiled, compiled_time = timed(lambda: [to_latex(t) for t in inputs])
+        assert compiled == legacy
+        print(f"{len(inputs)} fields of {os.path.basename(bib_path)} {kind} "
+              f"({sum(map(len, inputs)) / 1e6:.1f} M characters, {sum(not t.isascii() for t in inputs)} not ASCII)")
+        print(f"  {'str.replace per mapping':<26}{legacy_time:>8.4f} s")
+        print(f"  {'to_latex':<26}{compiled_time:>8.4f} s   speedup {legacy_time / compiled_time:.1f}x")
+
+if __name__ == "__main__":
+    main()
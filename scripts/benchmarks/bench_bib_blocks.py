@@ -0,0 +1,61 @@
+"""
+Micro-benchmark for get_bib_blocks, comparing the scanner that jumps between '@', '{' and '}' with the previous
+character by character loop that looked backwards with rfind for every block. Reports throughput in MB/s.
+Run from the root of the repository: python scripts/benchmarks/bench_bib_blocks.py
+"""
+
+import os
+import sys
+import time
+
+current_script_directory = os.path.dirname(os.path.realpath(__file__))
+project_root = os.path.abspath(os.path.join(current_script_directory, os.pardir))
+sys.path.append(os.path.join(project_root))
+from bib_handling_code.bibreader import get_bib_blocks
+
+bib_files = ["fullstrings.bib", "diag_taverne.bib"]
+
+
+def legacy_get_bib_blocks(content, start_character="@", delim=("{", "}")):
+    blocks = []
+    delimiter_stack = []
+    for i, c in enumerate(content):
+        if c == "{":
+            delimiter_stack.append(i)
+        elif c == "}" and delimiter_stack:
+            start = delimiter_stack.pop()
+            if len(delimiter_stack) == 0:
+                start_index = content.rfind(start_character, 0, start)
+                blocks.append((content[start_index:start], content[start + 1 : i]))
+    return blocks
+
+
+def throughput(f, content, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        blocks = f(content)
+        timings.append(time.perf_counter() - start)
+    return blocks, len(content.encode("utf-8")) / 2 ** 20 / min(timings)
+
+
+def main():
+    root = os.path.abspath(os.path.join(project_root, os.pardir))
+    print(f"{'file':<24}{'size (MB)':>10}{'legacy (MB/s)':>16}{'scanner (MB/s)':>16}")
+    for bib_file in bib_files:
+        path = os.path.join(root, bib_file)
+        if not os.path.exists(path):
+            print(f"{bib_file}: not found, skipping")
+            continue
+        with open(path, "rb") as f:
+            content = f.read().decode("utf-8-sig")
+
+        legacy_blocks, legacy = throughput(legacy_get_bib_blocks, content)
+        blocks, scanner = throughput(get_bib_blocks, content)
+        assert blocks == legacy_blocks, f"get_bib_blocks output changed for {bib_file}"
+        size = len(content.encode("utf-8")) / 2 ** 20
+        print(f"{bib_file:<24}{size:>10.2f}{legacy:>16.1f}{scanner:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
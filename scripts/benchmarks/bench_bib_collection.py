@@ -0,0 +1,54 @@
+"""
+Scaling test for load_bib_collection on all checked-in bib files.
+Loads the files with 1, 2, 4, ... worker processes up to the number of cores (or the number given on the command
+line), with the large files split into chunks, and compares the time with reading the files one by one with
+read_bibfile. Checks that every worker count gives the same entries as read_bibfile.
+Run from the root of the repository: python scripts/benchmarks/bench_bib_collection.py [max workers]
+"""
+
+import os
+import sys
+import time
+
+current_script_directory = os.path.dirname(os.path.realpath(__file__))
+project_root = os.path.abspath(os.path.join(current_script_directory, os.pardir))
+sys.path.append(os.path.join(project_root))
+from bib_handling_code.processbib import load_bib_collection, read_bibfile
+
+bib_files = ["diag.bib", "diagnoweb.bib", "diag_orig_and_ss_merged.bib", "diag_taverne.bib", "fullstrings.bib",
+             "medlinestrings.bib", "cara.bib"]
+chunk_size = 1 << 18
+
+
+def as_tuples(entries):
+    return [(e.key, e.type, e.value, dict(e.fields)) for e in entries]
+
+
+def timed(f, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = f()
+        timings.append(time.perf_counter() - start)
+    return result, min(timings)
+
+
+def main():
+    root = os.path.abspath(os.path.join(project_root, os.pardir))
+    paths = [os.path.join(root, f) for f in bib_files if os.path.exists(os.path.join(root, f))]
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count()
+    worker_counts = sorted({2 ** i for i in range(max_workers.bit_length()) if 2 ** i <= max_workers} | {max_workers})
+    print("Loaded:", ", ".join(os.path.basename(p) for p in paths), f"({os.cpu_count()} cores)")
+
+    serial, serial_time = timed(lambda: {p: read_bibfile(None, p, cache=False) for p in paths})
+    expected = {p: as_tuples(entries) for p, entries in serial.items()}
+    print(f"{'read_bibfile, one by one':<28}{serial_time:>8.3f} s")
+
+    for workers in worker_counts:
+        collection, seconds = timed(lambda: load_bib_collection(paths, workers=workers, chunk_size=chunk_size))
+        assert {p: as_tuples(entries) for p, entries in collection.items()} == expected, f"{workers} workers differ"
+        print(f"{f'{workers} worker(s)':<28}{seconds:>8.3f} s   speedup {serial_time / seconds:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Timing test for looking up entries of the largest checked-in bib file by key and by doi.
+Compares the linear scans the update scripts used before (a loop over all entries per key, a substring search in the
+raw file text per doi) with the indexes of BibDatabase, including the time to build them.
+Run from the root of the repository: python scripts/benchmarks/bench_bib_database.py
+"""
+
+import os
+import sys
+import time
+
+current_script_directory = os.path.dirname(os.path.realpath(__file__))
+project_root = os.path.abspath(os.path.join(current_script_directory, os.pardir))
+sys.path.append(os.path.join(project_root))
+from bib_handling_code.processbib import BibDatabase, read_bibfile, strip_cb
+
+bib_file = "diag_orig_and_ss_merged.bib"
+
+
+def legacy_find_key(entries, key):
+    for entry in entries:
+        if entry.type == 'string':
+            continue
+        if key == entry.key:
+            return entry
+    return None
+
+
+def legacy_doi_exists(text, doi):
+    if doi in text:
+        start_index = text.find(doi)
+        end_index = text.find('}', start_index)
+        return text[start_index:end_index] == doi
+    return False
+
+
+def timed(f):
+    start = time.perf_counter()
+    result = f()
+    return result, time.perf_counter() - start
+
+
+def main():
+    root = os.path.abspath(os.path.join(project_root, os.pardir))
+    path = os.path.join(root, bib_file)
+    entries = read_bibfile(None, path, cache=False)
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+
+    articles = [e for e in entries if e.type != 'string']
+    keys = [e.key for e in articles[::5]]
+    dois = [strip_cb(e.fields['doi']) for e in articles if e.fields.get('doi')][::5]
+    print(f"{bib_file}: {len(entries)} entries, {len(keys)} key and {len(dois)} doi lookups")
+
+    legacy_keys, legacy_key_time = timed(lambda: [legacy_find_key(entries, k) for k in keys])
+    legacy_dois, legacy_doi_time = timed(lambda: [legacy_doi_exists(text, d) for d in dois])
+    db, build_time = timed(lambda: BibDatabase(entries))
+    db_keys, key_time = timed(lambda: [db.get(k) for k in keys])
+    db_dois, doi_time = timed(lambda: [db.find_doi(d) is not None for d in dois])
+
+    assert legacy_keys == db_keys, "key lookups differ"
+    assert all(legacy_dois) and all(db_dois), "doi lookups differ"
+    print(f"build indexes:        {build_time:.3f} s")
+    print(f"key lookups, legacy:  {legacy_key_time:.3f} s")
+    print(f"key lookups, index:   {key_time:.4f} s")
+    print(f"doi lookups, legacy:  {legacy_doi_time:.3f} s")
+    print(f"doi lookups, index:   {doi_time:.4f} s")
+
+
+if __name__ == "__main__":
+    main()
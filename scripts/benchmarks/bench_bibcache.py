@@ -0,0 +1,65 @@
+"""
+Benchmark for the on-disk cache of parsed bib files.
+Times read_bibfile and parse_bibtex_file without the cache, with a cold cache (parse and store) and with a warm
+cache (load the stored result).
+Run from the root of the repository: python scripts/benchmarks/bench_bibcache.py
+"""
+
+import os
+import sys
+import time
+
+import latexcodec  # registers the ulatex codec used by bibreader
+
+current_script_directory = os.path.dirname(os.path.realpath(__file__))
+project_root = os.path.abspath(os.path.join(current_script_directory, os.pardir))
+sys.path.append(os.path.join(project_root))
+from bib_handling_code.bibcache import cache_file
+from bib_handling_code.bibreader import parse_bibtex_file
+from bib_handling_code.processbib import read_bibfile
+
+bib_files = ["diag_orig_and_ss_merged.bib", "diag_taverne.bib"]
+
+
+def timed(f):
+    start = time.perf_counter()
+    f()
+    return time.perf_counter() - start
+
+
+def remove(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def main():
+    root = os.path.abspath(os.path.join(project_root, os.pardir))
+    full_strings = os.path.join(root, "fullstrings.bib")
+    print(f"{'file':<32}{'function':<20}{'no cache':>10}{'cold':>10}{'warm':>10}")
+    for bib_file in bib_files:
+        path = os.path.join(root, bib_file)
+        if not os.path.exists(path):
+            print(f"{bib_file}: not found, skipping")
+            continue
+
+        functions = {
+            "read_bibfile": (
+                lambda cache: read_bibfile(None, path, cache=cache),
+                [cache_file(path, "read_bibfile")],
+            ),
+            "parse_bibtex_file": (
+                lambda cache: parse_bibtex_file(path, full_strings, cache=cache),
+                [cache_file(path, "bibtex_file"), cache_file(full_strings, "full_strings")],
+            ),
+        }
+        for name, (f, cache_files) in functions.items():
+            no_cache = timed(lambda: f(False))
+            for fn in cache_files:
+                remove(fn)
+            cold = timed(lambda: f(True))
+            warm = min(timed(lambda: f(True)) for _ in range(3))
+            print(f"{bib_file:<32}{name:<20}{no_cache:>10.3f}{cold:>10.3f}{warm:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Timing test for the matching stage of generate_manual_check_csv on synthetic Semantic Scholar items.
+The items are made from the entries of diag.bib (or diag_orig_and_ss_merged.bib if diag.bib is not there): some keep
+the ss_id of their entry, some only its doi, the rest are new. Compares the boolean mask lookups in df_found_items
+used before with the lookups in dicts keyed on ss_id and doi, and checks that both give the same rows.
+Run from the root of the repository: python scripts/benchmarks/bench_doi_match.py [number of items]
+"""
+
+import os
+import random
+import string
+import sys
+import time
+from difflib import SequenceMatcher
+
+import pandas as pd
+
+current_script_directory = os.path.dirname(os.path.realpath(__file__))
+project_root = os.path.abspath(os.path.join(current_script_directory, os.pardir))
+sys.path.append(os.path.join(project_root))
+sys.path.append(os.path.join(project_root, "automatic_update"))
+from bib_handling_code.processbib import normalize_doi, read_bibfile
+from generate_manual_check_csv import find_doi_match, from_bib_to_csv, return_existing_dois
+
+ss_columns = ['staff_id', 'staff_name', 'staff_from', 'staff_till', 'ss_year', 'ss_id', 'title', 'doi', 'ss_citations',
+              'pmid', 'authors', 'journal']
+
+
+def legacy_find_doi_match(df_bib, df_found_items, found_items, found_dois, actions_list):
+    list_doi_match = []
+    not_new = []
+    ss_id_match = []
+    update_item = []
+    update_item_ssid = []
+    all_dois = return_existing_dois(df_bib)
+    for index, row in df_bib.iterrows():
+        doi = row.iloc[4]
+        ss_ids = row.iloc[8]
+        all_ss_ids = []
+        if ss_ids is not None:
+            all_ss_ids = ss_ids.split(',')
+            for i, el in enumerate(all_ss_ids):
+                all_ss_ids[i] = el.translate(str.maketrans('', '', string.punctuation)).strip()
+        for ss_id in all_ss_ids:
+            if ss_id in found_items:
+                ss_doi = df_found_items[df_found_items['ss_id'] == ss_id]['doi'].item()
+                if ss_doi:
+                    ss_doi = normalize_doi(ss_doi)
+                    doi = normalize_doi(doi)
+                    if ss_doi != doi and ss_doi not in all_dois and (doi == '' or 'arxiv' in doi):
+                        update_item.append((row.iloc[0], ss_id, f'https://www.semanticscholar.org/paper/{ss_id}', 1, doi, ss_doi, row.iloc[2], df_found_items[df_found_items['ss_id']==ss_id]['title'].item(), df_found_items[df_found_items['ss_id']==ss_id]['staff_id'].item(), df_found_items[df_found_items['ss_id']==ss_id]['staff_name'].item(), row.iloc[3], df_found_items[df_found_items['ss_id']==ss_id]['authors'].item(), row.iloc[6], df_found_items[df_found_items['ss_id']==ss_id]['journal'].item(), row.iloc[7], df_found_items[df_found_items['ss_id']==ss_id]['ss_year'].item(), row.iloc[1], df_found_items[df_found_items['ss_id']==ss_id]['pmid'].item(), 'update item', actions_list))
+                        update_item_ssid.append(ss_id)
+                    else:
+                        not_new.append(ss_id)
+                else:
+                    not_new.append(ss_id)
+        if doi is not None and doi in found_dois:
+            idx = found_dois.index(doi)
+            ss_id = found_items[idx]
+            if ss_id not in all_ss_ids:
+                pmid=df_found_items[df_found_items['ss_id'] ==ss_id]['pmid'].item()
+                ss_title=df_found_items[df_found_items['ss_id']==ss_id]['title'].item()
+                ss_authors = df_found_items[df_found_items['ss_id']==ss_id]['authors'].item()
+                ss_journal = df_found_items[df_found_items['ss_id']==ss_id]['journal'].item()
+                ss_year = int(df_found_items[df_found_items['ss_id']==ss_id]['ss_year'].item())
+                staff_id = int(df_found_items[df_found_items['ss_id']==ss_id]['staff_id'].item())
+                staff_name = df_found_items[df_found_items['ss_id']==ss_id]['staff_name'].item()
+                ratio = SequenceMatcher(a=ss_title,b=row.iloc[2]).ratio()
+                ss_id_match.append(ss_id)
+                list_doi_match.append((row.iloc[0], ss_id, 'https://www.semanticscholar.org/paper/'+ss_id, ratio, doi, doi, row.iloc[2], ss_title, staff_id, staff_name, row.iloc[3], ss_authors, row.iloc[6], ss_journal, row.iloc[7], ss_year, row.iloc[1], pmid, 'doi match', actions_list))
+    return not_new, ss_id_match, list_doi_match, update_item, update_item_ssid
+
+
+def synthetic_items(df_bib, n, seed=0):
+    """n found items, a quarter with the ss_id of a bib entry, a quarter with the doi of a bib entry"""
+    rng = random.Random(seed)
+    with_ss_id = [row for row in df_bib.itertuples(index=False) if row.all_ss_ids]
+    with_doi = [row for row in df_bib.itertuples(index=False) if row.doi]
+    items = []
+    used_ss_ids = set()
+    for i in range(n):
+        ss_id = ''.join(rng.choices('0123456789abcdef', k=40))
+        title, doi = f"synthetic paper {i}", rng.choice([None, f"10.9999/synthetic.{i}"])
+        kind = rng.random()
+        if kind < 0.25:
+            row = rng.choice(with_ss_id)
+            bib_ss_id = row.all_ss_ids.split(',')[0].translate(str.maketrans('', '', string.punctuation)).strip()
+            if bib_ss_id not in used_ss_ids:
+                ss_id, title = bib_ss_id, row.title
+                # some of them have a new doi, these become update items
+                doi = rng.choice([normalize_doi(row.doi) or None, f"10.9999/update.{i}"])
+        elif kind < 0.5:
+            row = rng.choice(with_doi)
+            title, doi = row.title, row.doi
+        used_ss_ids.add(ss_id)
+        items.append([8038506, 'Bram van Ginneken', 2000, 2100, 2015 + i % 10, ss_id, title, doi, i % 50,
+                      str(30000000 + i), 'B. van Ginneken and C. Jacobs', 'Radiology'])
+    # object columns keep None for a missing doi, which is what the matching code checks for
+    return pd.DataFrame(items, columns=ss_columns, dtype=object)
+
+
+def timed(f):
+    start = time.perf_counter()
+    result = f()
+    return result, time.perf_counter() - start
+
+
+def main():
+    root = os.path.abspath(os.path.join(project_root, os.pardir))
+    bib_path = os.path.join(root, "diag.bib")
+    if not os.path.exists(bib_path):
+        bib_path = os.path.join(root, "diag_orig_and_ss_merged.bib")
+    df_bib = from_bib_to_csv(read_bibfile(None, bib_path, cache=False))
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    df_found_items = synthetic_items(df_bib, n)
+    found_items = df_found_items['ss_id'].tolist()
+    found_dois = df_found_items['doi'].tolist()
+    actions_list = '[add ss_id, blacklist ss_id, add new item, add manually, update_item, None]'
+    args = (df_bib, df_found_items, found_items, found_dois, actions_list)
+    print(f"{n} synthetic items against {len(df_bib)} entries of {os.path.basename(bib_path)}")
+
+    legacy, legacy_time = timed(lambda: legacy_find_doi_match(*args))
+    keyed, keyed_time = timed(lambda: find_doi_match(*args))
+    assert keyed == legacy
+    print(f"not new {len(keyed[0])}, doi matches {len(keyed[2])}, update items {len(keyed[3])}")
+    print(f"{'boolean masks':<16}{legacy_time:>8.3f} s")
+    print(f"{'keyed lookups':<16}{keyed_time:>8.3f} s   speedup {legacy_time / keyed_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Timing test for duplicate detection on the checked-in bib files, merged into one list and then repeated to show how
+both approaches grow. Compares the nested loop check_duplicates used before (key pairs only) with the single pass
+grouping of duplicate_clusters on key, doi, title and first author plus year.
+Run from the root of the repository: python scripts/benchmarks/bench_duplicates.py
+"""
+
+import os
+import sys
+import time
+
+current_script_directory = os.path.dirname(os.path.realpath(__file__))
+project_root = os.path.abspath(os.path.join(current_script_directory, os.pardir))
+sys.path.append(os.path.join(project_root))
+from bib_handling_code.duplicates import duplicate_clusters
+from bib_handling_code.processbib import read_bibfile, strip_cb
+
+bib_files = ["diag_orig_and_ss_merged.bib", "diag_taverne.bib"]
+
+
+def legacy_duplicate_pairs(entries):
+    pairs = []
+    for i in range(len(entries)):
+        key1 = strip_cb(entries[i].key).lower()
+        for j in range(i + 1, len(entries)):
+            key2 = strip_cb(entries[j].key).lower()
+            if key1 == key2:
+                pairs.append((entries[i].key, entries[j].key))
+    return pairs
+
+
+def timed(f):
+    start = time.perf_counter()
+    result = f()
+    return result, time.perf_counter() - start
+
+
+def main():
+    root = os.path.abspath(os.path.join(project_root, os.pardir))
+    entries = [e for f in bib_files for e in read_bibfile(None, os.path.join(root, f), cache=False) if e.type != 'string']
+
+    print(f"{'entries':>8}{'nested loop (s)':>18}{'clusters (s)':>15}{'pairs':>8}{'key clusters':>14}")
+    for factor in (1, 2, 4):
+        merged = entries * factor
+        pairs, legacy = timed(lambda: legacy_duplicate_pairs(merged))
+        clusters, grouped = timed(lambda: duplicate_clusters((e.key, e.fields) for e in merged))
+        key_clusters = [c for c in clusters if c.kind == "key"]
+        # every key cluster of n entries stands for n * (n - 1) / 2 pairs of the nested loop
+        assert len(pairs) == sum(len(c.keys) * (len(c.keys) - 1) // 2 for c in key_clusters)
+        print(f"{len(merged):>8}{legacy:>18.3f}{grouped:>15.3f}{len(pairs):>8}{len(key_clusters):>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark for key-only scans with read_bibfile, comparing the eager parser with the memory mapped lazy mode.
+Reports the time to load a bib file and collect all keys, and the peak allocations (tracemalloc) while doing so.
+Run from the root of the repository: python scripts/benchmarks/bench_lazy_read.py
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+current_script_directory = os.path.dirname(os.path.realpath(__file__))
+project_root = os.path.abspath(os.path.join(current_script_directory, os.pardir))
+sys.path.append(os.path.join(project_root))
+from bib_handling_code.processbib import read_bibfile
+
+bib_files = ["diag_orig_and_ss_merged.bib", "diag_taverne.bib"]
+
+
+def key_scan(path, lazy):
+    return [e.key for e in read_bibfile(None, path, lazy=lazy, cache=False) if e.type != 'string']
+
+
+def measure(path, lazy, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        keys = key_scan(path, lazy)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    key_scan(path, lazy)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return keys, min(timings), peak
+
+
+def main():
+    root = os.path.abspath(os.path.join(project_root, os.pardir))
+    print(f"{'file':<32}{'mode':<8}{'time (s)':>10}{'peak (MB)':>12}")
+    for bib_file in bib_files:
+        path = os.path.join(root, bib_file)
+        if not os.path.exists(path):
+            print(f"{bib_file}: not found, skipping")
+            continue
+        results = {}
+        for lazy in (False, True):
+            keys, seconds, peak = measure(path, lazy)
+            results[lazy] = keys
+            print(f"{bib_file:<32}{'lazy' if lazy else 'eager':<8}{seconds:>10.3f}{peak / 2 ** 20:>12.1f}")
+        assert results[False] == results[True], f"lazy and eager keys differ for {bib_file}"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Memory benchmark for fully loaded bib files, measured with tracemalloc.
+Compares the memory kept alive by read_bibfile with __slots__ BibEntry objects against entries that carry a
+per-instance __dict__ and the parse scratch attributes, like BibEntry used to. Also reports the memory kept alive by
+parse_bibtex_file, where repeated author names share one cached Name tuple.
+Run from the root of the repository: python scripts/benchmarks/bench_memory.py
+"""
+
+import gc
+import os
+import sys
+import tracemalloc
+
+import latexcodec  # registers the ulatex codec used by bibreader
+
+current_script_directory = os.path.dirname(os.path.realpath(__file__))
+project_root = os.path.abspath(os.path.join(current_script_directory, os.pardir))
+sys.path.append(os.path.join(project_root))
+from bib_handling_code import processbib
+from bib_handling_code.authors import parse_name, split_authors
+from bib_handling_code.bibreader import parse_bibtex_file
+from bib_handling_code.processbib import BibEntry, read_bibfile
+
+# diag.bib and diagnoweb.bib are not checked in, these are the largest bib files that are
+bib_files = ["diag_orig_and_ss_merged.bib", "diag_taverne.bib"]
+
+
+class DictBibEntry(BibEntry):
+    """BibEntry with a per-instance __dict__ that keeps the parse scratch state, like before"""
+
+    def parse(self, lines):
+        super().parse(lines)
+        self.line = ""
+        self.string = ""
+
+
+def retained(load):
+    """returns what load() returns and the memory that stays allocated for it, in MB"""
+    gc.collect()
+    tracemalloc.start()
+    result = load()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current / 2 ** 20
+
+
+def load_entries(paths, entry_class):
+    processbib.BibEntry = entry_class
+    try:
+        return [read_bibfile(None, path, cache=False) for path in paths]
+    finally:
+        processbib.BibEntry = BibEntry
+
+
+def main():
+    root = os.path.abspath(os.path.join(project_root, os.pardir))
+    paths = [os.path.join(root, bib_file) for bib_file in bib_files if os.path.exists(os.path.join(root, bib_file))]
+    full_strings = os.path.join(root, "fullstrings.bib")
+    print("Loaded:", ", ".join(os.path.basename(p) for p in paths))
+
+    _, with_dict = retained(lambda: load_entries(paths, DictBibEntry))
+    _, with_slots = retained(lambda: load_entries(paths, BibEntry))
+    print(f"read_bibfile, __dict__ entries:  {with_dict:8.1f} MB")
+    print(f"read_bibfile, __slots__ entries: {with_slots:8.1f} MB")
+
+    parse_name.cache_clear()
+    split_authors.cache_clear()
+    bib_items, parsed = retained(lambda: [parse_bibtex_file(p, full_strings, cache=False) for p in paths])
+    n_names = sum(len(item.get("author", [])) for items in bib_items for item in items.values())
+    print(f"parse_bibtex_file:               {parsed:8.1f} MB "
+          f"({n_names} author names, {parse_name.cache_info().currsize} distinct)")
+
+
+if __name__ == "__main__":
+    main()
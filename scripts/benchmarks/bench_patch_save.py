@@ -0,0 +1,80 @@
+"""
+Timing test for writing a handful of edits back to the largest checked-in bib file.
+Compares save_to_file, which serializes and writes every entry, with IncrementalBibFile.save, which copies the text
+of unchanged entries from the file and only serializes the edited ones. Reports the write time and the number of
+changed lines in the file for an increasing number of edited entries.
+Run from the root of the repository: python scripts/benchmarks/bench_patch_save.py
+"""
+
+import difflib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+current_script_directory = os.path.dirname(os.path.realpath(__file__))
+project_root = os.path.abspath(os.path.join(current_script_directory, os.pardir))
+sys.path.append(os.path.join(project_root))
+from bib_handling_code.processbib import IncrementalBibFile, read_bibfile, save_to_file
+
+bib_file = "diag_orig_and_ss_merged.bib"
+edit_counts = [1, 10, 100]
+
+
+def edit(entries, n):
+    """sets gscites on n entries spread over the file, returns their keys"""
+    entries = [e for e in entries if e.type != 'string']
+    edited = entries[::max(1, len(entries) // n)][:n]
+    for e in edited:
+        e.fields['gscites'] = '{12345}'
+    return {e.key for e in edited}
+
+
+def read_back(path):
+    return {e.key: (e.type, dict(e.fields)) for e in read_bibfile(None, path, cache=False)}
+
+
+def changed_lines(before, after):
+    with open(before, encoding="utf-8") as f:
+        a = f.read().splitlines()
+    with open(after, encoding="utf-8") as f:
+        b = f.read().splitlines()
+    return sum(1 for l in difflib.unified_diff(a, b, lineterm='', n=0) if l[:1] in '+-' and l[:3] not in ('+++', '---'))
+
+
+def main():
+    root = os.path.abspath(os.path.join(project_root, os.pardir))
+    source = os.path.join(root, bib_file)
+    original = read_back(source)
+
+    print(f"{'edits':>6}{'writer':>16}{'time (s)':>10}{'changed lines':>15}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in edit_counts:
+            path = os.path.join(tmp, bib_file)
+
+            shutil.copy(source, path)
+            entries = read_bibfile(None, path, cache=False)
+            edit(entries, n)
+            start = time.perf_counter()
+            save_to_file(entries, None, path)
+            full = time.perf_counter() - start
+            print(f"{n:>6}{'save_to_file':>16}{full:>10.3f}{changed_lines(source, path):>15}")
+            saved = read_back(path)
+
+            shutil.copy(source, path)
+            bib = IncrementalBibFile(path, persist=False)
+            bib.load()
+            edited = edit(bib.entries, n)
+            start = time.perf_counter()
+            bib.save()
+            patch = time.perf_counter() - start
+            print(f"{n:>6}{'patch':>16}{patch:>10.3f}{changed_lines(source, path):>15}")
+
+            # edited entries read back like after save_to_file, the others like they were in the original file
+            expected = {k: saved[k] if k in edited else v for k, v in original.items()}
+            assert read_back(path) == expected, "patched file differs from the edits made"
+
+
+if __name__ == "__main__":
+    main()
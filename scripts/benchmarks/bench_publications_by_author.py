@@ -0,0 +1,87 @@
+"""
+Benchmark for get_publications_by_author on a synthetic corpus of 200 researchers and 20k bib items.
+Compares the last name index with the previous loop that matched every author against every researcher.
+Run from the root of the repository: python scripts/benchmarks/bench_publications_by_author.py
+"""
+
+import os
+import random
+import sys
+import time
+
+current_script_directory = os.path.dirname(os.path.realpath(__file__))
+project_root = os.path.abspath(os.path.join(current_script_directory, os.pardir))
+sys.path.append(os.path.join(project_root))
+from bib_handling_code.authors import get_publications_by_author, match_author_publication, parse_name
+
+n_researchers = 200
+n_items = 20000
+
+first_names = ["Bram", "Colin", "Geert", "Keelin", "Ajay", "James", "Alessa", "Jeroen", "Francesco", "Nadieh",
+               "Henkjan", "Matthieu", "Clarisa", "Jonas", "Peter", "Nikolas", "Anna", "Maria", "Thomas", "Lisa"]
+last_names = ["Ginneken", "Jacobs", "Litjens", "Murphy", "Patel", "Meakin", "Hering", "Laak", "Ciompi", "Khalili",
+              "Huisman", "Rutten", "Sanchez", "Teuwen", "Koopmans", "Lessmann", "Smith", "Jansen", "de Vries",
+              "Bakker", "Visser", "Smit", "Meijer", "Mulder", "Bos", "Vos", "Peters", "Hendriks", "Dekker", "Brouwer"]
+
+
+def legacy_get_publications_by_author(bib_items, list_researchers):
+    author_bibkeys = {}
+    for bib_key, bib_item in bib_items.items():
+        if "author" not in bib_item:
+            continue
+        authors = bib_item["author"]
+        for name, value in list_researchers.items():
+            researcher_name, _, _, _, _ = value
+            firstname = researcher_name[0].lower()
+            lastnames = [n.lower() for n in researcher_name[1:]]
+            if len(lastnames) > 1:
+                lastnames.append("-".join(lastnames))
+            for author_pub in authors:
+                if match_author_publication(firstname, lastnames, author_pub, bib_key):
+                    author_bibkeys.setdefault(name.lower(), []).append(bib_key)
+    return author_bibkeys
+
+
+def synthetic_corpus(seed=0):
+    rng = random.Random(seed)
+    list_researchers = {}
+    for i in range(n_researchers):
+        first = rng.choice(first_names)
+        last = rng.choice(last_names) + ("" if i < len(last_names) else f"x{i}")
+        pub_name = [first] + last.split()
+        name = f"{first}-{last.replace(' ', '-')}".lower()
+        list_researchers[name] = (pub_name, ["diag"], name.replace("-", " "), f"{first} {last}", "yes")
+
+    researchers = list(list_researchers.values())
+    bib_items = {}
+    for i in range(n_items):
+        names = []
+        for _ in range(rng.randint(1, 10)):
+            if rng.random() < 0.3:
+                pub_name = rng.choice(researchers)[0]
+                first = pub_name[0] if rng.random() < 0.5 else pub_name[0][0] + "."
+                names.append(" ".join(pub_name[1:]) + ", " + first)
+            else:
+                names.append(rng.choice(last_names) + ", " + rng.choice(first_names))
+        bib_items[f"item{i}"] = {"author": [parse_name(n) for n in names]}
+    return bib_items, list_researchers
+
+
+def timed(f, *args):
+    start = time.perf_counter()
+    result = f(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    bib_items, list_researchers = synthetic_corpus()
+    legacy, legacy_seconds = timed(legacy_get_publications_by_author, bib_items, list_researchers)
+    indexed, indexed_seconds = timed(get_publications_by_author, bib_items, list_researchers)
+    assert legacy == indexed and list(legacy) == list(indexed), "indexed matching changed the output"
+    print(f"{n_researchers} researchers, {n_items} bib items, {sum(map(len, indexed.values()))} matches")
+    print(f"legacy:  {legacy_seconds:.2f} s")
+    print(f"indexed: {indexed_seconds:.2f} s ({legacy_seconds / indexed_seconds:.0f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
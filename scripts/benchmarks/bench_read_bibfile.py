@@ -0,0 +1,106 @@
+"""
+Benchmark for reading bib files with read_bibfile.
+Compares the field tokenizer used by BibEntry.parse with the previous parser, which sliced the remainder of the
+entry text again for every field. Reports parse time and peak allocations (tracemalloc) per checked-in bib file.
+Run from the root of the repository: python scripts/benchmarks/bench_read_bibfile.py
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+current_script_directory = os.path.dirname(os.path.realpath(__file__))
+project_root = os.path.abspath(os.path.join(current_script_directory, os.pardir))
+sys.path.append(os.path.join(project_root))
+from bib_handling_code import processbib
+from bib_handling_code.processbib import BibEntry, read_bibfile
+
+bib_files = ["diag_orig_and_ss_merged.bib", "diag_taverne.bib", "fullstrings.bib", "medlinestrings.bib"]
+
+
+class LegacyBibEntry(BibEntry):
+    """BibEntry with the previous field parsing, which eats one field at a time from the remaining line"""
+
+    def parse(self, lines):
+        self.line = ''
+        for i in range(0, len(lines)):
+            self.line += lines[i]
+            self.line += ' '
+        self.line = self.line.strip()
+        if len(self.line) == 0:
+            return
+        i = self.line.find("{")
+        self.type = self.line[1:i].strip().lower()
+        if self.type in ('string', 'comment'):
+            return super().parse(lines)
+        j = self.line.find(",")
+        self.key = self.line[i + 1:j].strip()
+        self.line = self.line[j + 1:len(self.line)].strip()
+        self.line = self.line[:-1] + ",}"
+        while self.get_field_value():
+            pass
+
+    def get_field_value(self):
+        i = self.line.find("=")
+        if i < 0:
+            return False
+        field = self.line[0:i].strip()
+        self.line = self.line[i + 1:len(self.line)]
+        comma = self.line.find(",")
+        brace = self.line.find("{")
+        if brace > -1 and comma > -1 and brace < comma:
+            count = 1
+            i = brace + 1
+            while count > 0:
+                if self.line[i] == "}":
+                    count -= 1
+                if self.line[i] == "{":
+                    count += 1
+                i += 1
+            self.value = self.line[brace:i].strip()
+            self.line = self.line[i + 1:len(self.line)].strip()
+        else:
+            comma = self.line.find(",")
+            self.value = self.line[0:comma].strip()
+            self.line = self.line[comma + 1:len(self.line)].strip()
+        self.fields[field] = self.value
+        return True
+
+
+def measure(path, entry_class, repeat=3):
+    processbib.BibEntry = entry_class
+    try:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            entries = read_bibfile(None, path, cache=False)
+            timings.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        read_bibfile(None, path, cache=False)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        processbib.BibEntry = BibEntry
+    return entries, min(timings), peak
+
+
+def main():
+    root = os.path.abspath(os.path.join(project_root, os.pardir))
+    print(f"{'file':<32}{'parser':<12}{'time (s)':>10}{'peak (MB)':>12}")
+    for bib_file in bib_files:
+        path = os.path.join(root, bib_file)
+        if not os.path.exists(path):
+            print(f"{bib_file}: not found, skipping")
+            continue
+        results = {}
+        for name, entry_class in (("legacy", LegacyBibEntry), ("tokenizer", BibEntry)):
+            entries, seconds, peak = measure(path, entry_class)
+            results[name] = [e.fields for e in entries]
+            print(f"{bib_file:<32}{name:<12}{seconds:>10.3f}{peak / 2 ** 20:>12.1f}")
+        assert results["legacy"] == results["tokenizer"], f"parsers disagree on {bib_file}"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Timing test for save_to_file on the largest checked-in bib file.
+Compares the key to entry map and single buffered write with the previous save, which scanned all entries for every
+key and wrote entry by entry, and checks that both produce byte-identical files. The first save of freshly read
+entries is timed separately from repeated saves, which find the ASCII versions of the values in the to_ascii cache.
+Run from the root of the repository: python scripts/benchmarks/bench_save_to_file.py
+"""
+
+import io
+import os
+import sys
+import tempfile
+import time
+
+current_script_directory = os.path.dirname(os.path.realpath(__file__))
+project_root = os.path.abspath(os.path.join(current_script_directory, os.pardir))
+sys.path.append(os.path.join(project_root))
+from bib_handling_code.processbib import read_bibfile, save_to_file
+
+bib_file = "diag_orig_and_ss_merged.bib"
+
+
+def legacy_save_to_file(entries, full_path):
+    keys = list()
+    stringkeys = list()
+    for i in entries:
+        l = i.to_lines()
+        if i.type == 'string':
+            stringkeys.append(i.key)
+        else:
+            keys.append(i.key)
+    keys.sort()
+    stringkeys.sort()
+
+    file = io.open(full_path, 'w', newline='\r\n', encoding="utf-8")
+    for i in stringkeys:
+        for j in entries:
+            if j.key == i:
+                file.writelines(j.to_lines())
+                break
+    for i in keys:
+        for j in entries:
+            if j.key == i:
+                file.write("\n")
+                file.writelines(j.to_lines())
+                break
+    file.close()
+
+
+def timed(f, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    root = os.path.abspath(os.path.join(project_root, os.pardir))
+    path = os.path.join(root, bib_file)
+    # freshly read entries for every timed run
+    fresh = [read_bibfile(None, path, cache=False) for _ in range(6)]
+    entries = fresh.pop()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.bib")
+        new_path = os.path.join(tmp, "new.bib")
+        atomic_path = os.path.join(tmp, "atomic.bib")
+
+        legacy = timed(lambda: legacy_save_to_file(fresh.pop(), legacy_path), repeat=2)
+        first = timed(lambda: save_to_file(fresh.pop(), None, new_path), repeat=3)
+        save_to_file(entries, None, new_path)
+        repeated = timed(lambda: save_to_file(entries, None, new_path))
+        atomic = timed(lambda: save_to_file(entries, None, atomic_path, atomic=True))
+
+        with open(legacy_path, "rb") as f:
+            expected = f.read()
+        for path in (new_path, atomic_path):
+            with open(path, "rb") as f:
+                assert f.read() == expected, f"{os.path.basename(path)} differs from the previous save"
+
+    print(f"{bib_file}: {len(entries)} entries")
+    print(f"legacy:         {legacy:.3f} s")
+    print(f"first save:     {first:.3f} s")
+    print(f"repeated save:  {repeated:.3f} s")
+    print(f"atomic save:    {atomic:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
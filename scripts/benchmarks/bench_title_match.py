@@ -0,0 +1,55 @@
+"""
+Timing test for the title matching of find_title_match_or_new_items on the historical data in scripts/old_data.
+Compares computing the SequenceMatcher ratio with every bib title (the pandas apply used before) with TitleMatcher,
+which only compares with bib titles sharing an informative word, and checks that both find the same titles above 0.8.
+Run from the root of the repository: python scripts/benchmarks/bench_title_match.py [number of titles]
+"""
+
+import csv
+import os
+import sys
+import time
+from difflib import SequenceMatcher
+
+import pandas as pd
+
+current_script_directory = os.path.dirname(os.path.realpath(__file__))
+project_root = os.path.abspath(os.path.join(current_script_directory, os.pardir))
+sys.path.append(os.path.join(project_root))
+from bib_handling_code.titlematch import TitleMatcher
+
+old_data = os.path.join(project_root, "old_data")
+
+
+def legacy_matches(df_bib, ss_title):
+    title_match_ratios = df_bib['title'].apply(lambda x: SequenceMatcher(
+            a=ss_title.lower(),
+            b=x.lower().replace('{', '').replace('}', '')).ratio())
+    return list(df_bib[title_match_ratios > 0.8].index)
+
+
+def main():
+    df_bib = pd.read_csv(os.path.join(old_data, "temp_diag_bib_summary.csv"), keep_default_na=False)
+    with open(os.path.join(old_data, "temp_title_match_data.csv"), newline="", encoding="utf-8") as f:
+        titles = [row["ss_title"] for row in csv.DictReader(f)]
+    titles = titles[:int(sys.argv[1])] if len(sys.argv) > 1 else titles[:50]
+    print(f"{len(titles)} titles against {len(df_bib)} bib titles")
+
+    start = time.perf_counter()
+    legacy = [legacy_matches(df_bib, t) for t in titles]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matcher = TitleMatcher(df_bib['title'].tolist())
+    build_time = time.perf_counter() - start
+    blocked = [[i for i, _ in matcher.match(t)[2]] for t in titles]
+    blocked_time = time.perf_counter() - start
+
+    assert blocked == legacy
+    print(f"{'every bib title (pandas apply)':<34}{legacy_time:>8.3f} s")
+    print(f"{'TitleMatcher':<34}{blocked_time:>8.3f} s   speedup {legacy_time / blocked_time:.1f}x"
+          f"   (building the index: {build_time:.3f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import re
+
+from script_data.accent_mappings import accent_mappings
+
+"""
+
+This file contains the conversion of accented characters to their latex form (é to \\'{e}) with the table in
+script_data/accent_mappings.py. The table is compiled once into a single regular expression, so a text is scanned
+once instead of once per table entry, and texts without any non-ASCII character (most of a bib file) are not scanned
+at all.
+
+"""
+
+
+class Transliterator:
+    """
+    Replaces the keys of mappings by their values in one pass, with the same result as calling str.replace for every
+    item in order, which is only the case if no value contains a key and no longer key contains a single character
+    key, both are checked here
+    """
+
+    def __init__(self, mappings):
+        self.mappings = dict(mappings)
+        chars = {k for k in self.mappings if len(k) == 1}
+        for key, value in self.mappings.items():
+            if any(k in value for k in self.mappings):
+                raise ValueError(f"the value of {key!r} contains a key, it cannot be replaced in one pass")
+            if len(key) > 1 and chars.intersection(key):
+                raise ValueError(f"{key!r} contains a character that is replaced by itself")
+        # longer keys first, where they overlap the longest one is replaced
+        alternatives = [re.escape(k) for k in sorted(self.mappings, key=len, reverse=True) if len(k) > 1]
+        if chars:
+            alternatives.append("[" + "".join(map(re.escape, sorted(chars))) + "]")
+        self.pattern = re.compile("|".join(alternatives)) if alternatives else None
+        self.ascii_keys = any(k.isascii() for k in self.mappings)
+
+    def _replace(self, match):
+        return self.mappings[match.group(0)]
+
+    def __call__(self, s):
+        if self.pattern is None or (not self.ascii_keys and s.isascii()):
+            return s
+        return self.pattern.sub(self._replace, s)
+
+
+to_latex = Transliterator(accent_mappings)
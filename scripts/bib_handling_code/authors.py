@@ -1,7 +1,10 @@
 import glob
 import codecs
+import functools
 import re
 import os
+import sys
+from collections import namedtuple
 
 """
 
@@ -63,31 +66,61 @@ def get_list_researchers(members_path):
 
 
 # author publications
+def index_researchers(list_researchers):
+    """
+    Build an index from every (lowercased) last name of a researcher to the researchers with that last name
+    returns dictionary with last name as key and list of (order, name, firstname, lastnames) as value,
+    where order is the position of the researcher in list_researchers
+    """
+    lastname_index = {}
+    for order, (name, value) in enumerate(list_researchers.items()):
+        researcher_name, _, _, _, _ = value
+        firstname = researcher_name[0].lower()
+        lastnames = [n.lower() for n in researcher_name[1:]]
+
+        if len(lastnames) > 1:
+            # This fixes issue #10 for lastnames connected with a dash (-)
+            lastnames.append("-".join(lastnames))
+
+        for lastname in set(lastnames):
+            lastname_index.setdefault(lastname, []).append(
+                (order, name, firstname, lastnames)
+            )
+    return lastname_index
+
+
 def get_publications_by_author(bib_items, list_researchers):
     """
     Get all publication per author
+    Every author is only matched against the researchers that share its last name
     returns dictionary with authorname as key and list of bib_keys as value
     """
+    lastname_index = index_researchers(list_researchers)
     author_bibkeys = {}
     for bib_key, bib_item in bib_items.items():
         if "author" not in bib_item:
             continue
-        authors = bib_item["author"]
-        for name, value in list_researchers.items():
-            researcher_name, _, _, _, _ = value
-            firstname = researcher_name[0].lower()
-            lastnames = [n.lower() for n in researcher_name[1:]]
-
-            if len(lastnames) > 1:
-                # This fixes issue #10 for lastnames connected with a dash (-)
-                lastnames.append("-".join(lastnames))
-
-            for author_pub in authors:
+        matches = []
+        for author_idx, author_pub in enumerate(bib_item["author"]):
+            last = normalize_lastname(author_pub[2])
+            for order, name, firstname, lastnames in lastname_index.get(last, []):
                 if match_author_publication(firstname, lastnames, author_pub, bib_key):
-                    author_bibkeys.setdefault(name.lower(), []).append(bib_key)
+                    matches.append((order, author_idx, name))
+
+        # same order as matching every researcher against every author
+        for _, _, name in sorted(matches):
+            author_bibkeys.setdefault(name.lower(), []).append(bib_key)
     return author_bibkeys
 
 
+def normalize_lastname(last):
+    """
+    Lowercase the last name and connect its parts with a dash, the way it is compared to researcher last names
+    """
+    last = last.replace(".", " ").strip()
+    return "-".join(last.lower().replace("-", " ").replace("  ", " ").split(" "))
+
+
 def match_author_publication(firstname, lastnames, author, bib_key):
     """
     This function selects authors with the same lastname and matches the first name.
@@ -99,7 +132,7 @@ def match_author_publication(firstname, lastnames, author, bib_key):
     author = [xname.replace(".", " ").strip() for xname in author]
     first, von, last, jr = author
     first = first.lower()
-    last = "-".join(last.lower().replace("-", " ").replace("  ", " ").split(" "))
+    last = normalize_lastname(last)
     jr = jr.lower()
 
     # Additional variable that may help to avoid incorrect name matching #77
@@ -166,16 +199,34 @@ def single_author(author_string):
     return len(splits) == 2 and " " not in splits[1]
 
 
+# a parsed name, compares equal to the plain (first, von, last, jr) tuple
+Name = namedtuple("Name", ["first", "von", "last", "jr"])
+
+# author strings and names repeat thousands of times in a bib file, so their parses are cached
+name_cache_size = 16384
+
+
+def name_cache_info():
+    """
+    returns dictionary with the hits, misses and size of the split_authors and parse_name caches
+    """
+    return {
+        f.__name__: f.cache_info()._asdict() for f in (split_authors, parse_name)
+    }
+
+
+@functools.lru_cache(maxsize=name_cache_size)
 def split_authors(author_string):
     """
     Split all authors which are seperated by 'and' or ','
+    results are cached, which is why they are returned as a tuple
     returns all separeted authors
     """
 
     author_string = author_string.replace(" AND ", " and ")
 
     if single_author(author_string):
-        return [author_string]
+        return (author_string,)
 
     authors = []
     if author_string.count(" and ") == 1 and author_string.count(",") == 1:
@@ -185,8 +236,7 @@ def split_authors(author_string):
     else:
         authors = author_string.split(" and ")
 
-    authors = [a.strip() for a in authors]
-    return authors
+    return tuple(a.strip() for a in authors)
 
 
 def decode_name(name):
@@ -199,14 +249,16 @@ def decode_name(name):
         if "\\" in name_part:
             name_part = codecs.decode(name_part, "ulatex")
         name_part = name_part.replace("{", "").replace("}", "")
-        parsed_name.append(name_part)
-    return parsed_name
+        parsed_name.append(sys.intern(name_part))
+    return Name(*parsed_name)
 
 
+@functools.lru_cache(maxsize=name_cache_size)
 def parse_name(name):
     """
     assumes this format:
     https://tex.stackexchange.com/questions/557/how-should-i-type-author-names-in-a-bib-file
+    results are cached, so the same name string is only parsed once
     returns a tuple (first, von, last, jr)
     """
     name = name.strip().strip(",")
@@ -0,0 +1,82 @@
+import hashlib
+import os
+import pickle
+
+"""
+
+This file contains an on-disk cache for parsed bib files, so that entry points do not have to parse an unchanged
+bib file again. The parsed result is pickled next to the bib file and is keyed by the content hash of the source
+files and the parser version. The readers only use it when they are called with cache=True, as the pickles are loaded
+as they are, that is left to interactive runs and benchmarks that parse the same files over and over.
+
+"""
+
+# bump this whenever the parsing in processbib, bibreader or authors changes, so that old caches are not used anymore
+PARSER_VERSION = 7
+
+
+def cache_file(path, kind):
+    """
+    returns the path of the cache file for the given source file and kind of parse result
+    """
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f".{name}.{kind}.bibcache")
+
+
+def version_key(kind):
+    """
+    returns the key of a result that only depends on the parser version and the kind of result
+    """
+    return f"{kind}:{PARSER_VERSION}"
+
+
+def content_key(kind, paths):
+    """
+    returns the key of a parse result: a hash over the parser version, the kind of result and the source contents
+    """
+    digest = hashlib.sha256(version_key(kind).encode())
+    for path in paths:
+        with open(path, "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def load(path, kind, key):
+    """
+    returns the object stored in the cache file of path and kind if it was stored under key, otherwise None
+    """
+    try:
+        with open(cache_file(path, kind), "rb") as f:
+            if pickle.load(f) == key:
+                return pickle.load(f)
+    except Exception:
+        pass
+    return None
+
+
+def store(path, kind, key, obj):
+    """
+    stores obj under key in the cache file of path and kind, a cache file that cannot be written is skipped
+    """
+    fn = cache_file(path, kind)
+    try:
+        with open(fn + ".tmp", "wb") as f:
+            pickle.dump(key, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(fn + ".tmp", fn)
+    except OSError:
+        pass
+
+
+def cached(kind, paths, parse):
+    """
+    returns parse(), loaded from the cache file next to paths[0] if none of the files in paths changed since it was
+    stored, otherwise parse() is called and its result is stored for the next time
+    a cache that cannot be read or written is ignored, the cache is only there to save time
+    """
+    key = content_key(kind, paths)
+    result = load(paths[0], kind, key)
+    if result is None:
+        result = parse()
+        store(paths[0], kind, key, result)
+    return result
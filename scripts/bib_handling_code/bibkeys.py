@@ -0,0 +1,63 @@
+import re
+from itertools import count, product
+from string import ascii_lowercase
+
+from bib_handling_code.duplicates import normalize_key
+
+"""
+
+This file contains the allocation of keys for new bib entries, like Ginn23 or Ginn23a. The keys in use are collected
+once in a set, so finding a free key does not search the text of the bib file, and every key that is handed out is
+reserved, so entries that are added in the same run never get the same key.
+
+"""
+
+_entry_key = re.compile(r"@\s*\w+\s*\{\s*([^,\s]+)\s*,")
+
+# a key counts as a suffixed version of a base key if it has at most this many extra characters, like Ginn23a
+max_suffix_length = 3
+
+
+def suffixes():
+    """a, b, ..., z, aa, ab, ... in that order"""
+    for length in count(1):
+        for letters in product(ascii_lowercase, repeat=length):
+            yield "".join(letters)
+
+
+class KeyAllocator:
+    """
+    Hands out free bib keys for a base key like Ginn23, comparing keys without case like bibtex does
+    the base key itself is only used if neither it nor a suffixed version of it exists, otherwise the first free
+    suffix a, b, ... is added
+    """
+
+    def __init__(self, keys=()):
+        self.keys = set()
+        self.bases = set()
+        for key in keys:
+            self.reserve(key)
+
+    @classmethod
+    def from_bib_text(cls, text):
+        """allocator for the keys of the entries in the text of a bib file"""
+        return cls(m.group(1) for m in _entry_key.finditer(text))
+
+    def __contains__(self, key):
+        return normalize_key(key) in self.keys
+
+    def reserve(self, key):
+        key = normalize_key(key)
+        self.keys.add(key)
+        for n in range(max_suffix_length + 1):
+            if len(key) > n:
+                self.bases.add(key[:len(key) - n])
+
+    def allocate(self, base):
+        """a key that is not in use yet, base or base followed by a suffix, and reserves it"""
+        if normalize_key(base) not in self.bases:
+            key = base
+        else:
+            key = next(base + s for s in suffixes() if normalize_key(base + s) not in self.keys)
+        self.reserve(key)
+        return key
@@ -1,10 +1,13 @@
 import os
+import re
 
 from bib_handling_code.authors import (
     parse_name,
     split_authors,
     authors_to_string,
 )
+from bib_handling_code.bibcache import cached
+from bib_handling_code.fileindex import directory_index
 import codecs
 
 
@@ -15,17 +18,34 @@ def get_bib_blocks(content, start_character="@", delim=("{", "}")):
     start_character will look backwards from the start of the block for this character
     the result will be a tuple of two strings: from start character to start of the block, and the block content
     """
-    blocks = []
-    delimiter_stack = []
-    for i, c in enumerate(content):
+    return list(iter_bib_blocks(content, start_character, delim))
+
+
+def iter_bib_blocks(content, start_character="@", delim=("{", "}")):
+    """
+    yields the bib blocks of get_bib_blocks one by one, as soon as the end of a block is found
+    the content is scanned once, jumping between the start characters and delimiters only
+    """
+    depth = 0
+    start = 0
+    last_start_character = -1
+    header_start = -1
+    tokens = re.compile("|".join(map(re.escape, ["{", "}", start_character])))
+    for m in tokens.finditer(content):
+        c = m.group()
         if c == "{":
-            delimiter_stack.append(i)
-        elif c == "}" and delimiter_stack:
-            start = delimiter_stack.pop()
-            if len(delimiter_stack) == 0:
-                start_index = content.rfind(start_character, 0, start)
-                blocks.append((content[start_index:start], content[start + 1 : i]))
-    return blocks
+            if depth == 0:
+                start = m.start()
+                header_start = last_start_character
+            depth += 1
+        elif c == "}":
+            if depth == 0:
+                continue
+            depth -= 1
+            if depth == 0:
+                yield content[header_start:start], content[start + 1 : m.start()]
+        else:
+            last_start_character = m.start()
 
 
 def parse_bib_block_content(bib_item_text):
@@ -69,7 +89,13 @@ def parse_bib_block_content(bib_item_text):
     return bib_key, bib_item
 
 
-def get_full_strings(full_strings_bib):
+def get_full_strings(full_strings_bib, cache=False):
+    """
+    returns the string rules defined in the full strings bib file
+    with cache=True the rules are loaded from the on-disk cache when the file did not change (see bibcache)
+    """
+    if cache:
+        return cached("full_strings", [full_strings_bib], lambda: get_full_strings(full_strings_bib, cache=False))
     string_rules = {}
     with open(full_strings_bib, "rb") as f:
         content = f.read().decode("utf-8-sig")
@@ -89,19 +115,83 @@ def get_arxiv_id_from_title(title):
     return url_arxiv
 
 
-def parse_bibtex_file(filename, full_strings_bib):
+theses_images = os.path.join(".", "content", "images", "theses")
+
+
+def cover_exists(bib_key):
+    """
+    Checks if a cover image exists for the bib key, using the shared listing of the theses image directory
+    returns "True" or "False", the way it is stored in the bib_item
+    """
+    cover_path = ""
+    if len(bib_key) > 2:
+        cover_path = bib_key[0].title() + bib_key[1:] + ".png"
+
+    return str(directory_index(theses_images).exists(cover_path))
+
+
+def parse_bibtex_file(filename, full_strings_bib, cache=False):
     """
     Parse the bibtex file.
+    with cache=True the parsed items are loaded from the on-disk cache when neither file changed (see bibcache),
+    the cover_exists check always looks at the current images on disk
     return dictionary with bibkeys as keys and bib_items as values
     """
+    if cache:
+        bib_items = cached(
+            "bibtex_file",
+            [filename, full_strings_bib],
+            lambda: dict(iter_bib_items(filename, full_strings_bib, cache=True)),
+        )
+    else:
+        bib_items = dict(iter_bib_items(filename, full_strings_bib))
+
+    directory_index(theses_images, refresh=True)
+    for bib_key, bib_item in bib_items.items():
+        bib_item["cover_exists"] = cover_exists(bib_key)
+    return bib_items
 
-    full_strings_rules = get_full_strings(full_strings_bib)
-    bib_items = {}
+
+def iter_bibtex_file(filename, full_strings_bib, cover_batch=1, cache=False):
+    """
+    Parse the bibtex file block by block.
+    cover_batch is the number of bib_items that are collected before their covers are checked and they are yielded,
+    every batch is checked against one listing of the theses image directory, which is refreshed if it changed
+    with cover_batch=0 the cover check is left to the caller (see cover_exists) and cover_exists is not set
+    yields (bib_key, bib_item) as soon as they are parsed, a bib_key that occurs twice is yielded twice
+    with cache=True the string rules of full_strings_bib are loaded from the on-disk cache when the file did not change
+    """
+    batch = []
+    for bib_key, bib_item in iter_bib_items(filename, full_strings_bib, cache):
+        if cover_batch == 0:
+            yield bib_key, bib_item
+            continue
+        batch.append((bib_key, bib_item))
+        if len(batch) >= cover_batch:
+            directory_index(theses_images, refresh=True)
+            for key, item in batch:
+                item["cover_exists"] = cover_exists(key)
+                yield key, item
+            batch = []
+    directory_index(theses_images, refresh=True)
+    for key, item in batch:
+        item["cover_exists"] = cover_exists(key)
+        yield key, item
+
+
+def iter_bib_items(filename, full_strings_bib, cache=False):
+    """
+    Parse all bib items of the bibtex file, without looking at anything else on disk.
+    with cache=True the string rules of full_strings_bib are loaded from the on-disk cache when the file did not change
+    yields (bib_key, bib_item) in file order
+    """
+
+    full_strings_rules = get_full_strings(full_strings_bib, cache)
     string_rules = {}
     with open(filename, "rb") as f:
         content = f.read().decode("utf-8-sig")
 
-    for block in get_bib_blocks(content):
+    for block in iter_bib_blocks(content):
         block_name, block_content = block
         if "@comment" in block_name:
             continue
@@ -171,20 +261,16 @@ def parse_bibtex_file(filename, full_strings_bib):
                 bib_item["coverpng"] = bib_key[0].title() + bib_key[1:] + ".png"
 
             if "copromotor" in bib_item:
-                bib_item["author"] += list(
+                copromotors = list(
                     map(parse_name, split_authors(bib_item["copromotor"]))
                 )
-                bib_item["copromotor"] = authors_to_string(
-                    list(map(parse_name, split_authors(bib_item["copromotor"])))
-                )
+                bib_item["author"] += copromotors
+                bib_item["copromotor"] = authors_to_string(copromotors)
 
             if "promotor" in bib_item:
-                bib_item["author"] += list(
-                    map(parse_name, split_authors(bib_item["promotor"]))
-                )
-                bib_item["promotor"] = authors_to_string(
-                    list(map(parse_name, split_authors(bib_item["promotor"])))
-                )
+                promotors = list(map(parse_name, split_authors(bib_item["promotor"])))
+                bib_item["author"] += promotors
+                bib_item["promotor"] = authors_to_string(promotors)
 
             if "pmid" in bib_item:
                 bib_item["pmidnumber"] = int(bib_item["pmid"])
@@ -254,15 +340,4 @@ def parse_bibtex_file(filename, full_strings_bib):
                     "gsid"
                 ] = f"https://scholar.google.com/scholar?cites={bib_item['gsid']}"
 
-            cover_path = ""
-            if len(bib_key) > 2:
-                cover_path = bib_key[0].title() + bib_key[1:] + ".png"
-
-            bib_item["cover_exists"] = str(
-                os.path.exists(
-                    os.path.join(".", "content", "images", "theses", cover_path)
-                )
-            )
-
-            bib_items[bib_key.lower()] = bib_item
-    return bib_items
+            yield bib_key.lower(), bib_item
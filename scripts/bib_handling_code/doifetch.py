@@ -0,0 +1,94 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from bib_handling_code.httpclient import FOREVER, HttpClient, http_client
+
+"""
+
+This file contains the fetching of doi metadata (csl json) and landing pages for new bib entries. Every doi is
+fetched once, through the shared http client, and several dois can be fetched concurrently before the entries are
+made. With a cache directory, successful responses are kept on disk, so running the update again after a failure does
+not fetch anything that was fetched before.
+
+"""
+
+DOI_RESOLVER = "https://doi.org"
+CSL_ACCEPT = "application/vnd.citationstyles.csl+json"
+HTML_ACCEPT = "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8," \
+              "application/signed-exchange;v=b3;q=0.7"
+
+
+class DoiFetchError(Exception):
+    def __init__(self, url, status):
+        super().__init__(f"{status} for {url}")
+        self.url = url
+        self.status = status
+
+
+class DoiFetcher:
+    """
+    Fetches the csl json and the landing page of dois, each at most once per fetcher and once per cache directory
+    prefetch(dois) fetches them concurrently, csl() and landing_page() then return the stored results
+    """
+
+    def __init__(self, cache_dir=None, workers=8, resolver=DOI_RESOLVER, client=None):
+        self.resolver = resolver.rstrip("/")
+        self.workers = workers
+        # a cache directory needs a client of its own, otherwise the shared client is used
+        self.client = client or (HttpClient.from_environment(cache_dir=cache_dir) if cache_dir else http_client())
+        self._results = {}
+        self._lock = threading.Lock()
+
+    @property
+    def requests(self):
+        """number of requests that went to the network"""
+        return self.client.requests
+
+    def _fetch(self, doi, kind):
+        url = f"{self.resolver}/{doi}"
+        response = self.client.get(url, headers={"Accept": CSL_ACCEPT if kind == "csl" else HTML_ACCEPT},
+                                   ttl=FOREVER)
+        if kind == "csl":
+            if response.status_code != 200:
+                raise DoiFetchError(url, response.status_code)
+            return response.json()
+        # the landing page is only used to look for an abstract, any page will do
+        return response.content
+
+    def _result(self, doi, kind):
+        """the result of fetching doi, fetched now if it was not fetched before, a failed fetch raises again"""
+        with self._lock:
+            future = self._results.get((doi, kind))
+            owner = future is None
+            if owner:
+                future = self._results[(doi, kind)] = Future()
+        if owner:
+            try:
+                future.set_result(self._fetch(doi, kind))
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+
+    def csl(self, doi):
+        """csl json of doi as a dict, raises DoiFetchError if doi.org does not return it"""
+        return self._result(doi, "csl")
+
+    def landing_page(self, doi):
+        """html of the page doi.org redirects to"""
+        return self._result(doi, "html")
+
+    def prefetch(self, dois):
+        """fetches the csl json and landing pages of dois concurrently, failures are raised later by csl()"""
+        jobs = [(doi, kind) for doi in dict.fromkeys(dois) for kind in ("csl", "html")]
+
+        def fetch(job):
+            try:
+                self._result(*job)
+            except Exception:
+                pass
+
+        with ThreadPoolExecutor(self.workers) as executor:
+            list(executor.map(fetch, jobs))
+
+    def close(self):
+        self.client.close()
@@ -0,0 +1,83 @@
+import re
+from collections import namedtuple
+
+"""
+
+This file contains the detection of (possibly) duplicate entries in bib files. Every entry gets a signature per kind
+of duplicate (normalized key, doi, title, and first author plus year) and entries with the same signature are grouped
+in a single pass, so this stays linear in the number of entries.
+
+"""
+
+DuplicateCluster = namedtuple("DuplicateCluster", ["kind", "signature", "keys"])
+
+# the kinds of duplicates, in the order they are reported
+SIGNATURE_KINDS = ("key", "doi", "title", "author_year")
+
+# shorter titles (like "Editorial") are too common to say anything about duplicates
+min_title_length = 20
+
+_not_alnum = re.compile(r"[^a-z0-9]")
+_latex_command = re.compile(r"\\[a-zA-Z]+")
+_and = re.compile(r"\s+and\s+", re.IGNORECASE)
+
+
+def strip_braces(s):
+    return s.strip().strip("{}").strip()
+
+
+def normalize_key(key):
+    return strip_braces(key).lower()
+
+
+def normalize_doi(doi):
+    """lower case doi without curly brackets and without the (dx.)doi.org prefix"""
+    doi = strip_braces(doi).lower()
+    for prefix in ("https://doi.org/", "http://doi.org/", "https://dx.doi.org/", "http://dx.doi.org/"):
+        if doi.startswith(prefix):
+            return doi[len(prefix):]
+    return doi
+
+
+def normalize_title(title):
+    """only the lower case letters and digits of a title, latex commands like \\'{e} keep only their argument"""
+    return _not_alnum.sub("", _latex_command.sub("", title).lower())
+
+
+def first_author_year(fields):
+    """normalized last name of the first author followed by the year, or None if one of them is missing"""
+    first = _and.split(strip_braces(fields.get("author", "")), 1)[0]
+    # "von Last, First" or "First von Last", only the last word is used so both forms give the same signature
+    words = first.split(",")[0].split()
+    last = normalize_title(words[-1]) if words else ""
+    year = strip_braces(fields.get("year", ""))
+    return f"{last}:{year}" if last and year else None
+
+
+def signatures(key, fields):
+    """the signature of the entry for every kind of duplicate, None where the entry has no signature of that kind"""
+    doi = normalize_doi(fields["doi"]) if fields.get("doi") else None
+    title = normalize_title(strip_braces(fields.get("title", "")))
+    return {
+        "key": normalize_key(key),
+        "doi": doi or None,
+        "title": title if len(title) >= min_title_length else None,
+        "author_year": first_author_year(fields),
+    }
+
+
+def duplicate_clusters(items, kinds=SIGNATURE_KINDS):
+    """
+    groups entries, given as (key, fields) pairs, on each kind of signature
+    returns a list of DuplicateCluster with the signature and the keys of every group of two or more entries, per kind
+    in the order of kinds and within a kind in order of first appearance
+    """
+    groups = {kind: {} for kind in kinds}
+    for key, fields in items:
+        for kind, signature in signatures(key, fields).items():
+            if kind in groups and signature is not None:
+                groups[kind].setdefault(signature, []).append(key)
+    return [DuplicateCluster(kind, signature, keys)
+            for kind in kinds
+            for signature, keys in groups[kind].items()
+            if len(keys) > 1]
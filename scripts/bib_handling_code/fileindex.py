@@ -0,0 +1,72 @@
+import os
+
+"""
+
+This file contains an index of the files in a directory, so that checking whether thousands of covers, pdfs or
+thumbnails exist costs one directory listing instead of one stat call per file.
+
+"""
+
+
+class DirectoryIndex:
+    """
+    The names in a directory, listed with a single os.scandir
+    refresh() lists the directory again, but only if its modification time changed since the last listing
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = None
+        self.names = set()
+        self.files = set()
+        self.refresh()
+
+    def refresh(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime is not None and mtime == self.mtime:
+            return
+        self.mtime = mtime
+        self.names = set()
+        self.files = set()
+        if mtime is None:
+            return
+        with os.scandir(self.path) as it:
+            for entry in it:
+                self.names.add(entry.name)
+                if entry.is_file():
+                    self.files.add(entry.name)
+
+    def exists(self, name):
+        """same as os.path.exists(os.path.join(path, name))"""
+        if name == "":
+            return self.mtime is not None
+        return name in self.names
+
+    def isfile(self, name):
+        """same as os.path.isfile(os.path.join(path, name))"""
+        return name in self.files
+
+    def add(self, name):
+        """registers a file that was just written to the directory"""
+        self.names.add(name)
+        self.files.add(name)
+
+
+_indexes = {}
+
+
+def directory_index(path, refresh=False):
+    """
+    returns the DirectoryIndex of path, which is shared by all callers in this process
+    with refresh=True the directory is listed again if it changed, long-running processes should use this
+    """
+    key = os.path.normpath(path)
+    index = _indexes.get(key)
+    if index is None:
+        index = _indexes[key] = DirectoryIndex(key)
+    elif refresh:
+        index.refresh()
+    return index
@@ -0,0 +1,195 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from bib_handling_code.httpclient import RateLimiter, http_client
+
+"""
+
+This file contains the harvesting of the papers of staff members, and of citation counts, from the Semantic Scholar
+api. Requests run concurrently from an asyncio event loop through the shared http client, are spaced by a
+rate limiter of their own so the api's rate limit is respected, are retried with backoff on 429 and 5xx responses, and follow the
+offset pagination of the api until all papers of an author are fetched. Citation counts are fetched in batches of ids,
+the ids of a batch that the api rejects are tried again one by one.
+
+"""
+
+SS_API = "https://api.semanticscholar.org/graph/v1"
+PAPER_FIELDS = "year,title,authors,externalIds,citationCount,publicationTypes,journal"
+
+# status codes that are worth trying again after a while
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class HarvestError(Exception):
+    def __init__(self, url, status, body=b""):
+        super().__init__(f"{status} for {url}")
+        self.url = url
+        self.status = status
+        self.body = body
+
+
+class Harvester:
+    """
+    Fetches json from the Semantic Scholar api, use as: async with Harvester() as harvester: ...
+    at most concurrency requests are in flight and at most rate requests per second are started
+    """
+
+    def __init__(self, base_url=SS_API, concurrency=4, rate=1.0, burst=1, retries=5, backoff=1.0, page_size=500,
+                 api_key=None, client=None):
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.page_size = page_size
+        self.limiter = RateLimiter(rate, burst)
+        self.client = client or http_client()
+        self.headers = {"Accept": "application/json"}
+        api_key = api_key or os.environ.get("SEMANTIC_SCHOLAR_API_KEY")
+        if api_key:
+            self.headers["x-api-key"] = api_key
+        self.requests = 0
+        self._semaphore = None
+
+    async def __aenter__(self):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    def _retry_delay(self, attempt, headers):
+        retry_after = headers.get("Retry-After") if headers is not None else None
+        if retry_after is not None and retry_after.strip().isdigit():
+            return int(retry_after)
+        return self.backoff * 2 ** attempt
+
+    async def get_json(self, path, params=None):
+        return await self.request_json("GET", path, params)
+
+    async def post_json(self, path, data, params=None):
+        return await self.request_json("POST", path, params, data)
+
+    async def request_json(self, method, path, params=None, data=None):
+        url = self.base_url + path + ("?" + urlencode(params) if params else "")
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.retries + 1):
+            # recorded responses are replayed without waiting for the rate limit
+            if self.client.mode != "replay":
+                await loop.run_in_executor(None, self.limiter.wait)
+            response = None
+            async with self._semaphore:
+                self.requests += 1
+                try:
+                    response = await loop.run_in_executor(None, functools.partial(
+                        self.client.request, method, url, headers=self.headers, json_data=data, limit=False))
+                except OSError as e:
+                    status, body = None, str(e).encode()
+                else:
+                    status, body = response.status_code, response.content
+            if status == 200:
+                return response.json()
+            if status is not None and status not in RETRY_STATUS:
+                raise HarvestError(url, status, body)
+            if attempt == self.retries:
+                raise HarvestError(url, status, body)
+            await asyncio.sleep(self._retry_delay(attempt, response.headers if response is not None else None))
+
+    async def author_papers(self, author_id, fields=PAPER_FIELDS):
+        """all papers of an author, following the offset pagination of the api"""
+        papers = []
+        offset = 0
+        while offset is not None:
+            page = await self.get_json(f"/author/{author_id}/papers",
+                                       {"fields": fields, "offset": offset, "limit": self.page_size})
+            papers.extend(page.get("data", []))
+            offset = page.get("next")
+        return papers
+
+    async def authors_papers(self, author_ids, fields=PAPER_FIELDS):
+        """
+        fetches the papers of the author_ids concurrently
+        returns a dict from author id to the list of papers of that author, and a dict from author id to the error
+        for the authors whose papers could not be fetched, those are left out of the first dict
+        """
+        results = await asyncio.gather(*(self.author_papers(a, fields) for a in author_ids), return_exceptions=True)
+        papers = {}
+        failed = {}
+        for author_id, result in zip(author_ids, results):
+            if isinstance(result, Exception):
+                failed[author_id] = result
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                papers[author_id] = result
+        return papers, failed
+
+    async def citation_batch(self, ss_ids):
+        """
+        list of (ss_id, paper) for ss_ids from one request to /paper/batch, paper is None for ids the api does not know
+        and the HarvestError for ids that failed
+        if the api rejects the request (a 4xx other than 429) the ids are tried again one by one, because it rejects the
+        whole batch for a single id it cannot handle, a batch that failed on 429 or 5xx after all retries is not split,
+        that would only turn an outage into many more requests
+        """
+        try:
+            papers = await self.post_json("/paper/batch", {"ids": ss_ids}, {"fields": "citationCount"})
+        except HarvestError as e:
+            if len(ss_ids) == 1 or e.status is None or e.status in RETRY_STATUS:
+                return [(ss_id, e) for ss_id in ss_ids]
+            results = await asyncio.gather(*(self.citation_batch([ss_id]) for ss_id in ss_ids))
+            return [result for single in results for result in single]
+        return list(zip(ss_ids, papers))
+
+    async def citation_counts(self, ss_ids, batch_size=500):
+        """
+        fetches only paperId and citationCount of the (deduplicated) ss_ids, batch_size ids per request to /paper/batch
+        returns a dict from ss_id to (paperId, citationCount), None for ids the api does not know, and the ids that
+        failed after all retries, also when asked for on their own, those are left out of the dict
+        """
+        ss_ids = list(dict.fromkeys(ss_ids))
+        batches = [ss_ids[i:i + batch_size] for i in range(0, len(ss_ids), batch_size)]
+        results = await asyncio.gather(*(self.citation_batch(batch) for batch in batches))
+        counts = {}
+        failed = []
+        for ss_id, paper in (result for batch in results for result in batch):
+            if isinstance(paper, HarvestError):
+                failed.append(ss_id)
+            else:
+                counts[ss_id] = (paper["paperId"], paper.get("citationCount") or 0) if paper else None
+        return counts, failed
+
+
+def _run(coroutine):
+    """
+    runs coroutine to completion and returns its result, in a thread of its own if this thread already runs an event
+    loop (like a jupyter notebook does), asyncio.run cannot be used there
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with ThreadPoolExecutor(1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+
+def harvest_author_papers(author_ids, fields=PAPER_FIELDS, **kwargs):
+    """blocking version of Harvester.authors_papers, kwargs are passed on to Harvester"""
+
+    async def run():
+        async with Harvester(**kwargs) as harvester:
+            return await harvester.authors_papers(author_ids, fields)
+
+    return _run(run())
+
+
+def fetch_citation_counts(ss_ids, batch_size=500, **kwargs):
+    """blocking version of Harvester.citation_counts, kwargs are passed on to Harvester"""
+
+    async def run():
+        async with Harvester(**kwargs) as harvester:
+            return await harvester.citation_counts(ss_ids, batch_size)
+
+    return _run(run())
@@ -0,0 +1,249 @@
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib3.util.retry import Retry
+
+"""
+
+This file contains the http client that all maintenance scripts use to talk to crossref, arXiv, doi.org and
+Semantic Scholar. It is a requests session, so connections are kept open per host and redirects, cookies, proxies and
+compressed responses are handled by requests. On top of that, the requests to every host are spaced to that host's
+rate limit, responses can be kept in an on-disk cache for a given time, and all responses can be recorded to a
+directory of fixtures and replayed later, so the whole pipeline can be run and profiled without network access.
+
+The mode and fixture directory of the shared client (http_client()) are taken from the environment:
+LITERATURE_HTTP_MODE=live|record|replay and LITERATURE_HTTP_FIXTURES=<directory>.
+
+"""
+
+# requests per second per host, hosts that are not in here are not limited
+HOST_RATE_LIMITS = {
+    "api.crossref.org": 10,
+    "export.arxiv.org": 1 / 3,
+    "api.semanticscholar.org": 1,
+    "doi.org": 10,
+}
+
+USER_AGENT = "Mozilla/5.0 (compatible; DIAG literature update)"
+MODES = ("live", "record", "replay")
+
+# cache responses for this long, for example http_client().get(url, ttl=FOREVER)
+FOREVER = float("inf")
+
+# headers that describe the body as it was sent, not the decoded body that is stored
+_transfer_headers = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+class ReplayMissError(LookupError):
+    """raised in replay mode for a request that was not recorded"""
+
+
+class RateLimiter:
+    """
+    Token bucket shared by threads, wait() blocks until a request may be started
+    every caller reserves its own slot, so waiting callers are let through one by one at the given rate
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0
+        if delay:
+            time.sleep(delay)
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that waits for the rate limit of the host before every request that goes to the network, also for
+    every redirect, and counts those requests
+    """
+
+    def __init__(self, limiters, **kwargs):
+        self.limiters = limiters
+        self.requests = 0
+        self.skip_limit = threading.local()
+        self._lock = threading.Lock()
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        limiter = self.limiters.get(urlsplit(request.url).hostname)
+        if limiter is not None and not getattr(self.skip_limit, "value", False):
+            limiter.wait()
+        with self._lock:
+            self.requests += 1
+        return super().send(request, **kwargs)
+
+
+def _stored_response(data):
+    response = requests.Response()
+    response.status_code = data["status"]
+    response.headers = CaseInsensitiveDict(data["headers"])
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.url = data["url"]
+    response._content = data["text"].encode("utf-8") if "text" in data else base64.b64decode(data["base64"])
+    response.from_store = True
+    return response
+
+
+class ResponseStore:
+    """
+    Responses on disk as json, one file per request named by the sha256 of the method, url, accept header and body
+    used for both the cache and the fixtures, a store that cannot be read or written is ignored
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    @staticmethod
+    def key(method, url, accept=None, body=None):
+        digest = hashlib.sha256(f"{method} {url}\n{accept}\n".encode())
+        digest.update(body or b"")
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def load(self, key, ttl=FOREVER):
+        """the stored response, None if there is none or it is older than ttl seconds"""
+        try:
+            with open(self.path(key), encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            return None
+        if time.time() - data["time"] > ttl:
+            return None
+        return _stored_response(data)
+
+    def store(self, key, method, response):
+        data = {"method": method, "url": response.url, "time": time.time(), "status": response.status_code,
+                "headers": [(k, v) for k, v in response.headers.items() if k.lower() not in _transfer_headers]}
+        try:
+            data["text"] = response.content.decode("utf-8")
+        except UnicodeDecodeError:
+            data["base64"] = base64.b64encode(response.content).decode("ascii")
+        fn = self.path(key)
+        try:
+            os.makedirs(os.path.dirname(fn), exist_ok=True)
+            with open(fn + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=1)
+            os.replace(fn + ".tmp", fn)
+        except OSError:
+            pass
+
+
+class HttpClient:
+    """
+    requests session with per-host rate limits, an optional response cache and record/replay of responses
+    mode "live" goes to the network, "record" also writes every response to fixtures, "replay" only reads fixtures
+    and raises ReplayMissError for requests that were not recorded
+    connections that fail, like a keep-alive connection the server closed in the meantime, are tried again up to
+    retries times, responses with an error status are returned as they are
+    """
+
+    def __init__(self, cache_dir=None, mode="live", fixtures=None, rate_limits=None, timeout=30,
+                 user_agent=USER_AGENT, pool_size=10, retries=3):
+        if mode not in MODES:
+            raise ValueError(f"mode has to be one of {MODES}, not {mode!r}")
+        if mode != "live" and not fixtures:
+            raise ValueError(f"mode {mode} needs a fixtures directory")
+        self.mode = mode
+        self.timeout = timeout
+        self.cache = ResponseStore(cache_dir) if cache_dir else None
+        self.fixtures = ResponseStore(fixtures) if fixtures else None
+        limiters = {host: RateLimiter(rate) for host, rate in
+                    (HOST_RATE_LIMITS if rate_limits is None else rate_limits).items()}
+        self.adapter = RateLimitedAdapter(
+            limiters, pool_connections=pool_size, pool_maxsize=pool_size,
+            max_retries=Retry(total=retries, redirect=False, allowed_methods=None, backoff_factor=0.5,
+                              respect_retry_after_header=False))
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = user_agent
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+
+    @classmethod
+    def from_environment(cls, **kwargs):
+        """client with the mode and fixtures of LITERATURE_HTTP_MODE and LITERATURE_HTTP_FIXTURES"""
+        return cls(mode=os.environ.get("LITERATURE_HTTP_MODE", "live"),
+                   fixtures=os.environ.get("LITERATURE_HTTP_FIXTURES"), **kwargs)
+
+    @property
+    def requests(self):
+        """number of requests that went to the network, redirects included"""
+        return self.adapter.requests
+
+    def request(self, method, url, params=None, headers=None, data=None, json_data=None, ttl=None, limit=True):
+        """
+        returns the requests.Response of a request, redirects are followed
+        a successful response is cached for ttl seconds if the client has a cache, without ttl the cache is not used
+        limit=False skips the rate limit of the host, for callers that space their requests themselves
+        responses from the cache or the fixtures have from_store set
+        """
+        prepared = self.session.prepare_request(requests.Request(method, url, params=params, headers=headers,
+                                                                 data=data, json=json_data))
+        body = prepared.body.encode("utf-8") if isinstance(prepared.body, str) else prepared.body
+        key = ResponseStore.key(method, prepared.url, prepared.headers.get("Accept"), body)
+
+        if self.mode == "replay":
+            response = self.fixtures.load(key)
+            if response is None:
+                raise ReplayMissError(f"{method} {prepared.url} was not recorded in {self.fixtures.directory}")
+            return response
+        if ttl is not None and self.cache is not None:
+            response = self.cache.load(key, ttl)
+            if response is not None:
+                return response
+
+        self.adapter.skip_limit.value = not limit
+        try:
+            response = self.session.send(prepared, timeout=self.timeout,
+                                         **self.session.merge_environment_settings(prepared.url, {}, None, None, None))
+        finally:
+            self.adapter.skip_limit.value = False
+        response.from_store = False
+        if self.mode == "record":
+            self.fixtures.store(key, method, response)
+        if ttl is not None and self.cache is not None and response.status_code == 200:
+            self.cache.store(key, method, response)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def http_client():
+    """the client shared by all scripts, configured by LITERATURE_HTTP_MODE and LITERATURE_HTTP_FIXTURES"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = HttpClient.from_environment()
+        return _shared
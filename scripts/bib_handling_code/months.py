@@ -0,0 +1,346 @@
+import datetime
+import hashlib
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import quote
+from xml.etree import ElementTree
+
+from requests import HTTPError
+
+from bib_handling_code.httpclient import http_client
+
+"""
+
+This file contains finding the month of bib entries that have none, from crossref by doi, from the arXiv api by arXiv
+id and from a crossref search on title and authors, in that order. The lookups of many entries run concurrently, the
+shared http client keeps every service to its rate limit, and arXiv ids are looked up many at once. Months that are
+found (or not found) are written to a checkpoint file as soon as they are known, so a run that is interrupted continues
+where it stopped.
+
+"""
+
+CROSSREF_API = "https://api.crossref.org"
+ARXIV_API = "https://export.arxiv.org/api/query"
+
+# namespace of the atom feed of the arxiv api
+ATOM = "{http://www.w3.org/2005/Atom}"
+
+# errors of a lookup that may be gone in a next run, the entry is then not written to the checkpoint
+LOOKUP_ERRORS = (OSError, ValueError, LookupError)
+
+
+def strip_curly_brackets(s):
+    return s.replace("{", "").replace("}", "")
+
+
+def alpha_num_lower(s):
+    return re.compile('[^a-zA-Z]').sub("", s).lower()
+
+
+def make_month_dict():
+    n_months = 12
+    month_strings = ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October",
+                     "November", "December"]
+    month_dict = {}
+
+    for m in range(n_months):
+        standard = "{" + str(m + 1) + "}"
+
+        possible_values = [
+            m + 1,  # int(1)
+            str(m + 1),  # 1
+            f"{m + 1:02d}",  # 01
+            month_strings[m],  # January
+            month_strings[m].lower(),  # january
+            month_strings[m][:3],  # Jan
+            month_strings[m][:3].lower(),  # jan
+            month_strings[m][:4],  # Janu
+            month_strings[m][:4].lower(),  # janu
+        ]
+
+        for v in possible_values:
+            month_dict[v] = standard  # Without { and }
+            month_dict["{" + str(v) + "}"] = standard  # With { and }
+
+    return month_dict
+
+
+month_dict = make_month_dict()
+
+
+def month_to_standard(month):
+    if month not in month_dict:
+        return None
+
+    return month_dict[month]
+
+
+def month_from_timestamp(timestamp):
+    date = datetime.datetime.strptime(timestamp, '%Y-%m-%dT%H:%M:%SZ')
+
+    return month_to_standard(date.month)
+
+
+def month_from_crossref_item(item):
+    dp = item["issued"]["date-parts"][0]
+    if len(dp) >= 2:
+        month = dp[1]
+        return month_to_standard(month)
+    else:
+        return None
+
+
+def arxiv_id(entry):
+    """the arXiv id in the journal field of entry, None if it is not an arXiv paper"""
+    if "journal" not in entry.fields:
+        return None
+
+    journal = strip_curly_brackets(entry.fields["journal"])
+    if not journal.startswith("arXiv"):
+        return None
+
+    return journal.split(":")[-1].strip()
+
+
+def _unversioned(arxiv_id):
+    return re.sub(r"v\d+$", "", arxiv_id)
+
+
+def month_from_doi(entry, client=None, crossref=CROSSREF_API):
+    if "doi" in entry.fields:
+        doi = strip_curly_brackets(entry.fields["doi"])
+    else:
+        print(f"{entry.key}: No doi in entry, so could not find month")
+        return None
+    response = (client or http_client()).get(f"{crossref}/works/{quote(doi, safe='/:;()')}")
+
+    if response.status_code == 404:
+        print(f"{entry.key}: Could not find month from doi {doi}")
+        return None
+    response.raise_for_status()
+
+    res = response.json()
+    item = res["message"]
+    month = month_from_crossref_item(item)
+    if month is None:
+        print(f"{entry.key}: No issue date found in crossref api")
+    else:
+        return month
+
+
+def months_from_arxiv_ids(arxiv_ids, client=None, arxiv=ARXIV_API):
+    """months of the papers with the given arXiv ids in one query, as a dict, ids that were not found are left out"""
+    response = (client or http_client()).get(arxiv, params={"id_list": ",".join(arxiv_ids),
+                                                            "max_results": len(arxiv_ids)})
+    response.raise_for_status()
+
+    published = {}
+    for entry_xml in ElementTree.fromstring(response.content).iter(f"{ATOM}entry"):
+        id_xml, published_xml = entry_xml.find(f"{ATOM}id"), entry_xml.find(f"{ATOM}published")
+        if id_xml is not None and published_xml is not None:
+            # the id is the url of the abstract page, like http://arxiv.org/abs/2101.00001v2
+            published[_unversioned(id_xml.text.split("/abs/")[-1])] = published_xml.text
+
+    return {i: month_from_timestamp(published[_unversioned(i)]) for i in arxiv_ids if _unversioned(i) in published}
+
+
+def month_from_arxiv_id(entry, client=None, arxiv=ARXIV_API):
+    paper_id = arxiv_id(entry)
+    if paper_id is None:
+        print(f"{entry.key}: While trying to find arxiv id: not an arxiv paper")
+        return None
+
+    month = months_from_arxiv_ids([paper_id], client, arxiv).get(paper_id)
+    if month is None:
+        print(f"{entry.key}: Could not find arxiv paper {paper_id}")
+
+    return month
+
+
+def month_from_title_and_author(entry, client=None, crossref=CROSSREF_API):
+    title = strip_curly_brackets(entry.fields["title"])
+    authors = strip_curly_brackets(entry.fields["author"])
+    response = (client or http_client()).get(f"{crossref}/works",
+                                             params={"rows": 5, "query.bibliographic": f"{title} {authors}"})
+    response.raise_for_status()
+
+    res = response.json()
+    items = res["message"]["items"]
+
+    for item in items:
+        if "author" not in item or "title" not in item:
+            continue
+
+        equal_title = alpha_num_lower(item["title"][0]) == alpha_num_lower(title)
+
+        equal_authors = True
+
+        for item_author in item["author"]:
+            if "family" not in item_author or alpha_num_lower(item_author["family"]) not in alpha_num_lower(authors):
+                equal_authors = False
+                break
+
+        if equal_title and equal_authors:
+            month = month_from_crossref_item(item)
+            if month is None:
+                print(f"{entry.key}: No issue date found in crossref api")
+            else:
+                return month
+
+    print(f"{entry.key}: No corresponding paper in crossref api found")
+
+    return None
+
+
+def fingerprint(entry):
+    """hash of the fields the month is looked up with, an entry that changed is looked up again"""
+    fields = [entry.fields.get(name, "") for name in ("doi", "journal", "title", "author")]
+    return hashlib.sha1("\n".join(fields).encode("utf-8")).hexdigest()
+
+
+class MonthCheckpoint:
+    """
+    Sidecar file with one json line per entry of which the month was looked up, the month is null if none was found
+    lines are appended and flushed one by one, so everything before an interruption is kept
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self):
+        """the records per key, a line that was cut off by an interruption is skipped"""
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, encoding="utf-8") as f:
+            text = f.read()
+        for line in text.splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            records[record["key"]] = record
+        if text and not text.endswith("\n"):
+            # start the lines of this run on a line of their own
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n")
+        return records
+
+    def add(self, entry, month, source):
+        line = json.dumps({"key": entry.key, "fingerprint": fingerprint(entry), "month": month, "source": source})
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+class MonthResolver:
+    """
+    Looks up the months of entries by doi, then by arXiv id, then by title and authors, like check_months did one
+    entry at a time, with the lookups of all entries in a stage running concurrently and arXiv ids in batches
+    resolve(entries) returns a dict of key to (month, source), with source "doi", "arxiv", "title" or None
+    """
+
+    def __init__(self, client=None, checkpoint=None, workers=8, arxiv_batch_size=100, crossref=CROSSREF_API,
+                 arxiv=ARXIV_API):
+        self.client = client or http_client()
+        self.checkpoint = MonthCheckpoint(checkpoint) if checkpoint else None
+        self.workers = workers
+        self.arxiv_batch_size = arxiv_batch_size
+        self.crossref = crossref
+        self.arxiv = arxiv
+
+    def _run(self, jobs, desc, progress, done):
+        """
+        runs the (key, function) jobs concurrently and calls done(key, result) for every job as soon as it finished
+        returns the keys of the jobs that failed
+        """
+        failed = set()
+        with ThreadPoolExecutor(self.workers) as executor:
+            futures = {executor.submit(job): key for key, job in jobs}
+            finished = as_completed(futures)
+            for future in (progress(finished, total=len(futures), desc=desc) if progress else finished):
+                try:
+                    result = future.result()
+                except LOOKUP_ERRORS as e:
+                    print(f"{desc} failed for {futures[future]}, will be tried again in a next run: {e!r}")
+                    failed.add(futures[future])
+                    continue
+                done(futures[future], result)
+        return failed
+
+    def _arxiv_batch(self, arxiv_ids):
+        try:
+            return months_from_arxiv_ids(arxiv_ids, self.client, self.arxiv)
+        except HTTPError as e:
+            if e.response.status_code != 400:
+                raise
+        # the api rejects the whole query if one of the ids is malformed, so look them up one by one
+        months = {}
+        for i in arxiv_ids:
+            try:
+                months.update(months_from_arxiv_ids([i], self.client, self.arxiv))
+            except HTTPError as e:
+                if e.response.status_code != 400:
+                    raise
+                print(f"arXiv id {i} is not valid")
+        return months
+
+    def resolve(self, entries, progress=None):
+        entries = {e.key: e for e in entries if e.type != "string" and "month" not in e.fields}
+        resolved = {}
+        checkpointed = self.checkpoint.load() if self.checkpoint else {}
+        for key, entry in entries.items():
+            record = checkpointed.get(key)
+            if record and record["fingerprint"] == fingerprint(entry):
+                resolved[key] = (record["month"], record["source"])
+
+        def found(key, month, source):
+            resolved[key] = (month, source)
+            if self.checkpoint:
+                self.checkpoint.add(entries[key], month, source)
+
+        def remaining():
+            return [e for e in entries.values() if e.key not in resolved]
+
+        def found_doi(key, month):
+            if month is not None:
+                found(key, month, "doi")
+
+        failed = self._run([(e.key, lambda e=e: month_from_doi(e, self.client, self.crossref))
+                            for e in remaining() if "doi" in e.fields], "Months by doi", progress, found_doi)
+
+        keys_by_id = {}
+        for entry in remaining():
+            if arxiv_id(entry):
+                keys_by_id.setdefault(arxiv_id(entry), []).append(entry.key)
+        ids = list(keys_by_id)
+        batches = [tuple(ids[i:i + self.arxiv_batch_size]) for i in range(0, len(ids), self.arxiv_batch_size)]
+
+        def found_batch(batch, months):
+            for i, month in months.items():
+                for key in keys_by_id[i]:
+                    found(key, month, "arxiv")
+
+        for batch in self._run([(batch, lambda batch=batch: self._arxiv_batch(list(batch))) for batch in batches],
+                               "Months by arxiv id", progress, found_batch):
+            failed.update(key for i in batch for key in keys_by_id[i])
+
+        # an entry is only written to the checkpoint without month if none of its lookups failed
+        def found_title(key, month):
+            if month is not None:
+                found(key, month, "title")
+            elif key not in failed:
+                found(key, None, None)
+
+        searchable = [e for e in remaining() if "title" in e.fields and "author" in e.fields]
+        failed |= self._run([(e.key, lambda e=e: month_from_title_and_author(e, self.client, self.crossref))
+                             for e in searchable], "Months by title and authors", progress, found_title)
+        for entry in remaining():
+            if entry.key not in failed:
+                found(entry.key, None, None)
+
+        return resolved
@@ -1,15 +1,20 @@
+import functools
+import hashlib
 import io
+import mmap
+import multiprocessing
 import os.path
+import string
+import sys
 import csv
 import glob
 
 import numpy as np
-import pyarxiv
-import requests
 import dropbox
 import datetime
 from unidecode import unidecode
-from collections import Counter
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
 import re
 import tqdm
 import tqdm.auto
@@ -18,6 +23,13 @@ import colors
 
 from pdf2image import convert_from_path
 
+from bib_handling_code.accents import to_latex
+from bib_handling_code.bibcache import cached, version_key
+from bib_handling_code.bibcache import load as load_cache, store as store_cache
+from bib_handling_code.duplicates import duplicate_clusters, normalize_doi
+from bib_handling_code.fileindex import directory_index
+from bib_handling_code.months import MonthResolver, month_to_standard
+
 from pdf2image.exceptions import (
     PDFInfoNotInstalledError,
     PDFPageCountError,
@@ -106,18 +118,149 @@ def split_strip(s, sep=[',']):
     return t
 
 
+_brace = re.compile("[{}]")
+
+
+def tokenize_fields(line, pos=0):
+    """
+    Walks the fields of a bib entry once, starting at pos, and yields (field, start, end) for every field
+    the value of a field is line[start:end], with white space around the value already excluded from the span
+    line is expected to end with ",}" like BibEntry.parse prepares it, the remainder of the line is never copied
+    """
+    while True:
+        i = line.find("=", pos)
+        if i < 0:
+            return
+        field = line[pos:i].strip()
+        # do we find first a comma or first a curly brace
+        comma = line.find(",", i + 1)
+        brace = line.find("{", i + 1)
+        if brace > -1 and comma > -1 and brace < comma:
+            count = 1
+            j = brace + 1
+            while count > 0:
+                m = _brace.search(line, j)
+                assert m is not None, f"unbalanced braces in field {field}"
+                j = m.end()
+                if m.group() == "}":
+                    count -= 1
+                else:
+                    count += 1
+            start, end = brace, j
+            pos = j + 1
+        elif comma > -1:
+            start, end = i + 1, comma
+            while start < end and line[start].isspace():
+                start += 1
+            while end > start and line[end - 1].isspace():
+                end -= 1
+            pos = comma + 1
+        else:
+            assert False
+        yield field, start, end
+
+
+@functools.lru_cache(maxsize=8192)
+def _unidecode(s):
+    return unidecode(s)
+
+
+def to_ascii(s):
+    """unidecode, skipped for values that are ASCII already and cached for the others"""
+    return s if s.isascii() else _unidecode(s)
+
+
+class BibFields(dict):
+    """
+    dict with the fields of a BibEntry, that counts how often it was changed
+    IncrementalBibFile uses the count to know which entries have to be written again, callbacks in watchers are called
+    with the fields after every change (BibDatabase uses this to keep its indexes up to date)
+    """
+    __slots__ = ('changes', 'watchers')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.changes = 0
+        self.watchers = None
+
+    def changed(self):
+        self.changes += 1
+        if self.watchers:
+            for watcher in self.watchers:
+                watcher(self)
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.changed()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.changed()
+
+    def pop(self, *args):
+        value = super().pop(*args)
+        self.changed()
+        return value
+
+    def popitem(self):
+        item = super().popitem()
+        self.changed()
+        return item
+
+    def setdefault(self, key, default=None):
+        value = super().setdefault(key, default)
+        self.changed()
+        return value
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.changed()
+
+    def clear(self):
+        super().clear()
+        self.changed()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def __reduce__(self):
+        # the default pickling restores the items through __setitem__ before changes exists
+        return _restore_fields, (dict(self), self.changes)
+
+
+def _restore_fields(items, changes):
+    fields = BibFields(items)
+    fields.changes = changes
+    return fields
+
+
 class BibEntry:
+    # no per-instance __dict__, a full bib file has thousands of entries
+    __slots__ = ('key', 'type', 'value', 'pdf', '_fields')
 
     def __init__(self):
         self.key = ""
         self.type = ""
-        self.string = ""
         self.value = ""
         self.pdf = False
-        self.line = ""
         self.fields = {}
 
+    @property
+    def fields(self):
+        return self._fields
+
+    @fields.setter
+    def fields(self, fields):
+        previous = getattr(self, '_fields', None)
+        self._fields = fields if isinstance(fields, BibFields) else BibFields(fields)
+        # whoever watched the old fields watches the new ones
+        if previous is not None and previous.watchers:
+            self._fields.watchers = previous.watchers
+            self._fields.changed()
+
     def to_lines(self):
+        # the lines are made again on every call, keeping them would double the memory of a saved bib file
         strings = []
         if self.type == "string":
             strings.append(f'@' + self.type + '{' + self.key + " = " + self.value + '}\n')
@@ -127,7 +270,7 @@ class BibEntry:
             strings.append('@' + self.type + '{' + self.key + ",\n")
             for k, v in self.fields.items():
                 if k in allowed_fields:
-                    value = unidecode(v)
+                    value = to_ascii(v)
                     strings.append('  ' + k + " = " + value + ",\n")
             strings.append('}\n')
         return strings
@@ -153,97 +296,160 @@ class BibEntry:
         s = self.fields['optnote']
         return s.find("DIAG") != -1
 
-    def getFieldValue(self):
-        """
-        Eats one field and value from the long line making up the remainder of the bib entry
-        """
-        i = self.line.find("=")
-        if (i < 0):
-            return False
-        field = self.line[0:i].strip()
-        self.line = self.line[i + 1:len(self.line)]
-        # do we find first a comma or first a curly brace
-        comma = self.line.find(",")
-        brace = self.line.find("{")
-        if brace > -1 and comma > -1 and brace < comma:
-            count = 1
-            i = brace + 1
-            while count > 0:
-                if self.line[i] == "}":
-                    count -= 1
-                if self.line[i] == "{":
-                    count += 1
-                i += 1
-            self.value = self.line[brace:i].strip()
-            self.line = self.line[i + 1:len(self.line)].strip()
-        elif comma > -1:
-            self.value = self.line[0:comma].strip()
-            self.line = self.line[comma + 1:len(self.line)].strip()
-        else:
-            assert False
-        self.fields[field] = self.value
-        return True
-
     def parse(self, lines):
         '''lines makes up all lines of a bib entry'''
-        # first turn lines into one long string
-        self.line = ''
-        for i in range(0, len(lines)):
-            self.line += lines[i]
-            self.line += ' '
-        self.line = self.line.strip()
-        if (len(self.line) == 0):
+        # first turn lines into one long string, it is only kept while parsing
+        line = ' '.join(lines).strip()
+        if (len(line) == 0):
             return
 
         # find type and key
-        assert (self.line[0] == "@")
-        i = self.line.find("{")
+        assert (line[0] == "@")
+        i = line.find("{")
         assert (i > 1);
-        self.type = self.line[1:i].strip().lower()
+        self.type = sys.intern(line[1:i].strip().lower())
 
         # if type is string, we get the string key and value and we're done
         if (self.type == 'string'):
-            j = self.line.find("=")
+            j = line.find("=")
             assert (j > i);
-            self.key = self.line[i + 1:j].strip()
-            k = self.line.find("}")
+            self.key = line[i + 1:j].strip()
+            k = line.find("}")
             assert (k > j)
-            self.value = self.line[j + 1:k].strip()
+            self.value = line[j + 1:k].strip()
             return
 
         # if type is comment, we get the value and we're done
         if (self.type == 'comment'):
-            j = self.line.find("}")
+            j = line.find("}")
             assert (j > i);
-            self.value = self.line[i + 1:j].strip()
+            self.value = line[i + 1:j].strip()
             return
 
         # get the key
-        j = self.line.find(",")
+        j = line.find(",")
         assert (j > i)
-        self.key = self.line[i + 1:j].strip()
-        self.line = self.line[j + 1:len(self.line)].strip()
+        self.key = line[i + 1:j].strip()
+        line = line[j + 1:len(line)].strip()
 
-        assert (self.line[-1] == "}"), f"{self.line}"
-        self.line = self.line[:-1] + ",}"  # possibly extra comma, makes sure there is one!
+        assert (line[-1] == "}"), f"{line}"
+        line = line[:-1] + ",}"  # possibly extra comma, makes sure there is one!
 
         # next we process the rest of the entry, field by field
-        while self.getFieldValue():
-            pass
+        for field, start, end in tokenize_fields(line):
+            self.fields[sys.intern(field)] = line[start:end]
 
     def check_pdf_exists(self, path):
         # warning: use hardcoded path here
-        fn = os.path.join(path, self.key + '.pdf')
-        self.pdf = os.path.isfile(fn)
+        # the listing of path is shared, so checking all entries costs a single os.scandir
+        self.pdf = directory_index(path).isfile(self.key + '.pdf')
         return self.pdf
 
 
-def read_bibfile(filename, full_path=None):
+class LazyBibEntry(BibEntry):
+    """
+    BibEntry that only knows its type and key after loading, the fields are decoded from the bytes of the entry the
+    first time they are accessed
+    """
+    __slots__ = ('_data',)
+
+    def __init__(self, data):
+        super().__init__()
+        self._fields = None
+        self._data = data
+
+    @property
+    def fields(self):
+        if self._fields is None:
+            self._fields = parse_entry(self._data).fields
+            self._data = None
+        return self._fields
+
+    @fields.setter
+    def fields(self, fields):
+        BibEntry.fields.fset(self, fields)
+        self._data = None
+
+
+def _decode_lines(data):
+    # same lines as reading the file in text mode, including the universal newline translation
+    return io.StringIO(data.decode('utf-8'), newline=None).readlines()
+
+
+def split_entries(data):
+    """
+    returns the (start, end) byte ranges of the entries in the contents of a bib file
+    an entry starts with an @ at the beginning of a line and runs until the next entry, like in read_bibfile
+    """
+    starts = [0] if data[:1] == b"@" else []
+    i = data.find(b"\n@")
+    while i != -1:
+        starts.append(i + 1)
+        i = data.find(b"\n@", i + 2)
+    return list(zip(starts, starts[1:] + [len(data)]))
+
+
+def entry_digest(data, start, end):
+    """hash of the text of an entry, without the whitespace after it, so text appended to the file does not change it"""
+    while end > start and data[end - 1] in b" \t\r\n":
+        end -= 1
+    return hashlib.blake2b(memoryview(data)[start:end], digest_size=16).digest()
+
+
+def parse_entry(data):
+    """parses the bytes of a single entry the way read_bibfile does"""
+    be = BibEntry()
+    be.parse(_decode_lines(data))
+    be.reformat_optnote()
+    return be
+
+
+def read_bibfile_lazy(path):
+    """
+    Memory maps the bib file at path and indexes only the entry boundaries and the type and key of every entry
+    returns a list of LazyBibEntry (and BibEntry for strings) in file order, like read_bibfile would
+    every entry gets a copy of its bytes and the map is closed before returning, so the file can be rewritten while
+    the entries are in use
+    """
     entries = []
-    if full_path == None:
-        fp = open(literature_root + '/' + filename, encoding='utf-8')
-    else:
-        fp = open(full_path, encoding='utf-8')
+    with open(path, 'rb') as fp:
+        if os.fstat(fp.fileno()).st_size == 0:
+            return entries
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for start, end in split_entries(data):
+                eol = data.find(b"\n", start, end)
+                header = data[start:end if eol == -1 else eol].decode('utf-8').strip()
+                i = header.find("{")
+                j = header.find(",")
+                entry_type = header[1:i].strip().lower()
+                if entry_type == 'comment':
+                    continue
+                if entry_type == 'string' or i < 1 or j < i:
+                    # strings are small, and headers that do not fit on one line are rare, these are parsed right away
+                    be = parse_entry(data[start:end])
+                else:
+                    be = LazyBibEntry(data[start:end])
+                    be.type = entry_type
+                    be.key = header[i + 1:j].strip()
+                if len(be.key) > 0:
+                    entries.append(be)
+    return entries
+
+
+def read_bibfile(filename, full_path=None, lazy=False, cache=False):
+    """
+    Reads all entries of a bib file, either literature_root/filename or full_path
+    with lazy=True only the type and key of the entries are read and their fields are only parsed when first accessed,
+    which is much cheaper for scans that only look at keys or a few entries
+    with cache=True the parsed entries are loaded from the on-disk cache when the file did not change (see bibcache)
+    """
+    path = literature_root + '/' + filename if full_path == None else full_path
+    if lazy:
+        return read_bibfile_lazy(path)
+    if cache:
+        return cached('read_bibfile', [path], lambda: read_bibfile(None, path))
+    entries = []
+    fp = open(path, encoding='utf-8')
     line = fp.readline()
     while line and line.find("@") != 0:
         line = fp.readline()  # find first entry
@@ -269,6 +475,386 @@ def read_bibfile(filename, full_path=None):
     return entries
 
 
+def parse_chunk(path, start, end):
+    """parses the entries in bytes start to end of the bib file at path, which have to start at an entry"""
+    with open(path, 'rb') as fp:
+        fp.seek(start)
+        data = fp.read(end - start)
+    entries = []
+    for s, e in split_entries(data):
+        be = parse_entry(data[s:e])
+        if len(be.key) > 0:
+            entries.append(be)
+    return entries
+
+
+def chunk_ranges(path, chunk_size):
+    """splits the bib file at path into byte ranges of about chunk_size bytes, at the start of an entry"""
+    with open(path, 'rb') as fp:
+        ranges = split_entries(fp.read())
+    chunks = []
+    for start, end in ranges:
+        if chunks and end - chunks[-1][0] <= chunk_size:
+            chunks[-1] = (chunks[-1][0], end)
+        else:
+            chunks.append((start, end))
+    return chunks
+
+
+def load_bib_collection(paths, workers=None, merged=False, chunk_size=1 << 20):
+    """
+    Reads several bib files at once, parsing them in a pool of worker processes
+    big files are split into chunks of about chunk_size bytes at entry boundaries, so they are spread over the workers
+    too. workers defaults to the number of cores, with workers=1 everything is parsed in this process
+    returns a dict of path to the entries of that file, in the order of read_bibfile, or with merged=True a single
+    BibDatabase of all entries, where db.source(entry) is the path of the file the entry came from
+    """
+    workers = workers or os.cpu_count() or 1
+    tasks = [(path, start, end) for path in paths for start, end in chunk_ranges(path, chunk_size)]
+    if workers == 1 or len(tasks) <= 1:
+        results = [parse_chunk(*task) for task in tasks]
+    else:
+        # fork where possible, a spawned worker would have to import all dependencies of this module again
+        context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), mp_context=context) as pool:
+            results = list(pool.map(parse_chunk, *zip(*tasks)))
+
+    collection = {path: [] for path in paths}
+    for (path, _, _), entries in zip(tasks, results):
+        collection[path].extend(entries)
+    if not merged:
+        return collection
+    db = BibDatabase()
+    for path, entries in collection.items():
+        for e in entries:
+            db.add(e, path)
+    return db
+
+
+BibBlock = namedtuple('BibBlock', ['start', 'end', 'digest', 'key', 'changes', 'fields', 'entry'])
+BibChanges = namedtuple('BibChanges', ['added', 'removed', 'modified'])
+
+
+class IncrementalBibFile:
+    """
+    Entries of a bib file, with the byte range and a hash of the text of every entry
+    load() reads the file again but only parses the entries whose text is new, the others are taken from the
+    previous load, with persist=True that load is also kept on disk next to the bib file (see bibcache) for the next
+    process
+    save() writes the file back in place, re-serializing only the entries that were changed since they were loaded
+    """
+
+    def __init__(self, path, persist=False):
+        self.path = path
+        self.persist = persist
+        self.blocks = []
+        self.head = b""
+        self.stamp = None
+        if persist:
+            self.blocks = load_cache(path, 'incremental', version_key('incremental')) or []
+
+    @property
+    def entries(self):
+        return [b.entry for b in self.blocks if b.entry is not None]
+
+    @staticmethod
+    def mutated(block):
+        """
+        true if the entry of block was changed in memory since it was read or written, its fields may also have been
+        replaced by other ones, whose count of changes can be the same
+        """
+        e = block.entry
+        return e is not None and (e.key != block.key or e.fields is not block.fields or e.fields.changes != block.changes)
+
+    @staticmethod
+    def file_stamp(fp):
+        """size and modification time of an open file, to notice changes made by others between load and save"""
+        st = os.fstat(fp.fileno())
+        return st.st_size, st.st_mtime_ns
+
+    def load(self):
+        """
+        reads the file, re-parsing only changed or inserted entries
+        entries that were changed in memory since the previous load are parsed again as well
+        returns BibChanges with the keys that were added, removed or modified since the previous load
+        """
+        with open(self.path, 'rb') as fp:
+            data = fp.read()
+            stamp = self.file_stamp(fp)
+
+        previous = {}
+        for b in self.blocks:
+            if not self.mutated(b):
+                previous.setdefault(b.digest, []).append(b)
+
+        blocks = []
+        ranges = split_entries(data)
+        for start, end in ranges:
+            digest = entry_digest(data, start, end)
+            if previous.get(digest):
+                entry = previous[digest].pop().entry
+            else:
+                entry = parse_entry(data[start:end])
+                if len(entry.key) == 0:
+                    entry = None
+            if entry is None:
+                blocks.append(BibBlock(start, end, digest, "", 0, None, None))
+            else:
+                blocks.append(BibBlock(start, end, digest, entry.key, entry.fields.changes, entry.fields, entry))
+
+        changes = diff_blocks(self.blocks, blocks)
+        self.blocks = blocks
+        self.head = data[:ranges[0][0]] if ranges else data
+        self.stamp = stamp
+        if self.persist:
+            store_cache(self.path, 'incremental', version_key('incremental'), blocks)
+        return changes
+
+    def append(self, text):
+        """
+        adds the entries in text at the end of the file, with the line endings of the file, and loads the file again,
+        which only parses the appended entries
+        the entries are written through BibEntry.to_lines, like save_to_file writes them, so they come out cleaned up
+        the same way, comments and text before the first entry are left out
+        the file must not have been changed on disk since the last load() or save()
+        returns the BibChanges of that load
+        """
+        data = text.encode("utf-8")
+        entries = [parse_entry(data[start:end]) for start, end in split_entries(data)]
+        text = "".join("\n" + "".join(e.to_lines()) for e in entries if len(e.key) > 0)
+        if self.stamp is None:
+            raise ValueError(f"{self.path} has to be loaded before it can be appended to")
+        with open(self.path, 'r+b') as fp:
+            if self.file_stamp(fp) != self.stamp:
+                raise ValueError(f"{self.path} was changed on disk since it was loaded")
+            newline = b"\r\n" if b"\r\n" in fp.read(1 << 16) else b"\n"
+            end = fp.seek(0, os.SEEK_END)
+            if text and end and fp.seek(end - 1) >= 0 and fp.read(1) != b"\n":
+                text = "\n" + text
+            fp.write(text.encode("utf-8").replace(b"\n", newline))
+        return self.load()
+
+    def remove(self, keys):
+        """drops the entries with the given keys, their text is left out on the next save()"""
+        keys = set(keys)
+        self.blocks = [b for b in self.blocks if b.entry is None or b.key not in keys]
+
+    def save(self, atomic=True):
+        """
+        writes the file back: the text of unchanged entries is copied from the file as it is, only the entries that
+        were changed in memory are serialized again and spliced in at their byte range
+        the file must not have been changed on disk since the last load() or save()
+        returns the keys of the entries that were written again
+        """
+        if self.stamp is None:
+            raise ValueError(f"{self.path} has to be loaded before it can be saved")
+        with open(self.path, 'rb') as fp:
+            if self.file_stamp(fp) != self.stamp:
+                raise ValueError(f"{self.path} was changed on disk since it was loaded")
+            data = fp.read()
+
+        out = [self.head]
+        pos = len(self.head)
+        blocks = []
+        rewritten = []
+        for b in self.blocks:
+            text = data[b.start:b.end]
+            if self.mutated(b):
+                # keep the blank lines after the entry and the line endings of the original text
+                body = text.rstrip()
+                newline = "\r\n" if b"\r\n" in text else "\n"
+                lines = "".join(b.entry.to_lines()).rstrip("\n")
+                text = lines.replace("\n", newline).encode("utf-8") + text[len(body):]
+                digest = entry_digest(text, 0, len(text))
+                rewritten.append(b.entry.key)
+            else:
+                digest = b.digest
+            key, changes, fields = (b.entry.key, b.entry.fields.changes, b.entry.fields) if b.entry is not None \
+                else ("", 0, None)
+            blocks.append(BibBlock(pos, pos + len(text), digest, key, changes, fields, b.entry))
+            out.append(text)
+            pos += len(text)
+
+        data = b"".join(out)
+        out_path = self.path + '.tmp' if atomic else self.path
+        with open(out_path, 'wb') as fp:
+            fp.write(data)
+            fp.flush()
+            stamp = self.file_stamp(fp)
+        if atomic:
+            os.replace(out_path, self.path)
+        self.blocks = blocks
+        self.stamp = stamp
+        if self.persist:
+            store_cache(self.path, 'incremental', version_key('incremental'), blocks)
+        return rewritten
+
+
+def diff_blocks(old_blocks, new_blocks):
+    """
+    returns BibChanges with the keys that are only in new_blocks, only in old_blocks, or whose text changed
+    """
+    old = {b.key: b.digest for b in old_blocks if b.entry is not None}
+    new = {b.key: b.digest for b in new_blocks if b.entry is not None}
+    return BibChanges(
+        added=[k for k in new if k not in old],
+        removed=[k for k in old if k not in new],
+        modified=[k for k in new if k in old and old[k] != new[k]],
+    )
+
+
+def split_ss_ids(all_ss_ids):
+    """the semantic scholar ids in an all_ss_ids field, which holds a single id or a python list of ids"""
+    return all_ss_ids.translate(str.maketrans('', '', string.punctuation)).split()
+
+
+class BibDatabase:
+    """
+    Entries of a bib file (the result of read_bibfile or IncrementalBibFile.entries) with indexes by key, normalized
+    doi, pmid and every semantic scholar id in all_ss_ids
+    the indexes follow changes to the fields of the entries, after changing the key of an entry call update(entry)
+    lookups return the first entry in file order, like save_to_file keeps the first entry of a key
+    entries can be tagged with the file they came from, see load_bib_collection
+    the database watches the fields of its entries until close() is called, use it as a context manager or call close()
+    when it is no longer used, so the entries do not keep it alive
+    """
+
+    def __init__(self, entries=(), source=None):
+        self.entries = []
+        self._by_key = {}
+        self._by_doi = {}
+        self._by_pmid = {}
+        self._by_ss_id = {}
+        self._indexed = {}
+        self._position = {}
+        self._source = {}
+        self._stale = {}
+        for e in entries:
+            self.add(e, source)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self._by_key
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """stops watching the fields of the entries, the indexes no longer follow changes after this"""
+        for e in self.entries:
+            self._detach(e)
+        self._stale = {}
+
+    def __getitem__(self, key):
+        return self._by_key[key][0]
+
+    def get(self, key, default=None):
+        entries = self._by_key.get(key)
+        return entries[0] if entries else default
+
+    def find_doi(self, doi):
+        return self._lookup(self._by_doi, normalize_doi(doi))
+
+    def find_pmid(self, pmid):
+        return self._lookup(self._by_pmid, strip_cb(str(pmid)).strip())
+
+    def find_ss_id(self, ss_id):
+        return self._lookup(self._by_ss_id, ss_id.strip())
+
+    def source(self, entry):
+        """the source the entry was added with"""
+        return self._source.get(id(entry))
+
+    def add(self, entry, source=None):
+        self._position[id(entry)] = len(self._position)
+        if source is not None:
+            self._source[id(entry)] = source
+        self.entries.append(entry)
+        if entry.fields.watchers is None:
+            entry.fields.watchers = []
+        entry.fields.watchers.append(functools.partial(self._touch, entry))
+        self._index(entry)
+
+    def remove(self, key):
+        """removes all entries with key"""
+        removed = [e for e in self.entries if e.key == key]
+        self.entries = [e for e in self.entries if e.key != key]
+        for e in removed:
+            self._unindex(e)
+            self._detach(e)
+            self._stale.pop(id(e), None)
+            self._position.pop(id(e), None)
+            self._source.pop(id(e), None)
+        return removed
+
+    def update(self, entry):
+        self._unindex(entry)
+        self._index(entry)
+
+    def _touch(self, entry, fields):
+        self._stale[id(entry)] = entry
+
+    def _detach(self, entry):
+        watchers = entry.fields.watchers or []
+        entry.fields.watchers = [w for w in watchers if getattr(w, 'func', None) != self._touch] or None
+
+    def _lookup(self, index, value):
+        self._refresh()
+        entries = index.get(value)
+        return entries[0] if entries else None
+
+    def _refresh(self):
+        if self._stale:
+            stale, self._stale = self._stale, {}
+            for e in stale.values():
+                self.update(e)
+
+    def _values(self, entry):
+        if entry.type == 'string':
+            return entry.key, (), (), ()
+        fields = entry.fields
+        dois = (normalize_doi(fields['doi']),) if fields.get('doi') else ()
+        pmids = (strip_cb(fields['pmid']).strip(),) if fields.get('pmid') else ()
+        ss_ids = tuple(split_ss_ids(fields['all_ss_ids'])) if fields.get('all_ss_ids') else ()
+        return entry.key, dois, pmids, ss_ids
+
+    def _index(self, entry):
+        key, dois, pmids, ss_ids = self._indexed[id(entry)] = self._values(entry)
+        self._insert(self._by_key, key, entry)
+        for index, values in ((self._by_doi, dois), (self._by_pmid, pmids), (self._by_ss_id, ss_ids)):
+            for value in values:
+                self._insert(index, value, entry)
+
+    def _unindex(self, entry):
+        key, dois, pmids, ss_ids = self._indexed.pop(id(entry))
+        self._delete(self._by_key, key, entry)
+        for index, values in ((self._by_doi, dois), (self._by_pmid, pmids), (self._by_ss_id, ss_ids)):
+            for value in values:
+                self._delete(index, value, entry)
+
+    def _insert(self, index, value, entry):
+        # keep the entries of a value in file order, so the first entry wins
+        entries = index.setdefault(value, [])
+        entries.append(entry)
+        if len(entries) > 1:
+            entries.sort(key=lambda e: self._position[id(e)])
+
+    @staticmethod
+    def _delete(index, value, entry):
+        entries = index.get(value, [])
+        entries[:] = [e for e in entries if e is not entry]
+        if not entries:
+            index.pop(value, None)
+
+
 def statistics(e):
     print("\nStatistics on entries\n")
     kd = {}
@@ -301,21 +887,24 @@ def statistics(e):
 def create_thumb(pdfpath, thumbpath, key):
     pdfname = pdfpath + key + '.pdf'
     thumbname = thumbpath + key + '.png'
-    if not os.path.isfile(pdfname):
+    if not directory_index(pdfpath).isfile(key + '.pdf'):
         print("cannot find pdf file " + pdfname)
         return
-    if os.path.isfile(thumbname):
+    if directory_index(thumbpath).isfile(key + '.png'):
         # thumb already exists, we're done
         return
     print("will create png for " + pdfname)
     images = convert_from_path(pdfname)
     if len(images) > 0:
         images[0].save(thumbname, "PNG")
+        directory_index(thumbpath).add(key + '.png')
         print("Wrote " + thumbname)
 
 
 def check_missing_pdfs(e, addmissingthumbs):
     print("\nPrinting journal/conference article entries (not arXiv) with a missing pdf file:")
+    directory_index(os.path.join(literature_root, 'pdf/'), refresh=True)
+    directory_index(os.path.join(literature_root, 'png', 'publications/'), refresh=True)
     for i in e:
         if i.type == 'article' or i.type == 'inproceedings':
             j = i.fields.get('journal')
@@ -372,6 +961,7 @@ def read_pop():
 
 
 def add_gsid(gsdata, entries):
+    bib = BibDatabase(entries)
     matches = {}
     for i in range(10):
         matches[i] = 0
@@ -434,35 +1024,35 @@ def add_gsid(gsdata, entries):
         if len(candidates) > 0:
             key = candidates[0][1]
             points = candidates[0][0]
-            for e in entries:
-                if e.key == key:
-                    if e.fields.get("gsid") is not None:
-                        bibgsid = strip_cb(e.fields['gsid'])
-                        if gsid != bibgsid and points > 5:
-                            print(f"found mismatch in {key}: {bibgsid} vs {gsid}")
-                            if gsdata.get(bibgsid) is not None:
-                                print(gsdata[bibgsid])
-                            else:
-                                print("bibgsid not found")
-                            print(gsdata[gsid])
-                            print()
+            e = bib[key]
+            if e.fields.get("gsid") is not None:
+                bibgsid = strip_cb(e.fields['gsid'])
+                if gsid != bibgsid and points > 5:
+                    print(f"found mismatch in {key}: {bibgsid} vs {gsid}")
+                    if gsdata.get(bibgsid) is not None:
+                        print(gsdata[bibgsid])
                     else:
-                        if points > 5:
-                            e.fields["gsid"] = "{" + gsid + "}"
-                        elif points > 3:
-                            print("Possible match:")
-                            for j in v:
-                                print(f"  {j}")
-                            for j in e.to_lines():
-                                print(j[0:-1])
-                            print("Match these? [y/n]")
-                            ans = input()
-                            if ans == 'y':
-                                print("Matching!")
-                                e.fields["gsid"] = "{" + gsid + "}"
-                        else:
-                            print(cites, "-", gsid, "-", year, "-", bibkey, "-", title, "-", journal, " NO MATCH")
+                        print("bibgsid not found")
+                    print(gsdata[gsid])
+                    print()
+            else:
+                if points > 5:
+                    e.fields["gsid"] = "{" + gsid + "}"
+                elif points > 3:
+                    print("Possible match:")
+                    for j in v:
+                        print(f"  {j}")
+                    for j in e.to_lines():
+                        print(j[0:-1])
+                    print("Match these? [y/n]")
+                    ans = input()
+                    if ans == 'y':
+                        print("Matching!")
+                        e.fields["gsid"] = "{" + gsid + "}"
+                else:
+                    print(cites, "-", gsid, "-", year, "-", bibkey, "-", title, "-", journal, " NO MATCH")
 
+    bib.close()
     print(matches)
 
 
@@ -515,14 +1105,15 @@ def check_doi(entries):
                 print(f"{i.key} in booktitle {booktitle} from year {year} has no doi")
 
 
-def check_duplicates(entries):
+def check_duplicates(entries, kinds=("key", "doi", "title")):
+    """
+    prints the groups of entries with the same key (ignoring case), doi or title, see duplicates.py
+    first author plus year is left out by default: keys like Ginn20, Ginn20a share it without being duplicates,
+    pass kinds=duplicates.SIGNATURE_KINDS to see those groups as well
+    """
     print("\nCheck possible duplicates:")
-    for i in range(len(entries)):
-        key1 = strip_cb(entries[i].key).lower()
-        for j in range(i + 1, len(entries)):
-            key2 = strip_cb(entries[j].key).lower()
-            if key1 == key2:
-                print("Possible duplicate entries " + entries[i].key + " and " + entries[j].key)
+    for cluster in duplicate_clusters(((e.key, e.fields) for e in entries if e.type != 'string'), kinds):
+        print(f"Possible duplicate entries with the same {cluster.kind} ({cluster.signature}): " + ", ".join(cluster.keys))
 
 
 def check_keys(entries):
@@ -557,148 +1148,13 @@ def check_keys(entries):
             continue
 
 
-def strip_curly_brackets(s):
-    return s.replace("{", "").replace("}", "")
-
-
-def make_month_dict():
-    n_months = 12
-    month_strings = ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October",
-                     "November", "December"]
-    month_dict = {}
-
-    for m in range(n_months):
-        standard = "{" + str(m + 1) + "}"
-
-        possible_values = [
-            m + 1,  # int(1)
-            str(m + 1),  # 1
-            f"{m + 1:02d}",  # 01
-            month_strings[m],  # January
-            month_strings[m].lower(),  # january
-            month_strings[m][:3],  # Jan
-            month_strings[m][:3].lower(),  # jan
-            month_strings[m][:4],  # Janu
-            month_strings[m][:4].lower(),  # janu
-        ]
-
-        for v in possible_values:
-            month_dict[v] = standard  # Without { and }
-            month_dict["{" + str(v) + "}"] = standard  # With { and }
-
-    return month_dict
-
-
-month_dict = make_month_dict()
-
-
-def month_to_standard(month):
-    if month not in month_dict:
-        return None
-
-    return month_dict[month]
-
-
-def month_from_timestamp(timestamp):
-    date = datetime.datetime.strptime(timestamp, '%Y-%m-%dT%H:%M:%SZ')
-
-    return month_to_standard(date.month)
-
-
-def month_from_crossref_item(item):
-    dp = item["issued"]["date-parts"][0]
-    if len(dp) >= 2:
-        month = dp[1]
-        return month_to_standard(month)
-    else:
-        return None
-
-
-def month_from_doi(entry):
-    if "doi" in entry.fields:
-        doi = strip_curly_brackets(entry.fields["doi"])
-    else:
-        print(f"{entry.key}: No doi in entry, so could not find month")
-        return None
-    response = requests.get(f"https://api.crossref.org/works/{doi}")
-
-    if not response.ok:
-        print(f"{entry.key}: Could not find month from doi {doi}")
-        return None
-
-    res = response.json()
-    item = res["message"]
-    month = month_from_crossref_item(item)
-    if month is None:
-        print(f"{entry.key}: No issue date found in crossref api")
-    else:
-        return month
-
-
-def month_from_arxiv_id(entry):
-    if "journal" not in entry.fields:
-        print(f"{entry.key}: While trying to find arxiv id: no journal")
-        return None
-
-    journal = strip_curly_brackets(entry.fields["journal"])
-    if not journal.startswith("arXiv"):
-        print(f"{entry.key}: While trying to find arxiv id: has journal tag, but is not an arxiv paper")
-        return None
-
-    arxiv_id = journal.split(":")[-1]
-    timestamp = pyarxiv.query(ids=[arxiv_id])[0]["published"]
-
-    return month_from_timestamp(timestamp)
-
-
-def alpha_num_lower(s):
-    return re.compile('[^a-zA-Z]').sub("", s).lower()
-
-
-def month_from_title_and_author(entry):
-    title = strip_curly_brackets(entry.fields["title"]).replace("&", "%26")
-    authors = strip_curly_brackets(entry.fields["author"]).replace("&", "%26")
-    url = f"https://api.crossref.org/works?rows=5&query.bibliographic={title} {authors}"
-    response = requests.get(url)
-
-    if not response.ok:
-        print(f"{entry.key}: Could not load crossref api")
-        return None
-
-    res = response.json()
-    items = res["message"]["items"]
-
-    for item in items:
-        if "author" not in item or "title" not in item:
-            continue
-
-        equal_title = alpha_num_lower(item["title"][0]) == alpha_num_lower(title)
-
-        equal_authors = True
-
-        for item_author in item["author"]:
-            if "family" not in item_author or alpha_num_lower(item_author["family"]) not in alpha_num_lower(authors):
-                equal_authors = False
-                break
-
-        if equal_title and equal_authors:
-            month = month_from_crossref_item(item)
-            if month is None:
-                print(f"{entry.key}: No issue date found in crossref api")
-            else:
-                return month
-
-    print(f"{entry.key}: No corresponding paper in crossref api found")
-
-    return None
-
-
-def check_months(entries):
+def check_months(entries, checkpoint=None):
+    """checkpoint is a file the months that were looked up are kept in, to continue an interrupted run from"""
     print("\nCheck if months are present and well formatted, and solve if possible:")
     entries_to_check = [e for e in entries if e.type != "string"]
 
-    for entry in tqdm.tqdm(entries_to_check, desc="Checking months"):
-        # Check if month key is already there
+    # Check if month key is already there
+    for entry in entries_to_check:
         if "month" in entry.fields:
             old_month = entry.fields["month"]
             month = month_to_standard(old_month)
@@ -708,33 +1164,23 @@ def check_months(entries):
                 entry.fields["month"] = month
                 print(f"{entry.key}: formatted {old_month} to {month}")
 
-            continue
-
-        # Get month based on doi key
-        doi_month = month_from_doi(entry)
-        if doi_month is not None:
-            entry.fields["month"] = doi_month
-            print(f"{entry.key}: Found month {doi_month} for doi {entry.fields['doi']}")
+    # Get month based on doi key, arXiv paper or title and authors
+    entries_to_check = [e for e in entries_to_check if "month" not in e.fields]
+    months = MonthResolver(checkpoint=checkpoint).resolve(entries_to_check, progress=tqdm.tqdm)
 
+    for entry in entries_to_check:
+        month, source = months.get(entry.key, (None, None))
+        if month is None:
+            print(f"{entry.key}: No month found at all")
             continue
 
-        # Get month based on arXiv paper
-        arxiv_month = month_from_arxiv_id(entry)
-        if arxiv_month is not None:
-            entry.fields["month"] = arxiv_month
-            print(f"{entry.key}: Found month {arxiv_month} for arxiv {entry.fields['journal']}")
-
-            continue
-
-        # Get month based on title and authors
-        ta_moth = month_from_title_and_author(entry)
-        if ta_moth is not None:
-            entry.fields["month"] = ta_moth
-            print(f"{entry.key}: Found month {ta_moth} based on title and authors")
-
-            continue
-
-        print(f"{entry.key}: No month found at all")
+        entry.fields["month"] = month
+        if source == "doi":
+            print(f"{entry.key}: Found month {month} for doi {entry.fields['doi']}")
+        elif source == "arxiv":
+            print(f"{entry.key}: Found month {month} for arxiv {entry.fields['journal']}")
+        else:
+            print(f"{entry.key}: Found month {month} based on title and authors")
 
 
 def find_accent_string(main_string, accent_string):
@@ -765,7 +1211,7 @@ def find_accent_string(main_string, accent_string):
 
 def check_accents(entries, field='author'):
     print("Checking accents from specific authors")
-    authors_with_accents = [r"S\'{a}nchez", r"S\'{a}nchez-Guti\'{e}rrez"]
+    authors_with_accents = [to_latex("Sánchez"), to_latex("Sánchez-Gutiérrez")]
 
     for entry in entries:
         if field in entry.fields:
@@ -795,12 +1241,19 @@ def check_accents(entries, field='author'):
                         print('Not changing author field')
 
 
-def save_to_file(entries, fname, full_path=None):
+def save_to_file(entries, fname, full_path=None, atomic=False):
+    """
+    Writes the entries to literature_root/fname or full_path, strings sorted by key followed by the other entries
+    sorted by key, with \r\n line endings
+    with atomic=True the file is written to a temporary file next to it first and then renamed, so readers never see
+    a partially written file
+    """
     # sort on strings by key, followed by other entries
     keys = list()
     stringkeys = list()
+    first_entry = {}
     for i in entries:
-        l = i.to_lines()
+        first_entry.setdefault(i.key, i)
         if i.type == 'string':
             stringkeys.append(i.key)
         else:
@@ -808,24 +1261,20 @@ def save_to_file(entries, fname, full_path=None):
     keys.sort()
     stringkeys.sort()
 
-    if full_path == None:
-        file = io.open(literature_root + '/' + fname, 'w', newline='\r\n', encoding="utf-8")
-    else:
-        file = io.open(full_path, 'w', newline='\r\n', encoding="utf-8")
-
+    # every key is written as the first entry with that key
+    lines = []
     for i in stringkeys:
-        for j in entries:
-            if j.key == i:
-                file.writelines(j.to_lines())
-                break
+        lines.extend(first_entry[i].to_lines())
     for i in keys:
-        for j in entries:
-            if j.key == i:
-                file.write("\n")
-                file.writelines(j.to_lines())
-                break
+        lines.append("\n")
+        lines.extend(first_entry[i].to_lines())
 
-    file.close()
+    path = literature_root + '/' + fname if full_path == None else full_path
+    out_path = path + '.tmp' if atomic else path
+    with io.open(out_path, 'w', newline='\r\n', encoding="utf-8") as file:
+        file.write(''.join(lines))
+    if atomic:
+        os.replace(out_path, path)
 
 
 def creating_shared_link_password(dbx, path, password):
@@ -936,7 +1385,8 @@ if __name__ == '__main__':
     # =====================================
     # Checking bib files individually
     # =====================================
-    entries = read_bibfile('diag.bib')
+    # this is run again and again while working on diag.bib, so the parsed entries are kept in the on-disk cache
+    entries = read_bibfile('diag.bib', cache=True)
 
     gsdata = read_pop()
     add_gsid(gsdata, entries)
@@ -948,7 +1398,7 @@ if __name__ == '__main__':
     # check_doi(entries)
     # check_duplicates(entries)
     # check_keys(entries)
-    # check_months(entries)
+    # check_months(entries, checkpoint='diag.bib.months')
     # check_accents(entries, 'author')
     # check_accents(entries, 'copromotor')
 
@@ -957,8 +1407,8 @@ if __name__ == '__main__':
     # =====================================
     # Comparing diag.bib and diagnoweb.bib
     # =====================================
-    # diag_enries = read_bibfile('diag.bib')
-    # diagnoweb_entries = read_bibfile('diagnoweb.bib')
+    # collection = load_bib_collection([literature_root + '/diag.bib', literature_root + '/diagnoweb.bib'])
+    # diag_enries, diagnoweb_entries = collection.values()
     #
     # check_duplicates_among_bibfiles(diag_enries, diagnoweb_entries)
 
@@ -0,0 +1,99 @@
+import re
+from difflib import SequenceMatcher
+from itertools import chain
+
+"""
+
+This file contains the fuzzy title matching used to find bib entries for items found on Semantic Scholar. Titles are
+compared with difflib's SequenceMatcher ratio, like before. Matches above the threshold are only looked for among the
+bib titles that share at least one informative word with the title that is looked up (blocking through an inverted
+word index), a title with too few informative words to block on is compared with all bib titles. The most similar bib
+title is still taken from all bib titles: the candidates are compared first, and cheap upper bounds of the ratio then
+skip most of the others before the full ratio is computed.
+
+"""
+
+_word = re.compile(r"[a-z0-9]+")
+
+# words in more than this fraction of the bib titles (like "the", "of", "learning") are not used to find candidates
+max_word_fraction = 0.05
+
+# titles with fewer informative words than this are compared with all bib titles, a match may share none of them
+min_blocking_words = 2
+
+
+def clean_title(title):
+    """lower case title without curly brackets, the form in which titles are compared"""
+    return title.lower().replace('{', '').replace('}', '')
+
+
+class TitleMatcher:
+    """
+    Finds the bib titles that are most similar to a title, by SequenceMatcher(a=title, b=bib_title).ratio()
+    the bib titles are cleaned and indexed once, so looking up many titles only compares against likely candidates
+    """
+
+    def __init__(self, titles):
+        self.titles = [clean_title(t) for t in titles]
+        postings = {}
+        for i, title in enumerate(self.titles):
+            for word in set(_word.findall(title)):
+                postings.setdefault(word, []).append(i)
+        max_postings = max(1, int(max_word_fraction * len(self.titles)))
+        self.index = {word: ids for word, ids in postings.items() if len(ids) <= max_postings}
+        # the analysis of b is the expensive part of a SequenceMatcher, so one is kept per bib title
+        self._matchers = [None] * len(self.titles)
+
+    def candidates(self, title):
+        """
+        indexes of the bib titles that share an informative word with title, the ones sharing the most words first,
+        followed by all other bib titles if title has fewer than min_blocking_words informative words
+        """
+        shared = {}
+        words = [w for w in set(_word.findall(title)) if w in self.index]
+        for word in words:
+            for i in self.index[word]:
+                shared[i] = shared.get(i, 0) + 1
+        candidates = sorted(shared, key=lambda i: (-shared[i], i))
+        if len(words) < min_blocking_words:
+            candidates.extend(i for i in range(len(self.titles)) if i not in shared)
+        return candidates
+
+    def _matcher(self, i):
+        m = self._matchers[i]
+        if m is None:
+            m = self._matchers[i] = SequenceMatcher(b=self.titles[i])
+        return m
+
+    def match(self, title, threshold=0.8):
+        """
+        returns the index and ratio of the most similar bib title (the first one on a tie) among all bib titles, and a
+        list of (index, ratio) of the candidates with a ratio above threshold, in bib order
+        the candidates are compared first, the other bib titles are mostly skipped by the quick ratios after that
+        """
+        a = title.lower()
+        candidates = self.candidates(a)
+        shortlisted = set(candidates)
+        others = (i for i in range(len(self.titles)) if i not in shortlisted)
+        best, best_ratio = None, -1.0
+        matches = []
+        for i in chain(candidates, others):
+            # only candidates can be matches, the other titles are only compared to find the best one
+            limit = threshold if i in shortlisted else 1.0
+            m = self._matcher(i)
+            m.set_seq1(a)
+            # both quick ratios are upper bounds of ratio(), skip titles that can neither match nor beat the best one
+            bound = m.real_quick_ratio()
+            if bound <= limit and bound < best_ratio:
+                continue
+            bound = m.quick_ratio()
+            if bound <= limit and bound < best_ratio:
+                continue
+            ratio = m.ratio()
+            if ratio > best_ratio or (ratio == best_ratio and i < best):
+                best, best_ratio = i, ratio
+            if ratio > limit:
+                matches.append((i, ratio))
+        if best is None:
+            best, best_ratio = 0, 0.0
+        return best, best_ratio, sorted(matches)
@@ -0,0 +1,40 @@
+"""
+Checks for the conversion of accented characters to latex: the compiled table gives the same text as replacing every
+item of script_data/accent_mappings.py one after the other.
+"""
+
+import pytest
+
+from bib_handling_code.accents import Transliterator, to_latex
+from script_data.accent_mappings import accent_mappings
+
+
+def replace_one_by_one(s, mappings=accent_mappings):
+    for char, latex in mappings.items():
+        s = s.replace(char, latex)
+    return s
+
+
+def check_same_as_replacing_one_by_one():
+    texts = [
+        "Sánchez-Gutiérrez, Clara I. and Ginneken, Bram van",
+        "Agreement was high (Cohen's $κ_w$ = 0.81) for Ø 5 × 5 mm nodules in Dür, Çelik and Bǎlan",
+        "".join(accent_mappings) + " $κ_w$$κ_w$ plain text",
+        "",
+    ]
+    for text in texts:
+        assert to_latex(text) == replace_one_by_one(text)
+
+
+def check_sequences():
+    assert to_latex("$κ_w$") == r"$\kappa$\textsubscript{w}"
+    assert to_latex("×$κ_w$") == r"$\times$$\kappa$\textsubscript{w}"
+
+
+def check_tables_that_need_more_passes_are_refused():
+    with pytest.raises(ValueError):
+        Transliterator({"é": "é", "́": "'"})
+    with pytest.raises(ValueError):
+        Transliterator({"ae": "æ", "a": "b"})
+    longest = Transliterator({"é": "e", "ab": "1", "abc": "2"})
+    assert longest("abcé ab") == replace_one_by_one("abcé ab", {"é": "e", "abc": "2", "ab": "1"})
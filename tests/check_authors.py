@@ -0,0 +1,69 @@
+"""
+Checks for get_publications_by_author: matching authors only against the researchers with the same last name must give
+the same publications, in the same order, as matching every researcher against every author.
+"""
+
+from bib_handling_code.authors import get_publications_by_author, match_author_publication, parse_name
+
+list_researchers = {
+    "bram-van-ginneken": (["Bram", "van", "Ginneken"], ["diag"], "bram van ginneken", "Bram van Ginneken", "yes"),
+    "jeroen-van-der-laak": (["Jeroen", "van", "der", "Laak"], ["pathology"], "jeroen van der laak",
+                            "Jeroen van der Laak", "yes"),
+    "ajay-patel": (["Ajay", "Patel"], ["diag"], "ajay patel", "Ajay Patel", "yes"),
+    "colin-jacobs": (["Colin", "Jacobs"], ["diag"], "colin jacobs", "Colin Jacobs", "yes"),
+    "clarisa-sanchez": (["Clarisa", "Sanchez"], ["diag"], "clarisa sanchez", "Clarisa Sanchez", "no"),
+    "Nadieh-Khalili": (["Nadieh", "Khalili"], ["diag"], "Nadieh Khalili", "Nadieh Khalili", "yes"),
+}
+
+bib_items = {
+    "Jaco21": {"author": "Jacobs, Colin and van Ginneken, Bram"},
+    "Laak19": {"author": "J A W M van der Laak and Jeroen van-der-Laak and Jacobs, C."},
+    "Pate20": {"author": "Patel, A. and Patel, Anup and Meijs, M F L"},
+    "Ginn18": {"author": "B. van Ginneken and Sanchez, C. I. and Khalili, Nadieh"},
+    "Smit22": {"author": "Smith, John"},
+    "Book17": {"title": "no authors"},
+}
+
+
+def legacy_get_publications_by_author(bib_items, list_researchers):
+    author_bibkeys = {}
+    for bib_key, bib_item in bib_items.items():
+        if "author" not in bib_item:
+            continue
+        authors = bib_item["author"]
+        for name, value in list_researchers.items():
+            researcher_name, _, _, _, _ = value
+            firstname = researcher_name[0].lower()
+            lastnames = [n.lower() for n in researcher_name[1:]]
+            if len(lastnames) > 1:
+                lastnames.append("-".join(lastnames))
+            for author_pub in authors:
+                if match_author_publication(firstname, lastnames, author_pub, bib_key):
+                    author_bibkeys.setdefault(name.lower(), []).append(bib_key)
+    return author_bibkeys
+
+
+def parsed(bib_items):
+    return {key: {field: [parse_name(n) for n in value.split(" and ")] if field == "author" else value
+                  for field, value in item.items()}
+            for key, item in bib_items.items()}
+
+
+def check_publications_equal_legacy():
+    items = parsed(bib_items)
+    publications = get_publications_by_author(items, list_researchers)
+    legacy = legacy_get_publications_by_author(items, list_researchers)
+    assert publications == legacy
+    assert list(publications) == list(legacy)
+
+
+def check_publications():
+    publications = get_publications_by_author(parsed(bib_items), list_researchers)
+    assert publications == {
+        "bram-van-ginneken": ["Jaco21", "Ginn18"],
+        "jeroen-van-der-laak": ["Laak19", "Laak19"],
+        "ajay-patel": ["Pate20"],
+        "colin-jacobs": ["Jaco21", "Laak19"],
+        "clarisa-sanchez": ["Ginn18"],
+        "nadieh-khalili": ["Ginn18"],
+    }
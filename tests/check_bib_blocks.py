@@ -0,0 +1,64 @@
+"""
+Checks for the block scanner of bibreader: get_bib_blocks must give the same blocks as the character by character
+scan it replaced, for @string and @comment blocks, braces and @ inside values and stray text between blocks, and on
+the bib files in the repository.
+"""
+
+import os
+
+import pytest
+
+from bib_handling_code.bibreader import get_bib_blocks
+
+literature_root = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir)
+
+content = """% a comment line outside of the blocks, with a stray } brace
+@String { _Radiology_ = {Radiology} }
+@comment{jabref-meta: databaseType:bibtex;}
+
+@article{Ginn20,
+  author = {van Ginneken, Bram and {de Vries}, Ann},
+  title = {{Deep} learning for {{CT}} {lung {nodule}} detection},
+  journal = _Radiology_,
+  note = {mail b.vanginneken@radboudumc.nl},
+  year = {2020},
+}
+
+Text between entries.
+@phdthesis{Vree16,
+  abstract = {Nested {braces {three} deep} and a closing one at the end},
+}
+"""
+
+
+def legacy_bib_blocks(content, start_character="@"):
+    blocks = []
+    delimiter_stack = []
+    for i, c in enumerate(content):
+        if c == "{":
+            delimiter_stack.append(i)
+        elif c == "}" and delimiter_stack:
+            start = delimiter_stack.pop()
+            if len(delimiter_stack) == 0:
+                start_index = content.rfind(start_character, 0, start)
+                blocks.append((content[start_index:start], content[start + 1 : i]))
+    return blocks
+
+
+def check_blocks():
+    blocks = get_bib_blocks(content)
+    assert blocks == legacy_bib_blocks(content)
+    assert [header for header, _ in blocks] == ["@String ", "@comment", "@article", "@phdthesis"]
+    assert blocks[0][1] == " _Radiology_ = {Radiology} "
+    assert blocks[2][1].startswith("Ginn20,\n  author = {van Ginneken, Bram and {de Vries}, Ann},")
+    assert blocks[2][1].endswith("  year = {2020},\n")
+    assert blocks[3][1] == "Vree16,\n  abstract = {Nested {braces {three} deep} and a closing one at the end},\n"
+
+
+@pytest.mark.parametrize("bib_file", ["fullstrings.bib", "diag_taverne.bib"])
+def check_blocks_of_bib_files(bib_file):
+    with open(os.path.join(literature_root, bib_file), encoding="utf-8") as f:
+        text = f.read()
+    blocks = get_bib_blocks(text)
+    assert len(blocks) > 0
+    assert blocks == legacy_bib_blocks(text)
@@ -0,0 +1,35 @@
+"""
+Checks for load_bib_collection: parsing bib files split into chunks, in this process or in worker processes, must give
+the same entries as reading every file with read_bibfile, and the merged database knows where every entry came from.
+"""
+
+import os
+
+import pytest
+
+processbib = pytest.importorskip("bib_handling_code.processbib")
+
+literature_root = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir)
+paths = [os.path.join(literature_root, name) for name in ("fullstrings.bib", "diag_taverne.bib")]
+
+
+def state(entries):
+    return [(e.key, e.type, e.value, dict(e.fields)) for e in entries]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def check_collection_equals_read_bibfile(workers):
+    collection = processbib.load_bib_collection(paths, workers=workers, chunk_size=1 << 18)
+    assert list(collection) == paths
+    for path in paths:
+        assert state(collection[path]) == state(processbib.read_bibfile(None, path, cache=False))
+
+
+def check_merged_collection():
+    collection = processbib.load_bib_collection(paths, workers=1, chunk_size=1 << 18)
+    db = processbib.load_bib_collection(paths, workers=1, merged=True, chunk_size=1 << 18)
+    try:
+        assert state(db) == state(collection[paths[0]] + collection[paths[1]])
+        assert [db.source(e) for e in db] == [path for path in paths for _ in collection[path]]
+    finally:
+        db.close()
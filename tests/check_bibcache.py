@@ -0,0 +1,164 @@
+"""
+Checks for the on-disk cache of parsed bib files: a cached result is only used as long as the source files and the
+parser version did not change.
+"""
+
+import os
+
+import latexcodec  # registers the ulatex codec used by bibreader, installed with pybtex
+import pytest
+
+from bib_handling_code import bibcache
+from bib_handling_code.bibreader import get_full_strings, parse_bibtex_file
+
+literature_root = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir)
+strings = "@String { _Radiology_ = {Radiology} }\n@String { _Medical_Physics_ = {Medical Physics} }\n"
+
+
+def counting_parse(path, calls):
+    def parse():
+        calls.append(path)
+        with open(path) as f:
+            return f.read().upper()
+
+    return parse
+
+
+def check_cache_hit(tmp_path):
+    bib = tmp_path / "a.bib"
+    bib.write_text(strings)
+    calls = []
+
+    first = bibcache.cached("test", [str(bib)], counting_parse(str(bib), calls))
+    second = bibcache.cached("test", [str(bib)], counting_parse(str(bib), calls))
+
+    assert first == second == strings.upper()
+    assert len(calls) == 1
+    assert os.path.exists(bibcache.cache_file(str(bib), "test"))
+
+
+def check_cache_invalidated_by_content(tmp_path):
+    bib = tmp_path / "a.bib"
+    bib.write_text(strings)
+    calls = []
+    bibcache.cached("test", [str(bib)], counting_parse(str(bib), calls))
+
+    bib.write_text(strings + "@String { _Lancet_ = {Lancet} }\n")
+    result = bibcache.cached("test", [str(bib)], counting_parse(str(bib), calls))
+
+    assert "LANCET" in result
+    assert len(calls) == 2
+
+
+def check_cache_invalidated_by_any_source(tmp_path):
+    bib = tmp_path / "a.bib"
+    other = tmp_path / "b.bib"
+    bib.write_text(strings)
+    other.write_text("")
+    calls = []
+    bibcache.cached("test", [str(bib), str(other)], counting_parse(str(bib), calls))
+
+    other.write_text("% changed\n")
+    bibcache.cached("test", [str(bib), str(other)], counting_parse(str(bib), calls))
+
+    assert len(calls) == 2
+
+
+def check_cache_invalidated_by_parser_version(tmp_path, monkeypatch):
+    bib = tmp_path / "a.bib"
+    bib.write_text(strings)
+    calls = []
+    bibcache.cached("test", [str(bib)], counting_parse(str(bib), calls))
+
+    monkeypatch.setattr(bibcache, "PARSER_VERSION", bibcache.PARSER_VERSION + 1)
+    bibcache.cached("test", [str(bib)], counting_parse(str(bib), calls))
+
+    assert len(calls) == 2
+
+
+def check_corrupt_cache_ignored(tmp_path):
+    bib = tmp_path / "a.bib"
+    bib.write_text(strings)
+    with open(bibcache.cache_file(str(bib), "test"), "wb") as f:
+        f.write(b"not a pickle")
+    calls = []
+
+    result = bibcache.cached("test", [str(bib)], counting_parse(str(bib), calls))
+
+    assert result == strings.upper()
+    assert len(calls) == 1
+
+
+def check_full_strings_cached(tmp_path):
+    bib = tmp_path / "strings.bib"
+    bib.write_text(strings)
+
+    cold = get_full_strings(str(bib), cache=True)
+    warm = get_full_strings(str(bib), cache=True)
+
+    assert cold == warm == get_full_strings(str(bib))
+    assert cold["_Radiology_"] == "{Radiology}"
+
+
+def check_parse_bibtex_file_round_trip(tmp_path):
+    bib = tmp_path / "diag_taverne.bib"
+    bib.write_bytes(open(os.path.join(literature_root, "diag_taverne.bib"), "rb").read())
+    full_strings = str(tmp_path / "fullstrings.bib")
+    open(full_strings, "wb").write(open(os.path.join(literature_root, "fullstrings.bib"), "rb").read())
+
+    parsed = parse_bibtex_file(str(bib), full_strings, cache=True)
+    key = bibcache.content_key("bibtex_file", [str(bib), full_strings])
+
+    assert bibcache.load(str(bib), "bibtex_file", key) is not None
+    assert parse_bibtex_file(str(bib), full_strings, cache=True) == parsed == parse_bibtex_file(str(bib), full_strings)
+
+
+def check_no_cache_by_default(tmp_path):
+    bib = tmp_path / "a.bib"
+    bib.write_text("@article{Ginn20,\n  author = {van Ginneken, Bram},\n  title = {Lungs},\n  journal = _Radiology_,\n  year = {2020},\n}\n")
+    full_strings = tmp_path / "fullstrings.bib"
+    full_strings.write_text(strings)
+
+    items = parse_bibtex_file(str(bib), str(full_strings))
+    assert items["ginn20"]["journal"] == "Radiology"
+    processbib = pytest.importorskip("bib_handling_code.processbib")
+    assert processbib.read_bibfile(None, str(bib))[0].key == "Ginn20"
+    processbib.IncrementalBibFile(str(bib)).load()
+
+    assert not [f for f in os.listdir(tmp_path) if f.endswith(".bibcache")]
+
+
+def check_read_bibfile_round_trip(tmp_path):
+    processbib = pytest.importorskip("bib_handling_code.processbib")
+    bib = tmp_path / "diag_taverne.bib"
+    bib.write_bytes(open(os.path.join(literature_root, "diag_taverne.bib"), "rb").read())
+
+    def state(entries):
+        return [(e.key, e.type, e.value, dict(e.fields), e.fields.changes) for e in entries]
+
+    parsed = processbib.read_bibfile(None, str(bib), cache=True)
+    # a cache that cannot be unpickled is ignored by load, so check that it is actually there
+    cached = bibcache.load(str(bib), "read_bibfile", bibcache.content_key("read_bibfile", [str(bib)]))
+
+    assert cached is not None
+    assert state(cached) == state(parsed) == state(processbib.read_bibfile(None, str(bib)))
+    assert all(isinstance(e.fields, processbib.BibFields) and e.fields.watchers is None for e in cached)
+    cached[0].fields["year"] = "{2000}"
+    assert cached[0].fields.changes == parsed[0].fields.changes + 1
+
+
+def check_append_only_parses_new_entries(tmp_path):
+    processbib = pytest.importorskip("bib_handling_code.processbib")
+    bib = tmp_path / "a.bib"
+    entries = "".join(f"@article{{Auth{i:02d},\n  title = {{Title {i}}},\n  year = {{2020}},\n}}\n\n" for i in range(30))
+    # save_to_file writes crlf
+    bib.write_bytes(entries.rstrip().replace("\n", "\r\n").encode() + b"\r\n")
+    bib_file = processbib.IncrementalBibFile(str(bib), persist=False)
+    bib_file.load()
+
+    changes = bib_file.append("\n@article{New20,\n  title = {New},\n  year = {2020},\n}\n")
+
+    assert changes == processbib.BibChanges(added=["New20"], removed=[], modified=[])
+    data = bib.read_bytes()
+    assert data.count(b"\n") == data.count(b"\r\n")
+    assert data.endswith(b"}\r\n\r\n@article{New20,\r\n  title = {New},\r\n  year = {2020},\r\n}\r\n")
@@ -0,0 +1,50 @@
+"""
+Checks for the indexes of BibDatabase: they follow changes to the fields of the entries while the database is open, and
+a closed database no longer watches the entries.
+"""
+
+import gc
+import weakref
+
+import pytest
+
+processbib = pytest.importorskip("bib_handling_code.processbib")
+
+
+def make_entry(key, **fields):
+    entry = processbib.BibEntry()
+    entry.key = key
+    entry.type = "article"
+    entry.fields = {name: "{" + value + "}" for name, value in fields.items()}
+    return entry
+
+
+def check_indexes_follow_changes():
+    entries = [make_entry("Ginn20", doi="10.1148/radiol.2020"), make_entry("Penz21", pmid="123")]
+    with processbib.BibDatabase(entries) as bib:
+        assert bib.find_doi("https://doi.org/10.1148/RADIOL.2020") is entries[0]
+        entries[1].fields["doi"] = "{10.1000/xyz}"
+        assert bib.find_doi("10.1000/xyz") is entries[1]
+        assert bib.find_pmid("123") is entries[1]
+
+
+def check_close_detaches_watchers():
+    entries = [make_entry("Ginn20", doi="10.1148/radiol.2020")]
+    # a database per step, like update_bibfile makes them
+    for _ in range(3):
+        processbib.BibDatabase(entries).close()
+    assert entries[0].fields.watchers is None
+
+    bib = processbib.BibDatabase(entries)
+    other = processbib.BibDatabase(entries)
+    bib.close()
+    assert len(entries[0].fields.watchers) == 1
+    entries[0].fields["doi"] = "{10.1000/xyz}"
+    assert other.find_doi("10.1000/xyz") is entries[0]
+
+    # the entries do not keep a closed database alive
+    ref = weakref.ref(other)
+    other.close()
+    del other
+    gc.collect()
+    assert ref() is None
@@ -0,0 +1,72 @@
+"""
+Checks for the allocation of keys for new bib entries: a base key like Ginn23 is only used when no version of it
+exists, otherwise the first free suffix is added, and keys handed out in one run are never handed out again.
+"""
+
+import os
+
+from bib_handling_code.bibkeys import KeyAllocator
+
+root = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir)
+
+bib_text = """@String { _Radiology_ = {Radiology} }
+
+@article{Ginn23,
+  author = {van Ginneken, Bram},
+  file = {Ginn23.pdf:pdf\\\\Ginn23.pdf:PDF},
+}
+
+@Article{Ginn23a ,
+  author = {van Ginneken, Bram},
+}
+
+@inproceedings{ Jaco21b,
+  author = {Jacobs, Colin},
+}
+"""
+
+
+def check_keys_are_read_from_bib_text():
+    keys = KeyAllocator.from_bib_text(bib_text)
+    # @String definitions are not entries
+    assert keys.keys == {"ginn23", "ginn23a", "jaco21b"}
+
+
+def check_base_key_is_used_when_free():
+    keys = KeyAllocator.from_bib_text(bib_text)
+    assert keys.allocate("Ciom15") == "Ciom15"
+    assert keys.allocate("Ciom15") == "Ciom15a"
+
+
+def check_first_free_suffix():
+    keys = KeyAllocator.from_bib_text(bib_text)
+    assert keys.allocate("Ginn23") == "Ginn23b"
+    # only a suffixed key exists, the base key is not used then
+    assert keys.allocate("Jaco21") == "Jaco21a"
+    assert keys.allocate("Jaco21") == "Jaco21c"
+
+
+def check_keys_are_compared_without_case():
+    keys = KeyAllocator(["GINN23"])
+    assert "ginn23" in keys
+    assert keys.allocate("Ginn23") == "Ginn23a"
+
+
+def check_large_batch_has_no_collisions():
+    keys = KeyAllocator.from_bib_text(bib_text)
+    allocated = [keys.allocate(base) for _ in range(1000) for base in ("Ginn23", "Jaco21", "Hern24")]
+    assert len({k.lower() for k in allocated}) == len(allocated) == 3000
+    assert not {k.lower() for k in allocated} & {"ginn23", "ginn23a", "jaco21b"}
+    # after z the suffixes continue with two letters
+    assert allocated[3 * 25] == "Ginn23aa"
+
+
+def check_no_collisions_with_checked_in_bib_file():
+    with open(os.path.join(root, "diag_orig_and_ss_merged.bib"), encoding="utf-8") as f:
+        text = f.read()
+    keys = KeyAllocator.from_bib_text(text)
+    existing = set(keys.keys)
+    bases = sorted({k[:6] for k in existing if len(k) >= 6 and k[4:6].isdigit()})
+    allocated = [keys.allocate(base) for base in bases * 5]
+    assert len({k.lower() for k in allocated}) == len(allocated)
+    assert not {k.lower() for k in allocated} & existing
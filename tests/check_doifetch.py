@@ -0,0 +1,106 @@
+"""
+Checks for the doi fetching of new bib entries against a local stub of doi.org: every doi is fetched once, redirects
+are followed, dois are fetched concurrently, a second run with the same cache directory does not fetch anything, and
+the default fetcher of get_biblatex is only made when it is used.
+"""
+
+import importlib
+import json
+import os
+import time
+
+import pytest
+
+from bib_handling_code import httpclient
+from bib_handling_code.doifetch import CSL_ACCEPT, DoiFetcher, DoiFetchError
+from conftest import StubHandler
+
+csl = {
+    "10.1148/radiol.2020": {"type": "journal-article", "DOI": "10.1148/radiol.2020", "title": "Lung nodules",
+                            "author": [{"family": "van Ginneken", "given": "Bram"}]},
+    "10.1016/j.media.2021": {"type": "journal-article", "DOI": "10.1016/j.media.2021", "title": "Segmentation",
+                             "author": [{"family": "Jacobs", "given": "Colin"}]},
+}
+page = b'<html><head><meta name="dc.description" content="An abstract."></head></html>'
+
+
+class Handler(StubHandler):
+    def do_GET(self):
+        time.sleep(self.server.delay)
+        if self.path.startswith("/csl/"):
+            return self.send(200, json.dumps(csl[self.path[5:]]).encode(), [("Content-Type", CSL_ACCEPT)])
+        if self.path.startswith("/landing/"):
+            # like some publishers, the page is only shown once the cookie it sets is sent back
+            if "session=1" not in (self.headers["Cookie"] or ""):
+                return self.send(302, headers=[("Location", self.path), ("Set-Cookie", "session=1; Path=/")])
+            return self.send(200, page, [("Content-Type", "text/html")])
+        doi = self.path[1:]
+        if doi not in csl:
+            return self.send(404, b"DOI Not Found")
+        if self.headers["Accept"] == CSL_ACCEPT:
+            return self.send(303, headers=[("Location", f"/csl/{doi}")])
+        self.send(302, headers=[("Location", f"{self.server.url}/landing/{doi}")])
+
+
+@pytest.fixture
+def server(serve):
+    return serve(Handler, delay=0)
+
+
+def check_csl_and_landing_page(server):
+    fetcher = DoiFetcher(resolver=server.url)
+    assert fetcher.csl("10.1148/radiol.2020") == csl["10.1148/radiol.2020"]
+    assert fetcher.landing_page("10.1148/radiol.2020") == page
+
+
+def check_every_doi_is_fetched_once(server):
+    fetcher = DoiFetcher(resolver=server.url)
+    fetcher.prefetch(list(csl) * 3)
+    requests = fetcher.requests
+    for doi in csl:
+        fetcher.csl(doi)
+        fetcher.csl(doi)
+        fetcher.landing_page(doi)
+    assert fetcher.requests == requests
+    assert server.paths["/csl/10.1148/radiol.2020"] == 1
+    assert server.paths["/10.1148/radiol.2020"] == 2
+
+
+def check_dois_are_fetched_concurrently(server):
+    server.delay = 0.1
+    dois = list(csl)
+    start = time.monotonic()
+    DoiFetcher(resolver=server.url, workers=4).prefetch(dois)
+    # 2 dois of 2 requests for the csl and 3 for the landing page, 1 s when fetched one after the other
+    assert time.monotonic() - start < 0.6
+
+
+def check_cache_makes_rerun_free(server, tmp_path):
+    DoiFetcher(resolver=server.url, cache_dir=str(tmp_path)).prefetch(list(csl))
+    fetcher = DoiFetcher(resolver=server.url, cache_dir=str(tmp_path))
+    fetcher.prefetch(list(csl))
+    assert fetcher.requests == 0
+    assert fetcher.csl("10.1016/j.media.2021") == csl["10.1016/j.media.2021"]
+    assert fetcher.landing_page("10.1016/j.media.2021") == page
+
+
+def check_unknown_doi(server, tmp_path):
+    fetcher = DoiFetcher(resolver=server.url, cache_dir=str(tmp_path))
+    fetcher.prefetch(["10.1/unknown"])
+    with pytest.raises(DoiFetchError) as e:
+        fetcher.csl("10.1/unknown")
+    assert e.value.status == 404
+    assert fetcher.landing_page("10.1/unknown") == b"DOI Not Found"
+    # failures are not cached, a next run tries again
+    assert not os.listdir(tmp_path)
+
+
+def check_default_fetcher_is_made_on_first_use(monkeypatch):
+    pytest.importorskip("bs4")
+    # replay mode without fixtures, a client cannot be made
+    monkeypatch.setenv("LITERATURE_HTTP_MODE", "replay")
+    monkeypatch.delenv("LITERATURE_HTTP_FIXTURES", raising=False)
+    monkeypatch.setattr(httpclient, "_shared", None)
+    get_biblatex = importlib.reload(importlib.import_module("automatic_update.get_biblatex"))
+    with pytest.raises(ValueError):
+        get_biblatex.default_fetcher()
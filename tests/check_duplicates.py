@@ -0,0 +1,52 @@
+"""
+Checks for the duplicate detection: entries are grouped on normalized key, doi, title and first author plus year,
+and every group of two or more entries is reported as one cluster.
+"""
+
+from bib_handling_code.duplicates import duplicate_clusters, first_author_year, normalize_doi, normalize_title
+
+entries = [
+    ("Ginn20", {"author": "{van Ginneken, Bram and Jacobs, Colin}", "year": "{2020}",
+                "title": "{Deep Learning for Lung Nodule Detection}", "doi": "{10.1148/radiol.2020}"}),
+    ("ginn20", {"author": "{B. van Ginneken}", "year": "{2020}", "title": "{Something else entirely, really}"}),
+    ("Jaco21", {"author": "{Jacobs, Colin}", "year": "{2021}",
+                "title": "{Deep learning for {L}ung {N}odule {D}etection.}", "doi": "{https://doi.org/10.1148/RADIOL.2020}"}),
+    ("Ciom15", {"author": "{Ciompi, Francesco}", "year": "{2015}", "title": "{Editorial}"}),
+    ("Ciom15a", {"author": "{Ciompi, Francesco}", "year": "{2015}", "title": "{Editorial}"}),
+]
+
+
+def clusters_of(kind, kinds=None):
+    return [c.keys for c in duplicate_clusters(entries, kinds or (kind,)) if c.kind == kind]
+
+
+def check_key_clusters_ignore_case():
+    assert clusters_of("key") == [["Ginn20", "ginn20"]]
+
+
+def check_doi_clusters_normalize_prefix_and_case():
+    assert normalize_doi("{https://doi.org/10.1148/RADIOL.2020}") == "10.1148/radiol.2020"
+    assert clusters_of("doi") == [["Ginn20", "Jaco21"]]
+
+
+def check_title_clusters_ignore_case_braces_and_punctuation():
+    assert normalize_title("{Deep learning for {L}ung {N}odule {D}etection.}") == "deeplearningforlungnoduledetection"
+    # short titles like "Editorial" are not compared
+    assert clusters_of("title") == [["Ginn20", "Jaco21"]]
+
+
+def check_author_year_clusters():
+    assert first_author_year(entries[0][1]) == first_author_year(entries[1][1]) == "ginneken:2020"
+    assert clusters_of("author_year") == [["Ginn20", "ginn20"], ["Ciom15", "Ciom15a"]]
+
+
+def check_clusters_are_reported_per_kind_in_order():
+    clusters = duplicate_clusters(entries)
+    assert [c.kind for c in clusters] == ["key", "doi", "title", "author_year", "author_year"]
+    assert all(len(c.keys) > 1 for c in clusters)
+
+
+def check_large_cluster_is_one_cluster():
+    same = [(f"Dupl{i}", {"doi": "{10.1/same}"}) for i in range(1000)]
+    clusters = duplicate_clusters(same, ("doi",))
+    assert len(clusters) == 1 and len(clusters[0].keys) == 1000
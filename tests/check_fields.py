@@ -0,0 +1,118 @@
+"""
+Checks for the field tokenizer of BibEntry.parse: it must split an entry into the same fields and values as the
+getFieldValue loop it replaced, for nested braces, quoted values, # concatenation and trailing commas.
+"""
+
+import pytest
+
+processbib = pytest.importorskip("bib_handling_code.processbib")
+
+entries = {
+    "nested braces": [
+        "@article{Ginn20,\n",
+        "  title = {{Deep} learning for {{CT}} {lung {nodule}} detection},\n",
+        "  author = {van Ginneken, Bram and {de Vries}, Ann},\n",
+        "  year = {2020},\n",
+        "}\n",
+    ],
+    "quoted values": [
+        "@article{Jaco21,\n",
+        '  title = "Emphysema",\n',
+        '  note = "A short note",\n',
+        "  year = 2021,\n",
+        "}\n",
+    ],
+    # the three below are not split sensibly, but they have to be split like before
+    "concatenation with braces": [
+        "@inproceedings{Sanc22,\n",
+        "  booktitle = _SPIE_ # { Medical Imaging},\n",
+        "}\n",
+    ],
+    "quoted value with braces": [
+        "@article{Jaco21,\n",
+        '  note = "A {"}quoted{"} note",\n',
+        "  year = 2021,\n",
+        "}\n",
+    ],
+    "quoted value with a comma": [
+        "@article{Jaco21,\n",
+        '  title = "Emphysema, a review",\n',
+        "  year = 2021,\n",
+        "}\n",
+    ],
+    "concatenation": [
+        "@inproceedings{Sanc22,\n",
+        "  journal = _Radiology_ # \" Suppl\" # _Radiology_,\n",
+        "  month = jan,\n",
+        "}\n",
+    ],
+    "trailing comma": [
+        "@article{Penz21,\n",
+        "  year = {2021},\n",
+        "  pages = {1--10},\n",
+        "}\n",
+    ],
+    "no trailing comma": [
+        "@article{Penz21, year = {2021}, pages = 10}\n",
+    ],
+    "value on several lines": [
+        "@phdthesis{Vree16,\n",
+        "  abstract = {First line,\n",
+        "    second line},\n",
+        "  school   =   {Radboud University},\n",
+        "}\n",
+    ],
+}
+
+
+def legacy_fields(lines):
+    """the fields as BibEntry.parse and getFieldValue found them before the tokenizer"""
+    line = ''.join(l + ' ' for l in lines).strip()
+    line = line[line.find(",") + 1:].strip()
+    line = line[:-1] + ",}"
+    fields = {}
+    while True:
+        i = line.find("=")
+        if i < 0:
+            return fields
+        field = line[0:i].strip()
+        line = line[i + 1:]
+        comma = line.find(",")
+        brace = line.find("{")
+        if brace > -1 and comma > -1 and brace < comma:
+            count = 1
+            i = brace + 1
+            while count > 0:
+                if line[i] == "}":
+                    count -= 1
+                if line[i] == "{":
+                    count += 1
+                i += 1
+            fields[field] = line[brace:i].strip()
+            line = line[i + 1:].strip()
+        else:
+            fields[field] = line[0:comma].strip()
+            line = line[comma + 1:].strip()
+
+
+def parse(lines):
+    be = processbib.BibEntry()
+    be.parse(lines)
+    return be
+
+
+@pytest.mark.parametrize("name", entries)
+def check_fields_equal_legacy(name):
+    assert dict(parse(entries[name]).fields) == legacy_fields(entries[name])
+
+
+def check_values():
+    assert parse(entries["nested braces"]).fields["title"] == "{{Deep} learning for {{CT}} {lung {nodule}} detection}"
+    assert parse(entries["nested braces"]).fields["author"] == "{van Ginneken, Bram and {de Vries}, Ann}"
+    assert dict(parse(entries["quoted values"]).fields) == {
+        "title": '"Emphysema"', "note": '"A short note"', "year": "2021"}
+    assert dict(parse(entries["concatenation"]).fields) == {
+        "journal": '_Radiology_ # " Suppl" # _Radiology_', "month": "jan"}
+    assert dict(parse(entries["trailing comma"]).fields) == {"year": "{2021}", "pages": "{1--10}"}
+    assert dict(parse(entries["no trailing comma"]).fields) == {"year": "{2021}", "pages": "10"}
+    assert parse(entries["value on several lines"]).fields["abstract"] == "{First line,\n     second line}"
@@ -0,0 +1,46 @@
+"""
+Checks for DirectoryIndex: exists and isfile must answer like os.path.exists and os.path.isfile, and an index only
+sees files written after the listing once it is refreshed or told about them.
+"""
+
+import os
+
+from bib_handling_code.fileindex import DirectoryIndex, directory_index
+
+
+def check_answers_equal_os_path(tmp_path):
+    (tmp_path / "Ginn20.pdf").write_bytes(b"%PDF")
+    (tmp_path / "Ginn20.png").write_bytes(b"")
+    (tmp_path / "publications").mkdir()
+    index = DirectoryIndex(str(tmp_path))
+    for name in ["Ginn20.pdf", "Ginn20.png", "publications", "Penz21.pdf", "ginn20.pdf", ""]:
+        assert index.exists(name) == os.path.exists(os.path.join(tmp_path, name)), name
+        assert index.isfile(name) == os.path.isfile(os.path.join(tmp_path, name)), name
+
+    missing = DirectoryIndex(str(tmp_path / "missing"))
+    assert not missing.exists("") and not missing.exists("Ginn20.pdf") and not missing.isfile("Ginn20.pdf")
+
+
+def check_refresh(tmp_path):
+    index = DirectoryIndex(str(tmp_path))
+    (tmp_path / "Ginn20.pdf").write_bytes(b"%PDF")
+    # the listing is only repeated when the modification time of the directory changed
+    mtime = index.mtime
+    os.utime(tmp_path, ns=(mtime, mtime))
+    index.refresh()
+    assert not index.isfile("Ginn20.pdf")
+    os.utime(tmp_path, ns=(mtime + 10 ** 9, mtime + 10 ** 9))
+    index.refresh()
+    assert index.isfile("Ginn20.pdf")
+
+    index.add("Penz21.png")
+    assert index.isfile("Penz21.png") and index.exists("Penz21.png")
+
+
+def check_shared_index(tmp_path):
+    index = directory_index(str(tmp_path) + "/")
+    assert directory_index(str(tmp_path)) is index
+    (tmp_path / "Ginn20.pdf").write_bytes(b"%PDF")
+    os.utime(tmp_path, ns=(index.mtime + 10 ** 9, index.mtime + 10 ** 9))
+    assert not directory_index(str(tmp_path)).isfile("Ginn20.pdf")
+    assert directory_index(str(tmp_path), refresh=True).isfile("Ginn20.pdf")
@@ -0,0 +1,157 @@
+"""
+Checks for the Semantic Scholar harvester against a local stub server that replays recorded author papers: all pages
+are fetched, 429 and 5xx responses are retried, other errors are reported per author, the rate limit and concurrency
+bound are respected, harvesting also works from a running event loop, and citation counts are fetched in batches of
+deduplicated ids, with the ids of a rejected batch tried again one by one.
+"""
+
+import asyncio
+import json
+import os
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from bib_handling_code.harvest import Harvester, HarvestError, fetch_citation_counts, harvest_author_papers
+from conftest import StubHandler
+
+with open(os.path.join(os.path.dirname(os.path.realpath(__file__)), "data", "ss_author_papers.json")) as f:
+    recorded = json.load(f)
+papers_by_id = {paper["paperId"]: paper for papers in recorded.values() for paper in papers}
+
+
+class Handler(StubHandler):
+    def do_POST(self):
+        parts = urlsplit(self.path)
+        ids = json.loads(self.body())["ids"]
+        self.server.requested.append(ids)
+        if self.server.failing_ids.intersection(ids):
+            return self.send(self.server.failing_status, {"error": "Invalid id"})
+        self.server.batches.append(ids)
+        fields = parse_qs(parts.query)["fields"][0].split(",")
+        self.send(200, [{"paperId": i, **{f: papers_by_id[i][f] for f in fields}} if i in papers_by_id else None
+                        for i in ids])
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(server.delay)
+            parts = urlsplit(self.path)
+            failures = server.failures.get(parts.path)
+            if failures:
+                status = failures.pop(0)
+                return self.send(status, {"message": "Too Many Requests"}, [("Retry-After", "0")])
+            author_id = parts.path.split("/")[2]
+            if author_id not in recorded:
+                return self.send(404, {"error": "Author not found"})
+            query = parse_qs(parts.query)
+            offset, limit = int(query["offset"][0]), int(query["limit"][0])
+            papers = recorded[author_id]
+            page = {"offset": offset, "data": papers[offset:offset + limit]}
+            if offset + limit < len(papers):
+                page["next"] = offset + limit
+            self.send(200, page)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+
+@pytest.fixture
+def server(serve):
+    # failures maps a path to the status codes to answer with before the recorded data, batches with one of the
+    # failing_ids get failing_status, requested holds the ids of every batch request, batches those that were answered
+    return serve(Handler, failures={}, in_flight=0, max_in_flight=0, delay=0, batches=[], requested=[],
+                 failing_ids=set(), failing_status=400)
+
+
+def check_all_pages_are_fetched(server):
+    papers, failed = harvest_author_papers(list(recorded), base_url=server.url, rate=1000, burst=10, page_size=2)
+    assert papers == recorded
+    assert failed == {}
+
+
+def check_harvest_from_a_running_event_loop(server):
+    # like from a jupyter notebook, which runs an event loop of its own
+    async def notebook_cell():
+        return harvest_author_papers(list(recorded), base_url=server.url, rate=1000, burst=10)
+
+    assert asyncio.run(notebook_cell()) == (recorded, {})
+
+
+def check_rate_limited_responses_are_retried(server):
+    server.failures["/author/8038506/papers"] = [429, 503]
+
+    async def run():
+        async with Harvester(base_url=server.url, rate=1000, burst=10, backoff=0.01) as harvester:
+            return await harvester.author_papers("8038506"), harvester.requests
+
+    papers, requests = asyncio.run(run())
+    assert papers == recorded["8038506"]
+    assert requests == 3
+
+
+def check_errors_are_reported_per_author(server):
+    ids = list(recorded)
+    papers, failed = harvest_author_papers(["1"] + ids, base_url=server.url, rate=1000, burst=10)
+    # the other authors are still fetched
+    assert papers == recorded
+    assert list(failed) == ["1"]
+    assert isinstance(failed["1"], HarvestError) and failed["1"].status == 404
+
+    server.failures[f"/author/{ids[0]}/papers"] = [500] * 3
+    papers, failed = harvest_author_papers(ids, base_url=server.url, rate=1000, burst=10, retries=2, backoff=0.01)
+    assert list(papers) == ids[1:]
+    assert failed[ids[0]].status == 500
+
+
+def check_rate_limit_bounds_wall_clock_time(server):
+    # 2 authors with 1 paper per page are 7 requests, at 20 per second after a first one that does not wait
+    start = time.monotonic()
+    harvest_author_papers(list(recorded), base_url=server.url, rate=20, page_size=1)
+    assert time.monotonic() - start >= 6 / 20 * 0.9
+
+
+def check_concurrency_is_bounded(server):
+    server.delay = 0.05
+    ids = list(recorded) * 4
+    harvest_author_papers(ids, base_url=server.url, rate=1000, burst=100, concurrency=3)
+    assert 1 < server.max_in_flight <= 3
+
+
+def check_citation_counts_are_fetched_in_batches(server):
+    ids = list(papers_by_id)
+    unknown = "0" * 40
+    counts, failed = fetch_citation_counts(ids + ids[:3] + [unknown], batch_size=3, base_url=server.url, rate=1000,
+                                           burst=10)
+    assert failed == []
+    assert counts == dict({i: (i, papers_by_id[i]["citationCount"]) for i in ids}, **{unknown: None})
+    # the duplicate ids are only asked for once
+    assert sorted(i for batch in server.batches for i in batch) == sorted(ids + [unknown])
+    assert sorted(len(batch) for batch in server.batches) == [2, 3, 3]
+
+
+def check_rejected_citation_batches_are_retried_per_id(server):
+    ids = list(papers_by_id)
+    server.failing_ids.add(ids[1])
+    counts, failed = fetch_citation_counts(ids, batch_size=4, base_url=server.url, rate=1000, burst=10, retries=1,
+                                           backoff=0.01)
+    # only the id that also fails on its own is left out
+    assert failed == [ids[1]]
+    assert list(counts) == ids[:1] + ids[2:]
+    assert [ids[0]] in server.batches and [ids[2]] in server.batches
+
+
+def check_failing_citation_batches_are_not_split(server):
+    ids = list(papers_by_id)
+    server.failing_ids.add(ids[1])
+    server.failing_status = 503
+    counts, failed = fetch_citation_counts(ids, batch_size=4, base_url=server.url, rate=1000, burst=10, retries=1,
+                                           backoff=0.01)
+    assert failed == ids[:4]
+    assert list(counts) == ids[4:]
+    # the failing batch was only retried as a whole
+    assert [batch for batch in server.requested if ids[1] in batch] == [ids[:4]] * 2
@@ -0,0 +1,139 @@
+"""
+Checks for the shared http client against a local stub server: responses that were recorded can be replayed without
+the server, requests that were not recorded fail in replay mode, the cache expires, requests to a host are spaced to
+its rate limit, connections are reused, keep-alive connections the server closed are opened again and compressed
+responses are decoded.
+"""
+
+import gzip
+import threading
+import time
+from urllib.parse import urlsplit
+
+import pytest
+
+from bib_handling_code.httpclient import HttpClient, RateLimiter, ReplayMissError
+from conftest import StubHandler
+
+
+class Handler(StubHandler):
+    def do_GET(self):
+        # the path and how often it was asked for
+        with self.server.lock:
+            self.server.ports.add(self.client_address[1])
+            body = f"{self.path} {self.server.paths[urlsplit(self.path).path]}".encode()
+        headers = [("Content-Type", "text/plain; charset=utf-8")]
+        if self.path.startswith("/gzip"):
+            body = gzip.compress(body)
+            headers.append(("Content-Encoding", "gzip"))
+        self.send(200, body, headers)
+        if self.path.startswith("/stale"):
+            # drop the connection without telling the client, like a server whose keep-alive timeout passed
+            self.close_connection = True
+
+    def do_POST(self):
+        self.send(200, self.body())
+
+
+@pytest.fixture
+def server(serve):
+    # ports holds the client ports of the connections that were used
+    return serve(Handler, ports=set())
+
+
+def check_record_and_replay(server, tmp_path):
+    recorder = HttpClient(mode="record", fixtures=str(tmp_path))
+    assert recorder.get(f"{server.url}/works", params={"rows": 5, "query": "lung & nodules"}).text == \
+        "/works?rows=5&query=lung+%26+nodules 1"
+    assert recorder.post(f"{server.url}/batch", json_data={"ids": ["a", "b"]}).json() == {"ids": ["a", "b"]}
+    server.shutdown()
+    server.server_close()
+
+    player = HttpClient(mode="replay", fixtures=str(tmp_path))
+    response = player.get(f"{server.url}/works", params={"rows": 5, "query": "lung & nodules"})
+    assert response.status_code == 200 and response.from_store
+    assert response.text == "/works?rows=5&query=lung+%26+nodules 1"
+    assert response.headers["Content-Type"] == "text/plain; charset=utf-8"
+    assert player.post(f"{server.url}/batch", json_data={"ids": ["a", "b"]}).json() == {"ids": ["a", "b"]}
+    assert player.requests == 0
+
+
+def check_replay_miss(server, tmp_path):
+    player = HttpClient(mode="replay", fixtures=str(tmp_path))
+    with pytest.raises(ReplayMissError):
+        player.get(f"{server.url}/works")
+    # the body is part of what was recorded
+    HttpClient(mode="record", fixtures=str(tmp_path)).post(f"{server.url}/batch", json_data={"ids": ["a"]})
+    with pytest.raises(ReplayMissError):
+        player.post(f"{server.url}/batch", json_data={"ids": ["b"]})
+    assert server.paths["/works"] == 0
+
+
+def check_cache_expires(server, tmp_path):
+    client = HttpClient(cache_dir=str(tmp_path))
+    assert client.get(f"{server.url}/a", ttl=60).text == "/a 1"
+    assert client.get(f"{server.url}/a", ttl=60).text == "/a 1"
+    # without ttl the cache is not used
+    assert client.get(f"{server.url}/a").text == "/a 2"
+    time.sleep(0.1)
+    assert client.get(f"{server.url}/a", ttl=0.05).text == "/a 3"
+    assert server.paths["/a"] == 3
+
+
+def check_rate_limit_per_host(server):
+    client = HttpClient(rate_limits={"127.0.0.1": 20})
+    start = time.monotonic()
+    threads = [threading.Thread(target=client.get, args=(f"{server.url}/{i}",)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # the first request goes right away, the other 5 are spaced 50 ms apart
+    assert time.monotonic() - start >= 0.25
+    start = time.monotonic()
+    client.get(f"{server.url}/0", limit=False)
+    assert time.monotonic() - start < 0.05
+
+
+def check_rate_limiter_burst():
+    limiter = RateLimiter(rate=10, burst=3)
+    start = time.monotonic()
+    for _ in range(3):
+        limiter.wait()
+    assert time.monotonic() - start < 0.05
+    limiter.wait()
+    assert time.monotonic() - start >= 0.09
+
+
+def check_connections_are_reused(server):
+    client = HttpClient()
+    for i in range(10):
+        client.get(f"{server.url}/{i}")
+    assert client.requests == 10
+    assert len(server.ports) == 1
+    client.close()
+
+
+def check_stale_connections_are_opened_again(server):
+    client = HttpClient()
+    for i in range(3):
+        assert client.get(f"{server.url}/stale/{i}").text == f"/stale/{i} 1"
+    assert len(server.ports) == 3
+    client.close()
+
+
+def check_compressed_responses_are_decoded(server, tmp_path):
+    client = HttpClient(mode="record", fixtures=str(tmp_path))
+    response = client.get(f"{server.url}/gzip")
+    assert response.text == "/gzip 1"
+    assert response.headers["Content-Encoding"] == "gzip"
+    # the decoded body is recorded, without the encoding
+    response = HttpClient(mode="replay", fixtures=str(tmp_path)).get(f"{server.url}/gzip")
+    assert response.text == "/gzip 1" and "Content-Encoding" not in response.headers
+
+
+def check_mode():
+    with pytest.raises(ValueError):
+        HttpClient(mode="replay")
+    with pytest.raises(ValueError):
+        HttpClient(mode="offline", fixtures="fixtures")
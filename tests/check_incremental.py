@@ -0,0 +1,110 @@
+"""
+Checks for IncrementalBibFile, which rewrites diag.bib in place: only the entries that were changed are written again,
+the rest of the file is left as it is byte for byte, appended entries are cleaned up like save_to_file does, and a file
+that was changed on disk since it was loaded is not overwritten.
+"""
+
+import pytest
+
+processbib = pytest.importorskip("bib_handling_code.processbib")
+
+original = (b"@String { _Radiology_ = {Radiology} }\r\n"
+            b"\r\n"
+            b"@article{Ginn20,\r\n"
+            b"  author = {van Ginneken, Bram},\r\n"
+            b"  title = {Lung nodules},\r\n"
+            b"  journal = _Radiology_,\r\n"
+            b"  year = {2020},\r\n"
+            b"}\r\n"
+            b"\r\n"
+            b"@article{Jaco21,\r\n"
+            b"  author   = {Jacobs, Colin},\r\n"
+            b"  title    = {Emphysema},\r\n"
+            b"  year     = {2021},\r\n"
+            b"}\r\n")
+
+
+def open_bib(tmp_path, data=original):
+    bib = tmp_path / "a.bib"
+    bib.write_bytes(data)
+    bib_file = processbib.IncrementalBibFile(str(bib), persist=False)
+    bib_file.load()
+    return bib, bib_file
+
+
+def entry(bib_file, key):
+    return next(e for e in bib_file.entries if e.key == key)
+
+
+def check_appended_entries_are_cleaned_up(tmp_path):
+    bib, bib_file = open_bib(tmp_path)
+    bib_file.append("\n@article{Sanc22, \n\tauthor = {Sánchez, J. and Müller, K.}, \n"
+                    "\ttitle = {Über ≥ two},\n\tyear = {2022}, \n}\n")
+    bib_file.save()
+
+    data = bib.read_bytes()
+    assert data == original + (b"\r\n"
+                               b"@article{Sanc22,\r\n"
+                               b"  author = {Sanchez, J. and Muller, K.},\r\n"
+                               b"  title = {Uber >= two},\r\n"
+                               b"  year = {2022},\r\n"
+                               b"}\r\n")
+    assert [line for line in data.split(b"\r\n") if line != line.rstrip() or b"\t" in line] == []
+
+
+def check_edit_remove_and_append(tmp_path):
+    bib, bib_file = open_bib(tmp_path)
+    changes = bib_file.append("@article{New22,\n  title = {New},\n  year = {2022},\n}\n")
+    assert changes == processbib.BibChanges(added=["New22"], removed=[], modified=[])
+    entry(bib_file, "Jaco21").fields["title"] = "{Emphysema quantification}"
+    bib_file.remove(["Ginn20"])
+
+    assert bib_file.save() == ["Jaco21"]
+    assert bib.read_bytes() == (b"@String { _Radiology_ = {Radiology} }\r\n"
+                                b"\r\n"
+                                b"@article{Jaco21,\r\n"
+                                b"  author = {Jacobs, Colin},\r\n"
+                                b"  title = {Emphysema quantification},\r\n"
+                                b"  year = {2021},\r\n"
+                                b"}\r\n"
+                                b"\r\n"
+                                b"@article{New22,\r\n"
+                                b"  title = {New},\r\n"
+                                b"  year = {2022},\r\n"
+                                b"}\r\n")
+    # what was saved is what a new load finds
+    assert bib_file.load() == processbib.BibChanges(added=[], removed=[], modified=[])
+    assert [e.key for e in bib_file.entries] == ["_Radiology_", "Jaco21", "New22"]
+
+
+def check_untouched_file_is_left_as_it_is(tmp_path):
+    # spacing that to_lines would change, and no newline at the end
+    data = original.replace(b"  year", b"\tyear") + b"\r\n@article{Last23, title = {Last}, year = {2023}}"
+    bib, bib_file = open_bib(tmp_path, data)
+    assert bib_file.save() == []
+    assert bib.read_bytes() == data
+    assert bib_file.load() == processbib.BibChanges(added=[], removed=[], modified=[])
+
+
+def check_file_changed_on_disk_is_not_overwritten(tmp_path):
+    bib, bib_file = open_bib(tmp_path)
+    entry(bib_file, "Jaco21").fields["year"] = "{2022}"
+    changed = original.replace(b"Emphysema", b"Emphysema scoring")
+    bib.write_bytes(changed)
+
+    with pytest.raises(ValueError):
+        bib_file.save()
+    with pytest.raises(ValueError):
+        bib_file.append("@article{New22,\n  title = {New},\n  year = {2022},\n}\n")
+    assert bib.read_bytes() == changed
+
+
+def check_replaced_fields_are_written(tmp_path):
+    bib, bib_file = open_bib(tmp_path)
+    jacobs = entry(bib_file, "Jaco21")
+    # new fields start counting changes at 0 again, like the fields that were loaded
+    jacobs.fields = dict(jacobs.fields, year="{2022}")
+    assert jacobs.fields.changes == 0
+
+    assert bib_file.save() == ["Jaco21"]
+    assert b"  year = {2022},\r\n" in bib.read_bytes()
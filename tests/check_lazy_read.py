@@ -0,0 +1,39 @@
+"""
+Checks for the lazy mode of read_bibfile: it gives the same entries as the eager parser, and entries whose fields were
+not parsed yet do not depend on the file anymore, which the scripts rewrite.
+"""
+
+import os
+
+import pytest
+
+processbib = pytest.importorskip("bib_handling_code.processbib")
+
+literature_root = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir)
+
+
+def state(entries):
+    return [(e.key, e.type, e.value, dict(e.fields)) for e in entries]
+
+
+@pytest.fixture
+def bib(tmp_path):
+    bib = tmp_path / "diag_taverne.bib"
+    bib.write_bytes(open(os.path.join(literature_root, "diag_taverne.bib"), "rb").read())
+    return bib
+
+
+def check_lazy_equals_eager(bib):
+    lazy = processbib.read_bibfile(None, str(bib), lazy=True, cache=False)
+    assert any(isinstance(e, processbib.LazyBibEntry) for e in lazy)
+    assert state(lazy) == state(processbib.read_bibfile(None, str(bib), cache=False))
+
+
+def check_lazy_entries_survive_a_rewrite(bib):
+    eager = processbib.read_bibfile(None, str(bib), cache=False)
+    lazy = processbib.read_bibfile(None, str(bib), lazy=True, cache=False)
+    # the file is truncated and then rewritten shorter, before any fields were parsed
+    with open(bib, "r+b") as f:
+        f.truncate(0)
+    bib.write_bytes(b"@article{Other20,\n  year = {2020},\n}\n")
+    assert state(lazy) == state(eager)
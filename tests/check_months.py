@@ -0,0 +1,154 @@
+"""
+Checks for finding the months of bib entries against a local stub of crossref and the arXiv api: months are found by
+doi, arXiv id and title in that order, arXiv ids are looked up in batches, and a run that is interrupted continues from
+its checkpoint without looking up the entries again.
+"""
+
+import re
+from types import SimpleNamespace
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import pytest
+
+from bib_handling_code.httpclient import HttpClient
+from bib_handling_code.months import MonthResolver
+from conftest import StubHandler
+
+works = {
+    "10.1148/radiol.2020": [2020, 3],
+    "10.1016/j.media.2021": [2021],
+}
+papers = {
+    "2101.00001": "2021-01-05T18:00:00Z",
+    "2102.00002": "2021-02-10T18:00:00Z",
+    "2103.00003": "2021-03-15T18:00:00Z",
+    "cs/0101001": "2001-01-01T00:00:00Z",
+}
+searched = {"title": ["Deep learning for lung nodules"], "author": [{"family": "Jacobs"}], "issued":
+            {"date-parts": [[2019, 11]]}}
+
+
+def entry(key, **fields):
+    return SimpleNamespace(key=key, type="article", fields=fields)
+
+
+def arxiv_feed(ids):
+    feed = ['<feed xmlns="http://www.w3.org/2005/Atom">']
+    for i in ids:
+        paper = re.sub(r"v\d+$", "", i)
+        if paper in papers:
+            feed.append(f"<entry><id>http://arxiv.org/abs/{paper}v2</id><published>{papers[paper]}</published></entry>")
+    return ("".join(feed) + "</feed>").encode()
+
+
+class Handler(StubHandler):
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        if url.path in self.server.broken:
+            return self.send(500)
+        if url.path == "/api/query":
+            ids = query["id_list"][0].split(",")
+            if any(" " in i for i in ids):
+                return self.send(400)
+            with self.server.lock:
+                self.server.arxiv_queries.append(ids)
+            return self.send(200, arxiv_feed(ids))
+        if url.path == "/works":
+            items = [searched] if "lung nodules" in query["query.bibliographic"][0].lower() else []
+            return self.send(200, {"message": {"items": items}})
+        doi = unquote(url.path[len("/works/"):])
+        if doi not in works:
+            return self.send(404)
+        self.send(200, {"message": {"issued": {"date-parts": [works[doi]]}}})
+
+
+@pytest.fixture
+def server(serve):
+    # paths in broken answer with a 500
+    return serve(Handler, arxiv_queries=[], broken=set())
+
+
+def resolver(server, **kwargs):
+    return MonthResolver(client=HttpClient(rate_limits={}), crossref=server.url, arxiv=f"{server.url}/api/query",
+                         **kwargs)
+
+
+def make_entries():
+    return [
+        entry("Pros20", doi="10.1148/radiol.2020", title="Lung", author="Prokop, M."),
+        # no month at crossref, but an arXiv version
+        entry("Ginn21", doi="10.1016/j.media.2021", journal="arXiv:2101.00001", title="Seg", author="Ginneken"),
+        entry("Jaco21", journal="{arXiv:2102.00002v1}", title="Lung nodules", author="Jacobs, C."),
+        entry("Jaco21a", journal="arXiv:2103.00003", title="Detection", author="Jacobs, C."),
+        entry("Jaco01", journal="arXiv:cs/0101001", title="Old", author="Jacobs, C."),
+        entry("Jaco19", title="Deep learning for {Lung} Nodules", author="Jacobs, Colin"),
+        entry("Unkn19", doi="10.1/unknown", title="Unknown", author="Nobody"),
+        entry("Stri00", journal="Radiology"),
+        entry("Mont20", title="Has a month", author="Someone", month="3"),
+    ]
+
+
+def check_months_in_order_of_source(server):
+    months = resolver(server).resolve(make_entries())
+    assert months == {
+        "Pros20": ("{3}", "doi"),
+        "Ginn21": ("{1}", "arxiv"),
+        "Jaco21": ("{2}", "arxiv"),
+        "Jaco21a": ("{3}", "arxiv"),
+        "Jaco01": ("{1}", "arxiv"),
+        "Jaco19": ("{11}", "title"),
+        "Unkn19": (None, None),
+        "Stri00": (None, None),
+    }
+
+
+def check_arxiv_ids_are_batched(server):
+    resolver(server, arxiv_batch_size=3).resolve(make_entries())
+    assert sorted(map(len, server.arxiv_queries)) == [1, 3]
+    assert sorted(sum(server.arxiv_queries, [])) == ["2101.00001", "2102.00002v1", "2103.00003", "cs/0101001"]
+
+
+def check_resume_from_checkpoint(server, tmp_path):
+    checkpoint = str(tmp_path / "diag.bib.months")
+    months = resolver(server, checkpoint=checkpoint).resolve(make_entries())
+    requests = sum(server.paths.values())
+    # an interrupted run may leave half a line
+    with open(checkpoint, "a", encoding="utf-8") as f:
+        f.write('{"key": "Jac')
+
+    assert resolver(server, checkpoint=checkpoint).resolve(make_entries()) == months
+    assert sum(server.paths.values()) == requests
+
+    # only entries that changed are looked up again
+    entries = make_entries()
+    entries[0].fields["doi"] = "10.1016/j.media.2021"
+    resolver(server, checkpoint=checkpoint).resolve(entries)
+    assert sum(server.paths.values()) == requests + 2
+    with open(checkpoint, encoding="utf-8") as f:
+        assert '{"key": "Jac\n' in f.read()
+
+
+def check_failed_lookups_are_retried(server, tmp_path):
+    checkpoint = str(tmp_path / "diag.bib.months")
+    server.broken = {"/works/10.1148/radiol.2020", "/api/query"}
+    months = resolver(server, checkpoint=checkpoint).resolve(make_entries())
+    # the entries of which a lookup failed are not written to the checkpoint
+    assert months == {"Jaco19": ("{11}", "title"), "Unkn19": (None, None), "Stri00": (None, None)}
+
+    server.broken = set()
+    months = resolver(server, checkpoint=checkpoint).resolve(make_entries())
+    assert months["Pros20"] == ("{3}", "doi")
+    assert months["Jaco21a"] == ("{3}", "arxiv")
+    assert months["Jaco21"] == ("{2}", "arxiv")
+    assert server.paths["/works/10.1/unknown"] == 1
+
+
+def check_malformed_arxiv_id(server, tmp_path):
+    checkpoint = str(tmp_path / "diag.bib.months")
+    entries = make_entries() + [entry("Bad20", journal="arXiv:not an id")]
+    months = resolver(server, checkpoint=checkpoint).resolve(entries)
+    # the batch with the malformed id is looked up again one id at a time
+    assert months["Jaco21a"] == ("{3}", "arxiv")
+    assert months["Bad20"] == (None, None)
+    assert server.paths["/api/query"] == 1 + 5
@@ -0,0 +1,76 @@
+"""
+Checks for save_to_file: it must write the same file as the loop it replaced, which looked up every key in the list of
+entries again, including for keys that occur more than once, and atomic=True must leave no temporary file behind.
+"""
+
+import io
+import os
+
+import pytest
+
+processbib = pytest.importorskip("bib_handling_code.processbib")
+
+literature_root = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir)
+
+
+def legacy_save_to_file(entries, full_path):
+    keys = list()
+    stringkeys = list()
+    for i in entries:
+        if i.type == 'string':
+            stringkeys.append(i.key)
+        else:
+            keys.append(i.key)
+    keys.sort()
+    stringkeys.sort()
+
+    file = io.open(full_path, 'w', newline='\r\n', encoding="utf-8")
+    for i in stringkeys:
+        for j in entries:
+            if j.key == i:
+                file.writelines(j.to_lines())
+                break
+    for i in keys:
+        for j in entries:
+            if j.key == i:
+                file.write("\n")
+                file.writelines(j.to_lines())
+                break
+    file.close()
+
+
+def make_entry(key, type="article", **fields):
+    entry = processbib.BibEntry()
+    entry.key = key
+    entry.type = type
+    entry.fields = {name: "{" + value + "}" for name, value in fields.items()}
+    return entry
+
+
+@pytest.fixture
+def entries():
+    entries = processbib.read_bibfile(None, os.path.join(literature_root, "diag_taverne.bib"), cache=False)
+    # unsorted, and a key twice: only the first of the two is written, twice
+    return entries[::-1] + [make_entry(entries[1].key, title="Duplicate"), make_entry("Aaaa00", title="First")]
+
+
+def check_save_equals_legacy(tmp_path, entries):
+    legacy = tmp_path / "legacy.bib"
+    legacy_save_to_file(entries, str(legacy))
+    for atomic in (False, True):
+        saved = tmp_path / "saved.bib"
+        processbib.save_to_file(entries, None, full_path=str(saved), atomic=atomic)
+        assert saved.read_bytes() == legacy.read_bytes()
+        assert sorted(os.listdir(tmp_path)) == ["legacy.bib", "saved.bib"]
+
+
+def check_save_order(tmp_path):
+    entries = [make_entry("Penz21", year="2021"), make_entry("_SPIE_", type="string"),
+               make_entry("Ginn20", year="2020"), make_entry("Ginn20", year="1999")]
+    entries[1].value = "{Proceedings of the SPIE}"
+    saved = tmp_path / "saved.bib"
+    processbib.save_to_file(entries, None, full_path=str(saved))
+    data = saved.read_bytes()
+    assert b"\n" not in data.replace(b"\r\n", b"")
+    assert data.index(b"_SPIE_") < data.index(b"{Ginn20,") < data.index(b"{Penz21,")
+    assert data.count(b"year = {2020}") == 2 and b"1999" not in data
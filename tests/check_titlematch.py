@@ -0,0 +1,80 @@
+"""
+Checks for the blocked title matching: the bib titles with a ratio above 0.8 must be the same ones that comparing
+with every bib title finds, both on small examples and on a sample of the historical title match data in
+scripts/old_data, and the best match is the most similar of all bib titles.
+"""
+
+import ast
+import csv
+import os
+from difflib import SequenceMatcher
+
+import pytest
+
+from bib_handling_code.titlematch import TitleMatcher, clean_title
+
+old_data = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, "scripts", "old_data")
+
+bib_titles = [
+    "{Deep Learning for Lung Nodule Detection in {CT}}",
+    "Automated detection of lung nodules in computed tomography",
+    "{Computer-aided} diagnosis of prostate cancer in {MRI}",
+    "Editorial",
+    "Deep learning for lung nodule detection in CT scans",
+]
+
+
+def brute_force(titles, title, threshold=0.8):
+    ratios = [SequenceMatcher(a=title.lower(), b=clean_title(t)).ratio() for t in titles]
+    return [i for i, ratio in enumerate(ratios) if ratio > threshold]
+
+
+def read_csv(name):
+    with open(os.path.join(old_data, name), newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def check_matches_equal_brute_force():
+    matcher = TitleMatcher(bib_titles)
+    for title in ["Deep learning for lung nodule detection in CT", "Computer-aided diagnosis of prostate cancer in MRI",
+                  "editorial", "Something unrelated"]:
+        best, ratio, matches = matcher.match(title)
+        assert [i for i, _ in matches] == brute_force(bib_titles, title)
+        assert all(r > 0.8 for _, r in matches)
+        if matches:
+            assert ratio == max(r for _, r in matches)
+
+
+def check_best_match_and_tie():
+    matcher = TitleMatcher(bib_titles + [bib_titles[2]])
+    best, ratio, matches = matcher.match("computer-aided diagnosis of prostate cancer in mri")
+    # the first one of equal bib titles is the best match
+    assert (best, ratio) == (2, 1.0)
+    assert [i for i, _ in matches] == [2, 5]
+
+
+def check_no_match():
+    assert TitleMatcher(bib_titles).match("qqq") == (0, 0.0, [])
+
+
+def check_best_match_outside_the_candidates():
+    # a misspelled title, of which only the words "editorial" and "automated" are informative, and those are in others
+    title = "Computeraided diagnosys of prostat cancr in MR, editorial automated"
+    matcher = TitleMatcher(bib_titles)
+    assert 2 not in matcher.candidates(title.lower())
+    ratios = [SequenceMatcher(a=title.lower(), b=clean_title(t)).ratio() for t in bib_titles]
+    assert matcher.match(title)[:2] == (2, max(ratios))
+
+
+def check_historical_title_matches():
+    matcher = TitleMatcher([row["title"] for row in read_csv("temp_diag_bib_summary.csv")])
+    bibkeys = [row["bibkey"] for row in read_csv("temp_diag_bib_summary.csv")]
+    # a fixed sample, all 2202 titles take minutes, scripts/benchmarks/bench_title_match.py can run them all
+    for row in read_csv("temp_title_match_data.csv")[::100]:
+        if row["up80_bibkeys"]:
+            expected = ast.literal_eval(row["up80_bibkeys"])
+        else:
+            expected = [row["max_bibkey"]] if float(row["max_ratio"]) > 0.8 else []
+        best, ratio, matches = matcher.match(row["ss_title"])
+        assert [bibkeys[i] for i, _ in matches] == expected, row["ss_title"]
+        assert (bibkeys[best], ratio) == (row["max_bibkey"], pytest.approx(float(row["max_ratio"]))), row["ss_title"]
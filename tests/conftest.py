@@ -0,0 +1,84 @@
+"""
+Shared setup of the checks: the scripts directory is put on the path, so the checks import bib_handling_code like the
+scripts do, and the serve fixture starts local stub servers that stand in for crossref, arXiv, doi.org and Semantic
+Scholar. A check only declares the routes of its stub, as a StubHandler with do_GET and do_POST methods.
+"""
+
+import json
+import os
+import sys
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, "scripts"))
+
+
+class StubServer(ThreadingHTTPServer):
+    """
+    http server on a free local port, paths counts the requests per path (without the query)
+    keyword arguments are set as attributes, for the state the routes of a check use
+    """
+    daemon_threads = True
+
+    def __init__(self, handler, **state):
+        super().__init__(("127.0.0.1", 0), handler)
+        self.paths = Counter()
+        self.lock = threading.Lock()
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # keep-alive, like the real services
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def parse_request(self):
+        parsed = super().parse_request()
+        if parsed:
+            with self.server.lock:
+                self.server.paths[urlsplit(self.path).path] += 1
+        return parsed
+
+    def body(self):
+        """the body of the request"""
+        return self.rfile.read(int(self.headers["Content-Length"] or 0))
+
+    def send(self, status, body=b"", headers=()):
+        """answers with body, which is sent as json if it is not bytes"""
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+            headers = [("Content-Type", "application/json"), *headers]
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        for header in headers:
+            self.send_header(*header)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def serve():
+    """serve(handler, **state) starts a StubServer with the routes of handler, it is stopped after the check"""
+    servers = []
+
+    def start(handler, **state):
+        server = StubServer(handler, **state)
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()